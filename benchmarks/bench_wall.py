@@ -0,0 +1,251 @@
+"""Reproducible benchmarks for thankful_wall.py, with no network and no credentials
+
+Each scenario runs the real app through Streamlit's AppTest against an in-memory
+Firestore (fake_firestore.py) seeded with synthetic bilingual entries, and records
+per rerun: wall time, Firestore calls and documents read, rendered element count
+and peak Python memory allocated during the rerun (tracemalloc). Bytes read
+count the JSON size of the fields each query returned.
+
+Usage:
+    python benchmarks/bench_wall.py [--sizes 10,1000,10000,100000] [--modes listener,polling]
+                                    [--scenarios anonymous_view,submit,...] [--repeat 3]
+                                    [--output bench_results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import fake_firestore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, "thankful_wall.py")
+ADMIN_PASSWORD = "))$%17k60ZCS"
+COLLECTION = "thankful_entries"
+
+# Counter names that are API calls (the rest are documents/bytes)
+CALL_COUNTERS = ("stream", "get", "get_all", "set", "update", "delete", "batch_commit", "listen")
+
+ENGLISH_NAMES = ["Alice", "Ben", "Chloe", "David", "Emma", "Frank", "Grace", "Henry", "Ivy", "Jack",
+                 "Kevin", "Lily", "Mia", "Noah", "Olivia", "Peter", "Queenie", "Ryan", "Sophie", "Tom"]
+CHINESE_NAMES = ["王芳", "李娜", "张伟", "刘洋", "陈静", "杨磊", "赵敏", "黄强", "周杰", "吴婷",
+                 "徐明", "孙丽", "马超", "朱琳", "胡斌", "郭晶", "何平", "高翔", "林华", "罗红"]
+ROLES = ["G10-2", "G10-3", "G11-1", "G11-4", "G12-2", "Teacher 老师", "Administrator", "Parent 家长",
+         "Not specified 未指定"]
+THANKS = ["My family and friends 我的家人和朋友", "Good health 健康", "Kind teachers 善良的老师",
+          "Delicious food 美味的食物", "A warm home 温暖的家", "Music and art 音乐和艺术",
+          "Education opportunities 教育机会", "Beautiful nature 美丽的大自然", "Technology 科技"]
+
+
+def synthetic_entries(count, seed=0):
+    """{doc_id: entry} with ~10% manual order, ~75% timestamped and ~15% without a timestamp"""
+    rng = random.Random(seed)
+    id_chars = fake_firestore._AUTO_ID_CHARS
+    entries = {}
+    for number in range(count):
+        doc_id = ''.join(rng.choice(id_chars) for _ in range(20))
+        entry = {
+            "entry_id": doc_id,
+            "english_name": f"{rng.choice(ENGLISH_NAMES)} {number}",
+            "chinese_name": rng.choice(CHINESE_NAMES),
+            "role_class": rng.choice(ROLES),
+            "thankful_for": " ".join(rng.sample(THANKS, rng.randint(1, 3))),
+        }
+        kind = rng.random()
+        if kind < 0.10:
+            entry["manual_order"] = number
+            entry["timestamp"] = 1_700_000_000 + number
+        elif kind < 0.85:
+            entry["timestamp"] = 1_700_000_000 + number
+        entries[doc_id] = entry
+    return entries
+
+
+def count_elements(node):
+    """Number of rendered elements (leaves) under an AppTest node"""
+    children = getattr(node, "children", None)
+    if children is None:
+        return 1
+    return sum(count_elements(child) for child in children.values())
+
+
+# --- Scenarios: lists of (step name, action(at)) ---
+
+def login(at):
+    at.sidebar.text_input(key="admin_pass").input(ADMIN_PASSWORD).run()
+
+
+def submit(at):
+    at.sidebar.text_input(key="english_name").input("Benchmark")
+    at.sidebar.text_input(key="chinese_name").input("基准")
+    at.sidebar.text_input(key="role_class").input("G10-2")
+    at.sidebar.text_area(key="thankful_for").input("Fast reruns 快速的页面")
+    next(button for button in at.sidebar.button if button.label.startswith("Submit")).click().run()
+
+
+def edit(at):
+    at.sidebar.selectbox(key="edit_select").select_index(1).run()
+    at.sidebar.text_area(key="edit_thankful_for").input("Edited by the benchmark 已编辑")
+    at.sidebar.button(key="update_btn").click().run()
+
+
+def select_middle_entry(at):
+    select = at.sidebar.selectbox(key="move_select")
+    select.select_index(len(select.options) // 2).run()
+
+
+def move_top(at):
+    at.sidebar.button(key="move_top").click().run()
+
+
+def move_to_position(at):
+    position = at.sidebar.number_input(key="move_position")
+    position.set_value(max(1, int(position.max // 2)))
+    at.sidebar.button(key="move_btn").click().run()
+
+
+def delete_selected(at):
+    at.sidebar.selectbox(key="delete_select").select_index(1).run()
+    at.sidebar.button(key="delete_btn").click().run()
+
+
+def delete_all(at):
+    at.sidebar.toggle(key="delete_all_btn").set_value(True).run()
+    at.sidebar.text_input(key="delete_confirm").input("DELETE ALL").run()
+    at.sidebar.button(key="confirm_delete_all").click().run()
+
+
+def rerun(at):
+    at.run()
+
+
+def next_page(at):
+    button = at.button(key="next_page")
+    # Small walls fit on one page; a plain rerun keeps the step comparable
+    (at if button.disabled else button.click()).run()
+
+
+SCENARIOS = {
+    "anonymous_view": [("first_load", rerun), ("rerun", rerun), ("rerun_again", rerun), ("next_page", next_page)],
+    "submit": [("first_load", rerun), ("submit", submit), ("rerun", rerun)],
+    "admin_edit": [("first_load", rerun), ("login", login), ("edit", edit)],
+    "admin_reorder": [("first_load", rerun), ("login", login), ("select", select_middle_entry),
+                      ("move_top", move_top), ("move_to_position", move_to_position)],
+    "admin_delete": [("first_load", rerun), ("login", login), ("delete", delete_selected)],
+    "delete_all": [("first_load", rerun), ("login", login), ("delete_all", delete_all)],
+}
+
+
+def run_scenario(name, size, mode, trace_memory, seed):
+    """Run one scenario on a freshly seeded fake; returns one result dict per step"""
+    # Start from a cold process state: no cached client, store or snapshot
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    db = fake_firestore.FakeFirestore(seed=seed)
+    db.collection(COLLECTION).seed(synthetic_entries(size, seed=seed))
+    fake_firestore.install(db)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.secrets["wall"] = {"storage_backend": "firestore", "realtime_listener": mode == "listener"}
+
+    steps = []
+    for step_name, action in SCENARIOS[name]:
+        before = db.snapshot_counters()
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        action(at)
+        seconds = time.perf_counter() - started
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+        after = db.snapshot_counters()
+
+        delta = {counter: after.get(counter, 0) - before.get(counter, 0) for counter in after}
+        steps.append({
+            "step": step_name,
+            "seconds": seconds,
+            "firestore_calls": sum(delta.get(counter, 0) for counter in CALL_COUNTERS),
+            "firestore_counters": {counter: value for counter, value in sorted(delta.items()) if value},
+            "docs_read": delta.get("docs_read", 0),
+            "bytes_read": delta.get("bytes_read", 0),
+            "elements": count_elements(at.main) + count_elements(at.sidebar),
+            "peak_memory_bytes": peak_memory,
+            "exceptions": [exception.message for exception in at.exception],
+        })
+    return steps
+
+
+def benchmark(name, size, mode, repeat, seed):
+    """Time `repeat` untraced runs (median per step), then one traced run for memory"""
+    runs = [run_scenario(name, size, mode, trace_memory=False, seed=seed) for _ in range(repeat)]
+    traced = run_scenario(name, size, mode, trace_memory=True, seed=seed)
+
+    steps = []
+    for index, step in enumerate(runs[0]):
+        timings = [run[index]["seconds"] for run in runs]
+        steps.append(dict(step, seconds=statistics.median(timings), seconds_all=timings,
+                          peak_memory_bytes=traced[index]["peak_memory_bytes"]))
+    return steps
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the thankful wall against an in-memory Firestore")
+    parser.add_argument("--sizes", default="10,1000,10000,100000", help="Comma-separated entry counts")
+    parser.add_argument("--modes", default="listener,polling",
+                        help="listener (live entry store) and/or polling (snapshot cache and cursor pages)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario (median is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    # The app imports its sibling modules from the repository root
+    sys.path.insert(0, REPO_ROOT)
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        for mode in args.modes.split(","):
+            for name in args.scenarios.split(","):
+                steps = benchmark(name, size, mode, args.repeat, args.seed)
+                results.append({"scenario": name, "size": size, "mode": mode, "steps": steps})
+                for step in steps:
+                    memory = (step["peak_memory_bytes"] or 0) / 1e6
+                    print(f"{name:<15} {size:>7} {mode:<9} {step['step']:<17} {step['seconds'] * 1000:9.1f} ms  "
+                          f"{step['firestore_calls']:>4} calls  {step['docs_read']:>7} reads  "
+                          f"{step['elements']:>5} elements  {memory:8.1f} MB"
+                          + (f"  ERROR {step['exceptions'][0]}" if step["exceptions"] else ""), flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump({"environment": environment(), "seed": args.seed, "repeat": args.repeat, "results": results},
+                  output_file, ensure_ascii=False, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
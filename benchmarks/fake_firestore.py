@@ -0,0 +1,387 @@
+"""In-memory stand-in for the parts of the Firestore client the wall uses
+
+Covers db.collection(path) with document(), stream(), order_by(), limit(),
+start_after(), select() and on_snapshot(), plus db.document(path), db.get_all() and db.batch().
+Every call is counted in FakeFirestore.counters so benchmarks can report
+Firestore calls, documents read and bytes read per rerun without any network.
+FakeFirestore.inject_faults() makes calls slow or failing, to exercise the
+app's timeouts, retries and circuit breaker.
+
+install(fake_db) patches firebase_admin so thankful_wall.py picks up the fake
+instead of connecting to the real project.
+"""
+import datetime
+import functools
+import itertools
+import json
+import random
+import string
+import threading
+import time
+from collections import Counter
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def _size(data):
+    # Rough wire size of a document: its JSON encoding
+    return len(json.dumps(data, ensure_ascii=False, default=str))
+
+
+def _delete_field_sentinel():
+    from firebase_admin import firestore
+    return firestore.DELETE_FIELD
+
+
+class FakeFirestore:
+    """A whole fake database: a dict of collections plus call counters"""
+
+    def __init__(self, seed=0):
+        self._collections = {}
+        self._lock = threading.RLock()
+        # Its own stream: seeded like synthetic_entries, new IDs would repeat the seeded ones
+        self._random = random.Random(f"auto-id:{seed}")
+        self._clock = itertools.count(1)
+        self.counters = Counter()
+        self.inject_faults()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def document(self, path):
+        collection_path, doc_id = path.rsplit('/', 1)
+        return self.collection(collection_path).document(doc_id)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def inject_faults(self, error_rate=0.0, latency=0.0, fail_next=0, error=None, seed=0, break_stream_after=None):
+        """Make every API call slow and/or fail; inject_faults() alone switches faults off
+
+        Each call first takes `latency` seconds, raising DeadlineExceeded once
+        it runs past the call's timeout. Then the next `fail_next` calls, and a
+        random `error_rate` share of the rest, raise `error`
+        (ServiceUnavailable by default). With break_stream_after=n, query
+        streams raise ServiceUnavailable after handing out n documents, like a
+        connection dropped halfway through.
+        """
+        with self._lock:
+            self._faults = {'error_rate': error_rate, 'latency': latency, 'fail_next': fail_next, 'error': error,
+                            'break_stream_after': break_stream_after}
+            self._fault_random = random.Random(seed)
+
+    def _fault(self, timeout=None):
+        # Called at the start of every API call
+        from google.api_core import exceptions
+
+        with self._lock:
+            faults = dict(self._faults)
+            fail = faults['fail_next'] > 0 or self._fault_random.random() < faults['error_rate']
+            if faults['fail_next'] > 0:
+                self._faults['fail_next'] -= 1
+        if faults['latency']:
+            if timeout is not None and faults['latency'] > timeout:
+                time.sleep(timeout)
+                self._count('faults')
+                raise exceptions.DeadlineExceeded(f"Fake call took longer than its {timeout}s deadline")
+            time.sleep(faults['latency'])
+        if fail:
+            self._count('faults')
+            raise faults['error'] or exceptions.ServiceUnavailable("Fake Firestore is unavailable")
+
+    def get_all(self, references, field_paths=None, retry=None, timeout=None):
+        self._count('get_all')
+        self._fault(timeout)
+        for reference in references:
+            with self._lock:
+                record = reference._collection._docs.get(reference.id)
+            if record is None:
+                yield FakeSnapshot(reference, None)
+                continue
+            data = dict(record[0])
+            if field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            self._count('docs_read')
+            self._count('bytes_read', _size(data))
+            yield FakeSnapshot(reference, data, record[1])
+
+    def snapshot_counters(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _auto_id(self):
+        with self._lock:
+            return ''.join(self._random.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+    def _now(self):
+        # Strictly increasing fake update times, so versions are easy to compare
+        return datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(
+            microseconds=next(self._clock))
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+        self.create_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection.name}/{self.id}"
+
+    def get(self, retry=None, timeout=None):
+        db = self._collection._db
+        db._count('get')
+        db._fault(timeout)
+        with db._lock:
+            record = self._collection._docs.get(self.id)
+        if record is None:
+            return FakeSnapshot(self, None)
+        db._count('docs_read')
+        return FakeSnapshot(self, dict(record[0]), record[1])
+
+    def set(self, data, retry=None, timeout=None):
+        self._collection._db._count('set')
+        self._collection._db._fault(timeout)
+        self._collection._write([('set', self.id, data)])
+
+    def update(self, data, retry=None, timeout=None):
+        self._collection._db._count('update')
+        self._collection._db._fault(timeout)
+        self._collection._write([('update', self.id, data)])
+
+    def delete(self, retry=None, timeout=None):
+        self._collection._db._count('delete')
+        self._collection._db._fault(timeout)
+        self._collection._write([('delete', self.id, None)])
+
+
+class _ChangeType:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Change:
+    def __init__(self, kind, snapshot):
+        self.type = _ChangeType(kind)
+        self.document = snapshot
+
+
+class _Watch:
+    def __init__(self, collection, callback):
+        self._collection = collection
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._collection._db._lock:
+            if self._callback in self._collection._listeners:
+                self._collection._listeners.remove(self._callback)
+
+
+class FakeQuery:
+    def __init__(self, collection, orders=(), limit=None, start_after=None, fields=None):
+        self._collection = collection
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start_after = start_after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(orders=self._orders, limit=self._limit, start_after=self._start_after, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field, str(direction)),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(start_after=snapshot)
+
+    def select(self, fields):
+        return self._copy(fields=tuple(fields))
+
+    def stream(self, retry=None, timeout=None):
+        db = self._collection._db
+        db._count('stream')
+        db._fault(timeout)
+        with db._lock:
+            records = list(self._collection._docs.items())
+
+        # Like Firestore, ordering on a field drops documents that do not have it
+        records = [(doc_id, record) for doc_id, record in records
+                   if all(field == '__name__' or field in record[0] for field, _ in self._orders)]
+        orders = list(self._orders)
+        if not any(field == '__name__' for field, _ in orders):
+            orders.append(('__name__', orders[-1][1] if orders else 'ASCENDING'))
+
+        def value(doc_id, data, field):
+            return doc_id if field == '__name__' else data[field]
+
+        def compare(left, right):
+            for field, direction in orders:
+                a, b = value(left[0], left[1][0], field), value(right[0], right[1][0], field)
+                if a != b:
+                    result = -1 if a < b else 1
+                    return -result if direction == 'DESCENDING' else result
+            return 0
+
+        records.sort(key=functools.cmp_to_key(compare))
+
+        if self._start_after is not None:
+            cursor = (self._start_after.id, (self._start_after._data or {}, None))
+            records = [record for record in records if compare(record, cursor) > 0]
+        if self._limit is not None:
+            records = records[:self._limit]
+
+        db._count('docs_read', max(len(records), 1 if not records else 0))
+        snapshots = []
+        for doc_id, (data, update_time) in records:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            else:
+                data = dict(data)
+            db._count('bytes_read', _size(data))
+            snapshots.append(FakeSnapshot(FakeDocumentReference(self._collection, doc_id), data, update_time))
+        with db._lock:
+            break_after = db._faults['break_stream_after']
+        if break_after is not None:
+            return _broken_stream(db, snapshots, break_after)
+        return iter(snapshots)
+
+    def get(self):
+        return list(self.stream())
+
+
+def _broken_stream(db, snapshots, count):
+    from google.api_core import exceptions
+
+    yield from snapshots[:count]
+    db._count('faults')
+    raise exceptions.ServiceUnavailable(f"Fake stream broke off after {count} documents")
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(self)
+        self._db = db
+        self.name = name
+        self.id = name
+        self._docs = {}
+        self._listeners = []
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or self._db._auto_id())
+
+    def on_snapshot(self, callback):
+        self._db._count('listen')
+        with self._db._lock:
+            self._listeners.append(callback)
+            changes = [_Change('ADDED', FakeSnapshot(FakeDocumentReference(self, doc_id), dict(data), update_time))
+                       for doc_id, (data, update_time) in self._docs.items()]
+            self._db._count('docs_read', len(changes))
+            self._db._count('bytes_read', sum(_size(change.document._data) for change in changes))
+            callback(None, changes, None)
+        return _Watch(self, callback)
+
+    def seed(self, documents):
+        """Load {doc_id: data} directly, without counting any calls"""
+        with self._db._lock:
+            for doc_id, data in documents.items():
+                self._docs[doc_id] = (dict(data), self._db._now())
+
+    def _write(self, operations):
+        # Apply (kind, doc_id, data) operations atomically and notify listeners
+        delete_field = _delete_field_sentinel()
+        changes = []
+        with self._db._lock:
+            for kind, doc_id, data in operations:
+                if kind == 'update' and doc_id not in self._docs:
+                    raise KeyError(f"No document to update: {self.name}/{doc_id}")
+
+            for kind, doc_id, data in operations:
+                if kind == 'delete':
+                    if self._docs.pop(doc_id, None) is not None:
+                        changes.append(_Change('REMOVED', FakeSnapshot(FakeDocumentReference(self, doc_id), None)))
+                    continue
+
+                existed = doc_id in self._docs
+                new_data = dict(self._docs[doc_id][0]) if kind == 'update' else {}
+                for field, field_value in data.items():
+                    if field_value is delete_field:
+                        new_data.pop(field, None)
+                    else:
+                        new_data[field] = field_value
+                update_time = self._db._now()
+                self._docs[doc_id] = (new_data, update_time)
+                self._db._count('docs_written')
+                changes.append(_Change('MODIFIED' if existed else 'ADDED',
+                                       FakeSnapshot(FakeDocumentReference(self, doc_id), dict(new_data), update_time)))
+
+            if changes:
+                # Listener updates are billed as reads too
+                self._db._count('docs_read', len(changes) * len(self._listeners))
+                for callback in list(self._listeners):
+                    callback(None, changes, None)
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._operations = []
+
+    def set(self, reference, data):
+        self._operations.append((reference, 'set', data))
+
+    def update(self, reference, data):
+        self._operations.append((reference, 'update', data))
+
+    def delete(self, reference):
+        self._operations.append((reference, 'delete', None))
+
+    def commit(self, retry=None, timeout=None):
+        self._db._count('batch_commit')
+        self._db._fault(timeout)
+        by_collection = {}
+        for reference, kind, data in self._operations:
+            by_collection.setdefault(reference._collection, []).append((kind, reference.id, data))
+        with self._db._lock:
+            for collection, operations in by_collection.items():
+                collection._write(operations)
+        self._operations = []
+
+
+def install(fake_db):
+    """Make firebase_admin hand out fake_db instead of a real Firestore client"""
+    import firebase_admin
+    from firebase_admin import firestore
+
+    firebase_admin._apps.setdefault('[DEFAULT]', object())
+    firestore.client = lambda *args, **kwargs: fake_db
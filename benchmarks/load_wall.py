@@ -0,0 +1,448 @@
+"""Load test for thankful_wall.py: many concurrent sessions against one local Streamlit server
+
+Starts the app on a local Streamlit server in a subprocess, backed by the
+in-memory Firestore (fake_firestore.py) seeded with synthetic entries, then
+drives N simulated browser sessions over Streamlit's websocket protocol from
+this process. Sessions are viewers (refresh, page, search), submitters (fill in
+the form field by field, then submit) and admins (log in, then reorder), each
+waiting an exponentially distributed think time between actions.
+
+Reports p50/p95/p99 rerun latency (overall and per action), reruns per second,
+storage operations per second and the server's RSS over time. The wall, the
+roles, think times and every choice a session makes come from --seed, so runs
+are repeatable up to timing.
+
+Needs websockets on top of the app's requirements:
+    pip install -r benchmarks/requirements.txt
+
+Usage:
+    python benchmarks/load_wall.py [--sessions 30] [--submitters 0.2] [--admins 1] [--duration 60]
+                                   [--ramp-up 10] [--think viewer=3,submitter=5,admin=4]
+                                   [--size 1000] [--mode listener|polling] [--setting page_size=25]
+                                   [--seed 0] [--output load_results.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+import fake_firestore
+from bench_wall import ADMIN_PASSWORD, APP_PATH, CALL_COUNTERS, CHINESE_NAMES, COLLECTION, ENGLISH_NAMES, ROLES, \
+    THANKS, environment, synthetic_entries
+
+SEARCH_TERMS = ["alice", "emma", "teacher", "老师", "家人", "health", "g10", "music 音乐", "王芳", "ben 1"]
+VIEWER_ACTIONS = (("refresh", 0.5), ("next_page", 0.3), ("search", 0.2))
+
+# The script run ends with this status when st.rerun() starts another one straight away
+_FINISHED_EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value('FINISHED_EARLY_FOR_RERUN')
+
+
+# --- Server side (runs in the subprocess) ---
+
+def rss_bytes():
+    """Current resident set size of this process (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def serve(args):
+    """Run the app on this process's Streamlit server, writing RSS and Firestore counters to --samples"""
+    db = fake_firestore.FakeFirestore(seed=args.seed)
+    db.collection(COLLECTION).seed(synthetic_entries(args.size, seed=args.seed))
+    fake_firestore.install(db)
+
+    def sample():
+        with open(args.samples, 'a', encoding='utf-8') as samples_file:
+            while True:
+                samples_file.write(json.dumps({"time": time.time(), "rss_bytes": rss_bytes(),
+                                               "counters": db.snapshot_counters()}) + "\n")
+                samples_file.flush()
+                time.sleep(args.sample_every)
+
+    threading.Thread(target=sample, name="load-samples", daemon=True).start()
+
+    from streamlit.web import bootstrap
+
+    flags = {
+        "server.port": args.port,
+        "server.address": "127.0.0.1",
+        "server.headless": True,
+        "server.fileWatcherType": "none",
+        "browser.gatherUsageStats": False,
+        "secrets.files": [args.secrets],
+        "logger.level": "error",
+    }
+    bootstrap.load_config_options(flag_options=flags)
+    bootstrap.run(APP_PATH, False, [], flags)
+
+
+def start_server(args, workdir):
+    """Start the server subprocess and wait until it answers its health check"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    # Only [wall] settings: the fake Firestore needs no credentials, and the
+    # repository's own secrets file is never read
+    settings = {"storage_backend": "firestore", "realtime_listener": args.mode == "listener"}
+    settings.update(args.setting)
+    secrets_path = os.path.join(workdir, "secrets.toml")
+    with open(secrets_path, "w", encoding="utf-8") as secrets_file:
+        secrets_file.write("[wall]\n" + "".join(f"{name} = {_toml_value(value)}\n"
+                                                for name, value in settings.items()))
+
+    samples_path = os.path.join(workdir, "samples.jsonl")
+    log_file = open(os.path.join(workdir, "server.log"), "w", encoding="utf-8")
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--size", str(args.size), "--seed", str(args.seed), "--secrets", secrets_path,
+               "--samples", samples_path, "--sample-every", str(args.sample_every)]
+    process = subprocess.Popen(command, cwd=workdir, stdout=log_file, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process, port, samples_path
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    with open(log_file.name, encoding="utf-8") as server_log:
+        raise RuntimeError(f"Server did not start:\n{server_log.read()[-2000:]}")
+
+
+def _toml_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return json.dumps(str(value))
+
+
+# --- Client side ---
+
+class Session:
+    """One simulated browser tab: a websocket plus the widget state the frontend keeps"""
+
+    def __init__(self, url, index, role, rng):
+        self.url = url
+        self.index = index
+        self.role = role
+        self.rng = rng
+        self.widgets = {}
+        self.values = {}
+        self.reruns = []
+        self._websocket = None
+
+    async def connect(self):
+        self._websocket = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+
+    async def rerun(self, action, click=None):
+        """Send the current widget state (plus one button click) and wait for the script run to finish"""
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        for state in self.values.values():
+            message.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        if click is not None:
+            trigger = message.rerun_script.widget_states.widgets.add()
+            trigger.id = self.widgets[click].id
+            trigger.trigger_value = True
+
+        started_at = time.time()
+        started = time.perf_counter()
+        await self._websocket.send(message.SerializeToString())
+        widgets = {}
+        errors = 0
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self._websocket.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    errors += 1
+                widget = getattr(element, element_type)
+                if getattr(widget, "id", ""):
+                    widgets[_widget_name(widget)] = widget
+            elif kind == "script_finished" and forward.script_finished != _FINISHED_EARLY_FOR_RERUN:
+                break
+        seconds = time.perf_counter() - started
+
+        # Like the frontend, forget the state of widgets that are no longer on the page
+        self.widgets = widgets
+        live_ids = {widget.id for widget in widgets.values()}
+        self.values = {widget_id: state for widget_id, state in self.values.items() if widget_id in live_ids}
+        self.reruns.append({"session": self.index, "role": self.role, "action": action,
+                            "started_at": started_at, "seconds": seconds, "errors": errors})
+
+    def set_value(self, name, **value):
+        """Change a widget's value, e.g. set_value("wall_search", string_value="alice")"""
+        widget_id = self.widgets[name].id
+        state = self.values.get(widget_id)
+        if state is None:
+            state = self.values[widget_id] = WidgetState(id=widget_id)
+        for field, field_value in value.items():
+            setattr(state, field, field_value)
+
+    def can_click(self, name):
+        return name in self.widgets and not self.widgets[name].disabled
+
+    async def think(self, mean_seconds):
+        await asyncio.sleep(self.rng.expovariate(1 / mean_seconds) if mean_seconds > 0 else 0)
+
+    # --- Behaviour by role ---
+
+    async def view(self, think_seconds):
+        action = self.rng.choices([name for name, _ in VIEWER_ACTIONS],
+                                  weights=[weight for _, weight in VIEWER_ACTIONS])[0]
+        if action == "next_page" and self.can_click("next_page"):
+            await self.rerun("next_page", click="next_page")
+        elif action == "search" and "wall_search" in self.widgets:
+            self.set_value("wall_search", string_value=self.rng.choice(SEARCH_TERMS + [""]))
+            await self.rerun("search")
+        else:
+            await self.rerun("refresh", click="refresh_btn")
+        await self.think(think_seconds)
+
+    async def submit(self, think_seconds):
+        # Every field the browser commits is a rerun of its own
+        fields = {
+            "english_name": f"{self.rng.choice(ENGLISH_NAMES)} load {self.index}",
+            "chinese_name": self.rng.choice(CHINESE_NAMES),
+            "role_class": self.rng.choice(ROLES),
+            "thankful_for": " ".join(self.rng.sample(THANKS, 2)),
+        }
+        for name, value in fields.items():
+            self.set_value(name, string_value=value)
+            await self.rerun("type")
+            await self.think(think_seconds / 4)
+        await self.rerun("submit", click="Submit 提交")
+        await self.think(think_seconds)
+
+    async def reorder(self, think_seconds):
+        if "admin_pass" in self.widgets and "move_select" not in self.widgets:
+            self.set_value("admin_pass", string_value=ADMIN_PASSWORD)
+            await self.rerun("login")
+        if "move_select" not in self.widgets:
+            await self.rerun("refresh")
+            await self.think(think_seconds)
+            return
+
+        self.set_value("move_select", string_value=self.rng.choice(list(self.widgets["move_select"].options)))
+        await self.rerun("select")
+        await self.think(think_seconds / 4)
+        if self.rng.random() < 0.5 and self.can_click("move_top"):
+            await self.rerun("move_top", click="move_top")
+        elif "move_position" in self.widgets:
+            position = self.widgets["move_position"]
+            self.set_value("move_position", double_value=float(self.rng.randint(1, int(position.max or 1))))
+            await self.rerun("move", click="move_btn")
+        await self.think(think_seconds)
+
+    async def run(self, start_delay, stop_at, think):
+        await asyncio.sleep(start_delay)
+        await self.connect()
+        try:
+            await self.rerun("first_load")
+            behaviour = {"viewer": self.view, "submitter": self.submit, "admin": self.reorder}[self.role]
+            while time.time() < stop_at:
+                await behaviour(think[self.role])
+        finally:
+            await self.close()
+
+
+def _widget_name(widget):
+    # Widget IDs end in the widget's key; widgets without a key go by their label
+    key = widget.id.split("-", 2)[-1]
+    return widget.label if key == "None" else key
+
+
+async def drive(url, args):
+    """Run every session to the end of the test; returns all reruns"""
+    admins = min(args.admins, args.sessions)
+    submitters = min(round(args.sessions * args.submitters), args.sessions - admins)
+    roles = ["admin"] * admins + ["submitter"] * submitters + ["viewer"] * (args.sessions - admins - submitters)
+
+    sessions = [Session(url, index, role, random.Random(f"{args.seed}:{index}")) for index, role in enumerate(roles)]
+    stop_at = time.time() + args.ramp_up + args.duration
+    results = await asyncio.gather(
+        *[session.run(args.ramp_up * index / len(sessions), stop_at, args.think)
+          for index, session in enumerate(sessions)],
+        return_exceptions=True)
+    failures = [f"session {index}: {result!r}" for index, result in enumerate(results)
+                if isinstance(result, Exception)]
+    return [rerun for session in sessions for rerun in session.reruns], failures
+
+
+# --- Report ---
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def latency_summary(reruns):
+    seconds = [rerun["seconds"] for rerun in reruns]
+    return {"count": len(seconds), "mean": sum(seconds) / len(seconds) if seconds else None,
+            "p50": percentile(seconds, 50), "p95": percentile(seconds, 95), "p99": percentile(seconds, 99)}
+
+
+def summarize(reruns, samples, started, finished):
+    """Latency percentiles, throughput, storage ops/sec and RSS, overall and per interval"""
+    elapsed = finished - started
+    window = [sample for sample in samples if started <= sample["time"] <= finished] or samples[-1:]
+    first, last = window[0], window[-1]
+    sample_seconds = (last["time"] - first["time"]) or 1
+
+    def rate(counter_names, before, after, seconds):
+        return sum(after["counters"].get(name, 0) - before["counters"].get(name, 0) for name in counter_names) / seconds
+
+    timeline = []
+    for before, after in zip(window, window[1:]):
+        in_interval = [rerun for rerun in reruns if before["time"] <= rerun["started_at"] < after["time"]]
+        timeline.append({
+            "t": round(after["time"] - started, 3),
+            "reruns": len(in_interval),
+            "p95": percentile([rerun["seconds"] for rerun in in_interval], 95),
+            "storage_calls_per_second": rate(CALL_COUNTERS, before, after, after["time"] - before["time"]),
+            "rss_mb": after["rss_bytes"] / 1e6,
+        })
+
+    actions = sorted({rerun["action"] for rerun in reruns})
+    return {
+        "reruns": len(reruns),
+        "reruns_per_second": len(reruns) / elapsed if elapsed else None,
+        "errors": sum(rerun["errors"] for rerun in reruns),
+        "latency_seconds": latency_summary(reruns),
+        "latency_seconds_by_action": {action: latency_summary([rerun for rerun in reruns if rerun["action"] == action])
+                                      for action in actions},
+        "storage_per_second": {
+            "calls": rate(CALL_COUNTERS, first, last, sample_seconds),
+            "docs_read": rate(("docs_read",), first, last, sample_seconds),
+            "docs_written": rate(("docs_written",), first, last, sample_seconds),
+        },
+        "rss_mb": {"start": first["rss_bytes"] / 1e6, "end": last["rss_bytes"] / 1e6,
+                   "peak": max(sample["rss_bytes"] for sample in window) / 1e6},
+        "timeline": timeline,
+    }
+
+
+def parse_think(text):
+    think = {"viewer": 3.0, "submitter": 5.0, "admin": 4.0}
+    for part in filter(None, text.split(",")):
+        role, _, seconds = part.partition("=")
+        if role not in think:
+            raise argparse.ArgumentTypeError(f"Unknown role {role!r} (viewer, submitter or admin)")
+        think[role] = float(seconds)
+    return think
+
+
+def parse_setting(text):
+    name, _, value = text.partition("=")
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the thankful wall with concurrent simulated sessions")
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--submitters", type=float, default=0.2, help="Fraction of sessions that submit entries")
+    parser.add_argument("--admins", type=int, default=1, help="Sessions that log in and reorder")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load after the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which sessions join")
+    parser.add_argument("--think", type=parse_think, default=parse_think(""),
+                        help="Mean think time in seconds per role, e.g. viewer=3,submitter=5,admin=4")
+    parser.add_argument("--size", type=int, default=1000, help="Entries on the wall at the start")
+    parser.add_argument("--mode", choices=("listener", "polling"), default="listener")
+    parser.add_argument("--setting", type=parse_setting, action="append", default=[],
+                        help="Extra [wall] setting for the server, e.g. page_size=50 (repeatable)")
+    parser.add_argument("--sample-every", type=float, default=1.0, help="Seconds between server samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_results.json")
+    # Used internally to start the server subprocess
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--secrets", help=argparse.SUPPRESS)
+    parser.add_argument("--samples", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="wall-load-") as workdir:
+        process, port, samples_path = start_server(args, workdir)
+        try:
+            print(f"Server ready on port {port}; {args.sessions} sessions for {args.ramp_up:g}s ramp-up "
+                  f"+ {args.duration:g}s", flush=True)
+            started = time.time()
+            reruns, failures = asyncio.run(drive(f"ws://127.0.0.1:{port}/_stcore/stream", args))
+            finished = time.time()
+            time.sleep(args.sample_every)
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        with open(samples_path, encoding="utf-8") as samples_file:
+            samples = [json.loads(line) for line in samples_file if line.strip()]
+
+    summary = summarize(reruns, samples, started, finished)
+    latency = summary["latency_seconds"]
+    print(f"{summary['reruns']} reruns, {summary['reruns_per_second']:.1f}/s, {summary['errors']} errors, "
+          f"{len(failures)} failed sessions")
+    print(f"latency p50 {latency['p50'] * 1000:.0f} ms  p95 {latency['p95'] * 1000:.0f} ms  "
+          f"p99 {latency['p99'] * 1000:.0f} ms")
+    for action, action_latency in summary["latency_seconds_by_action"].items():
+        print(f"  {action:<11} {action_latency['count']:>6}  p50 {action_latency['p50'] * 1000:7.0f} ms  "
+              f"p95 {action_latency['p95'] * 1000:7.0f} ms  p99 {action_latency['p99'] * 1000:7.0f} ms")
+    storage = summary["storage_per_second"]
+    print(f"storage {storage['calls']:.1f} calls/s, {storage['docs_read']:.0f} docs read/s, "
+          f"{storage['docs_written']:.1f} docs written/s")
+    print(f"server RSS {summary['rss_mb']['start']:.0f} -> {summary['rss_mb']['end']:.0f} MB "
+          f"(peak {summary['rss_mb']['peak']:.0f} MB)")
+    for failure in failures:
+        print(f"  {failure}")
+
+    config = {name: value for name, value in vars(args).items()
+              if name not in ("serve", "port", "secrets", "samples", "output")}
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump({"environment": environment(), "config": config, "summary": summary, "failures": failures},
+                  output_file, ensure_ascii=False, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app's modules sit at the top of the repo and the Firestore fake in benchmarks/
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "benchmarks")]
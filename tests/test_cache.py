@@ -0,0 +1,186 @@
+"""SnapshotCache (single-flight loads, invalidation generations, stale fallback) and CardCache"""
+import threading
+import time
+
+import pytest
+
+from wall_cache import CardCache, SnapshotCache
+
+
+def test_hits_are_served_until_the_ttl_runs_out():
+    cache = SnapshotCache(ttl_seconds=0.05)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get("wall", loader) == 1
+    assert cache.get("wall", loader) == 1
+    time.sleep(0.06)
+    assert cache.get("wall", loader) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_invalidate_expires_a_collections_keys_except_kept_parts():
+    cache = SnapshotCache(ttl_seconds=60)
+    cache.get("wall", lambda: "listing")
+    cache.get(("wall", "page", 25, 0), lambda: "page")
+    cache.get(("wall", "search"), lambda: "index")
+    cache.get("other", lambda: "other")
+    cache.invalidate("wall", keep=("search",))
+
+    assert cache.peek("wall", fresh=True) is None
+    assert cache.peek(("wall", "page", 25, 0), fresh=True) is None
+    # Expired values are kept as the fallback
+    assert cache.peek("wall") == "listing"
+    assert cache.peek(("wall", "search"), fresh=True) == "index"
+    assert cache.peek("other", fresh=True) == "other"
+
+
+def test_load_that_raced_an_invalidation_is_not_kept_as_fresh():
+    cache = SnapshotCache(ttl_seconds=60)
+
+    def loader():
+        # A write lands while this read is in flight
+        cache.invalidate("wall")
+        return "before the write"
+
+    assert cache.get("wall", loader) == "before the write"
+    assert cache.get("wall", lambda: "after the write") == "after the write"
+
+
+def test_failed_reload_serves_the_last_good_copy_as_stale():
+    cache = SnapshotCache(ttl_seconds=0.01)
+    cache.get("wall", lambda: "good")
+    time.sleep(0.02)
+
+    def down():
+        raise ConnectionError("backend down")
+
+    assert cache.get("wall", down) == "good"
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.pop_stale() is not None
+    assert cache.pop_stale() is None
+    # The stale copy is served without calling the backend until STALE_RETRY_SECONDS have passed
+    assert cache.get("wall", down) == "good"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_failed_first_load_raises():
+    cache = SnapshotCache(ttl_seconds=60)
+
+    def down():
+        raise ConnectionError("backend down")
+
+    with pytest.raises(ConnectionError):
+        cache.get("wall", down)
+    with pytest.raises(ConnectionError):
+        cache.get_many([("wall", "entry", "a")], lambda keys: down())
+
+
+def test_refresh_updates_an_expired_value_but_not_an_invalidated_one():
+    cache = SnapshotCache(ttl_seconds=0.01)
+    cache.get("wall", lambda: ["first"])
+    time.sleep(0.02)
+    refreshed = cache.get("wall", lambda: ["reloaded"], refresh=lambda old: old + ["new"])
+    assert refreshed == ["first", "new"]
+    cache.invalidate("wall")
+    assert cache.get("wall", lambda: ["reloaded"], refresh=lambda old: old + ["new"]) == ["reloaded"]
+
+
+def test_none_is_returned_but_not_cached():
+    cache = SnapshotCache(ttl_seconds=60)
+    assert cache.get("wall", lambda: None) is None
+    assert cache.get("wall", lambda: "loaded") == "loaded"
+
+
+def test_concurrent_gets_share_one_load():
+    cache = SnapshotCache(ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def slow_loader():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "listing"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("wall", slow_loader))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["listing"] * 5
+    assert len(loads) == 1
+
+
+def test_get_many_waits_for_a_key_already_loading():
+    cache = SnapshotCache(ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+    loaded_keys = []
+
+    def slow_loader(keys):
+        loaded_keys.extend(keys)
+        started.set()
+        release.wait(5)
+        return {key: key[2].upper() for key in keys}
+
+    first = threading.Thread(target=lambda: cache.get_many([("wall", "entry", "a")], slow_loader))
+    first.start()
+    started.wait(5)
+
+    results = {}
+    second = threading.Thread(target=lambda: results.update(
+        cache.get_many([("wall", "entry", "a"), ("wall", "entry", "b")], slow_loader)))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == {("wall", "entry", "a"): "A", ("wall", "entry", "b"): "B"}
+    # "a" was only loaded once, by the first call
+    assert sorted(loaded_keys) == [("wall", "entry", "a"), ("wall", "entry", "b")]
+
+
+def counting_renderer(rendered):
+    def render_card(entry_id, info, position, compact):
+        rendered.append(entry_id)
+        return f"<div>{info['english_name']} #{position}</div>"
+    return render_card
+
+
+def test_card_is_rendered_again_only_when_what_it_shows_changes():
+    rendered = []
+    cards = CardCache(counting_renderer(rendered))
+    entry = {'english_name': 'Ann', 'thankful_for': 'tea'}
+    assert cards.render("a", entry, 3) == "<div>Ann #3</div>"
+    # Unplaced cards do not show their position, so moving them costs nothing
+    assert cards.render("a", entry, 4) == "<div>Ann #3</div>"
+    cards.render("a", {**entry, 'thankful_for': 'coffee'}, 4)
+    placed = {**entry, 'manual_order': 1}
+    cards.render("a", placed, 1)
+    cards.render("a", placed, 2)
+    assert rendered == ["a", "a", "a", "a"]
+    assert cards.stats()["hits"] == 1 and cards.stats()["cards"] == 1
+
+
+def test_least_recently_used_cards_are_evicted():
+    rendered = []
+    cards = CardCache(counting_renderer(rendered), max_cards=2)
+    entry = {'english_name': 'Ann'}
+    cards.render("a", entry, 1)
+    cards.render("b", entry, 2)
+    cards.render("a", entry, 1)
+    cards.render("c", entry, 3)
+    assert cards.stats()["cards"] == 2
+    # "b" was the least recently used, so it is the one rendered again
+    cards.render("a", entry, 1)
+    cards.render("b", entry, 2)
+    assert rendered == ["a", "b", "c", "b"]
@@ -0,0 +1,61 @@
+"""EntryStore fed by FakeSnapshotEmitter, the offline stand-in for a Firestore listener"""
+from bench_wall import synthetic_entries
+from wall_store import EntryStore, FakeSnapshotEmitter, order_key
+
+
+def wall_order(entries):
+    return sorted(entries, key=lambda entry_id: order_key(entry_id, entries[entry_id]))
+
+
+def listening_store(entries):
+    emitter = FakeSnapshotEmitter(entries)
+    store = EntryStore()
+    store.listen(emitter)
+    return emitter, store
+
+
+def test_listener_gets_every_existing_entry_in_wall_order():
+    entries = synthetic_entries(200)
+    _, store = listening_store(entries)
+    assert store.is_ready()
+    wall = store.snapshot()
+    assert list(wall) == wall_order(entries)
+    assert wall.stats.untimestamped == sum(1 for entry in entries.values() if not entry.get('timestamp'))
+    assert wall.untimestamped_ids() == list(wall)[len(wall) - wall.stats.untimestamped:]
+
+
+def test_changes_make_a_new_snapshot_and_leave_old_ones_alone():
+    entries = synthetic_entries(50)
+    emitter, store = listening_store(entries)
+    before = store.snapshot()
+    first, second = list(before)[:2]
+
+    emitter.emit('ADDED', 'zzzzNew', {'english_name': 'Newest', 'timestamp': 2_000_000_000})
+    emitter.emit('MODIFIED', second, {**entries[second], 'manual_order': -1})
+    emitter.emit('REMOVED', first)
+    entries['zzzzNew'] = {'english_name': 'Newest', 'timestamp': 2_000_000_000}
+    entries[second] = {**entries[second], 'manual_order': -1}
+    del entries[first]
+
+    after = store.snapshot()
+    assert list(after) == wall_order(entries)
+    assert after.position(second) == 1
+    assert first not in after
+    assert len(before) == 50 and first in before
+    assert before[second].get('manual_order') != -1
+
+
+def test_search_index_follows_the_listener():
+    emitter, store = listening_store(synthetic_entries(20))
+    index = store.search_index()
+    emitter.emit('ADDED', 'zzzzNew', {'english_name': 'Quillon', 'thankful_for': 'kindness'})
+    assert index.search('quillon') == (['zzzzNew'], 1)
+    emitter.emit('REMOVED', 'zzzzNew')
+    assert index.search('quillon') == ([], 0)
+
+
+def test_stop_unsubscribes():
+    emitter, store = listening_store(synthetic_entries(5))
+    store.stop()
+    emitter.emit('ADDED', 'zzzzNew', {'english_name': 'Late'})
+    assert 'zzzzNew' not in store.snapshot()
@@ -0,0 +1,64 @@
+"""LocalStorage: its write log after a crash, and the auto backend falling back to it"""
+from wall_storage import LocalStorage
+
+
+def open_wall(tmp_path):
+    return LocalStorage(str(tmp_path / "thankful_wall.json"), fsync=False)
+
+
+def test_write_after_a_torn_line_starts_a_new_line(tmp_path):
+    storage = open_wall(tmp_path)
+    storage.set_entry("a", {"english_name": "Ann"})
+    # The process died halfway through appending a record
+    with open(storage.log_path, "a", encoding="utf-8") as log_file:
+        log_file.write('{"op": "set", "id": "b", "da')
+
+    restarted = open_wall(tmp_path)
+    assert restarted.get_entries(["a", "b"]) == {"a": {"english_name": "Ann"}}
+    restarted.set_entry("c", {"english_name": "Cy"})
+
+    reloaded = open_wall(tmp_path)
+    assert set(reloaded.get_entries(["a", "b", "c"])) == {"a", "c"}
+    assert reloaded.skipped_records == 0
+
+
+def test_corrupt_line_is_skipped_on_replay(tmp_path):
+    storage = open_wall(tmp_path)
+    storage.set_entry("a", {"english_name": "Ann"})
+    # What an append glued onto a torn line used to leave behind
+    with open(storage.log_path, "a", encoding="utf-8") as log_file:
+        log_file.write('{"op": "set", "id": "b", "da{"op": "delete", "id": "a"}\n')
+    storage.set_entry("c", {"english_name": "Cy"})
+
+    reloaded = open_wall(tmp_path)
+    assert set(reloaded.get_entries(["a", "b", "c"])) == {"a", "c"}
+    assert reloaded.skipped_records == 1
+
+
+def test_auto_backend_tries_firebase_once_and_falls_back_quietly(tmp_path, monkeypatch):
+    import firebase_admin
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from bench_wall import APP_PATH
+
+    # No secrets file and no Firebase app: initialization fails
+    monkeypatch.chdir(tmp_path)
+    attempts = []
+
+    def no_app(*args):
+        attempts.append(args)
+        raise ValueError("no app")
+
+    monkeypatch.setattr(firebase_admin, "get_app", no_app)
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["wall"] = {"storage_backend": "auto", "local_path": str(tmp_path / "thankful_wall.json")}
+    at.run()
+    assert not at.exception and not at.error
+    assert any("local storage" in toast.value for toast in at.toast)
+
+    at.run()
+    assert not at.exception and not at.error
+    assert not at.toast
+    assert len(attempts) == 1
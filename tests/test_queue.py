@@ -0,0 +1,78 @@
+"""SubmissionQueue: batching, idempotency keys and retrying failed submissions"""
+import threading
+
+import pytest
+
+from wall_queue import SubmissionQueue
+
+
+class Recorder:
+    """write_batch that records each batch and can be told to fail"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail_next = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, entries):
+        with self.lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                raise ConnectionError("write failed")
+            self.batches.append(dict(entries))
+
+    def written(self):
+        return [key for batch in self.batches for key in batch]
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def test_burst_is_written_in_batches(recorder):
+    queue = SubmissionQueue(recorder, flush_interval=0.2, max_batch=3)
+    futures = [queue.submit(f"id{number}", {"english_name": f"N{number}"}) for number in range(7)]
+    assert [future.result(5) for future in futures] == [f"id{number}" for number in range(7)]
+    assert [len(batch) for batch in recorder.batches] == [3, 3, 1]
+    assert recorder.written() == [f"id{number}" for number in range(7)]
+    assert queue.stats()["written"] == 7
+    queue.close(5)
+
+
+def test_same_key_is_written_once(recorder):
+    queue = SubmissionQueue(recorder, flush_interval=0.1)
+    first = queue.submit("a", {"english_name": "Ann"})
+    # A double click while the first is pending, and a retry after it was written
+    assert queue.submit("a", {"english_name": "Ann"}) is first
+    first.result(5)
+    assert queue.submit("a", {"english_name": "Ann"}) is first
+    queue.flush(5)
+    assert recorder.written() == ["a"]
+    assert queue.stats()["duplicates"] == 2
+    queue.close(5)
+
+
+def test_failed_key_can_be_submitted_again(recorder):
+    queue = SubmissionQueue(recorder, flush_interval=0.01)
+    recorder.fail_next = 1
+    failed = queue.submit("a", {"english_name": "Ann"})
+    with pytest.raises(ConnectionError):
+        failed.result(5)
+    assert queue.stats()["failed"] == 1
+
+    retried = queue.submit("a", {"english_name": "Ann"})
+    assert retried is not failed
+    assert retried.result(5) == "a"
+    assert recorder.written() == ["a"]
+    assert queue.stats()["duplicates"] == 0
+    queue.close(5)
+
+
+def test_close_writes_what_is_pending_and_refuses_more(recorder):
+    queue = SubmissionQueue(recorder, flush_interval=10)
+    future = queue.submit("a", {"english_name": "Ann"})
+    queue.close(5)
+    assert future.result(0) == "a"
+    with pytest.raises(RuntimeError):
+        queue.submit("b", {"english_name": "Ben"})
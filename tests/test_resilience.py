@@ -0,0 +1,165 @@
+"""StorageGuard and the snapshot cache's stale fallback, driven through FakeFirestore faults
+
+No network and no credentials: FirestoreStorage talks to fake_firestore, and the
+app test runs from a temporary directory so no secrets file is read.
+"""
+import os
+import time
+
+import pytest
+from google.api_core import exceptions
+
+import fake_firestore
+from bench_wall import APP_PATH, synthetic_entries
+from wall_resilience import CLOSED, HALF_OPEN, OPEN, BackendUnavailable, ResilientStorage, StorageGuard
+from wall_storage import FirestoreStorage
+
+COLLECTION = "thankful_entries"
+
+
+@pytest.fixture
+def db():
+    db = fake_firestore.FakeFirestore()
+    db.collection(COLLECTION).seed(synthetic_entries(50))
+    return db
+
+
+def guarded(db, **options):
+    """(storage, guard) for the fake's wall collection, with no backoff sleeps"""
+    guard = StorageGuard(base_delay=0, firestore=True, **options)
+    return ResilientStorage(FirestoreStorage(db, COLLECTION), guard), guard
+
+
+def calls(db, name):
+    return db.snapshot_counters().get(name, 0)
+
+
+def test_breaker_opens_half_opens_and_closes(db):
+    storage, guard = guarded(db, retries=0, failure_threshold=2, reset_seconds=0.1)
+    db.inject_faults(error_rate=1.0)
+    for _ in range(2):
+        with pytest.raises(exceptions.ServiceUnavailable):
+            storage.get_entries(["a"])
+    assert guard.breaker.state == OPEN
+
+    # While open, calls fail straight away without reaching the backend
+    before = calls(db, "get_all")
+    with pytest.raises(BackendUnavailable):
+        storage.get_entries(["a"])
+    assert calls(db, "get_all") == before
+
+    # After reset_seconds one probe goes through; it succeeds, so the breaker closes
+    time.sleep(0.15)
+    db.inject_faults()
+    assert storage.get_entries(["a"]) == {}
+    assert guard.breaker.state == CLOSED
+    assert guard.breaker.consecutive_failures == 0
+
+
+def test_failed_probe_opens_the_breaker_again(db):
+    storage, guard = guarded(db, retries=0, failure_threshold=1, reset_seconds=0.1)
+    db.inject_faults(error_rate=1.0)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.get_entries(["a"])
+    time.sleep(0.15)
+    assert guard.breaker.allow()
+    assert guard.breaker.state == HALF_OPEN
+    guard.breaker.end_call()
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.get_entries(["a"])
+    assert guard.breaker.state == OPEN
+    assert guard.breaker.times_opened == 2
+
+
+def test_idempotent_calls_are_retried_up_to_the_cap(db):
+    storage, guard = guarded(db, retries=2)
+    db.inject_faults(fail_next=2)
+    assert len(storage.get_entries(list(synthetic_entries(3)))) == 3
+    assert calls(db, "get_all") == 3
+    assert guard.counters["storage_retries"] == 2
+
+    db.inject_faults(fail_next=5)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.get_entries(["a"])
+    # One try plus two retries, then the error is raised
+    assert calls(db, "get_all") == 6
+
+
+def test_non_idempotent_calls_are_not_retried(db):
+    storage, guard = guarded(db, retries=3)
+    entry_id = next(iter(synthetic_entries(1)))
+    db.inject_faults(fail_next=1)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.update_entries({entry_id: ({"manual_order": 1}, [])}, {entry_id: ({}, ["manual_order"])})
+    assert calls(db, "batch_commit") == 1
+    assert guard.counters["storage_retries"] == 0
+
+
+def test_stream_is_retried_before_it_yields(db):
+    storage, guard = guarded(db, retries=2)
+    db.inject_faults(fail_next=1)
+    assert len(list(storage.stream_entries())) == 50
+    assert calls(db, "stream") == 2
+
+
+def test_stream_is_not_retried_after_it_yields(db):
+    storage, guard = guarded(db, retries=2)
+    db.inject_faults(break_stream_after=10)
+    received = []
+    with pytest.raises(exceptions.ServiceUnavailable):
+        for item in storage.stream_entries():
+            received.append(item)
+    # Starting over would hand out the first ten entries twice
+    assert len(received) == 10
+    assert calls(db, "stream") == 1
+    assert guard.counters["storage_retries"] == 0
+
+
+def test_interrupted_probe_does_not_keep_the_breaker_half_open(db):
+    storage, guard = guarded(db, retries=0, failure_threshold=1, reset_seconds=0)
+    db.inject_faults(fail_next=1)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.get_entries(["a"])
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        guard.call("get_entries", interrupted)
+    # A stream closed early (GeneratorExit) while probing must give the probe back too
+    stream = storage.stream_entries()
+    next(stream)
+    stream.close()
+
+    assert storage.get_entries(["a"]) == {}
+    assert guard.breaker.state == CLOSED
+
+
+def test_snapshot_cache_serves_stale_copy_while_backend_is_down(db, tmp_path, monkeypatch):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Run away from the repo so .streamlit/secrets.toml is never read
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    fake_firestore.install(db)
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["wall"] = {"realtime_listener": False, "cache_ttl_seconds": 0.2, "storage_retries": 0,
+                          "local_path": os.path.join(tmp_path, "thankful_wall.json")}
+    at.run()
+    assert not at.exception
+    assert at.metric[0].value == "50"
+
+    db.inject_faults(error_rate=1.0)
+    time.sleep(0.3)
+    at.run()
+    assert not at.exception
+    assert not at.error
+    assert at.metric[0].value == "50"
+    assert any("not responding" in warning.value for warning in at.warning)
+
+    db.inject_faults()
+    time.sleep(0.3)
+    at.run()
+    assert not any("not responding" in warning.value for warning in at.warning)
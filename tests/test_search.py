@@ -0,0 +1,39 @@
+"""SearchIndex: English words, Chinese characters and prefixes of the word being typed"""
+from wall_search import SearchIndex
+
+ENTRIES = {
+    "a": {"english_name": "Alice", "chinese_name": "王芳", "role_class": "G10-2", "thankful_for": "my family 家人",
+          "timestamp": 1_700_000_002},
+    "b": {"english_name": "Ben", "chinese_name": "李明", "role_class": "Teacher", "thankful_for": "感恩节 music",
+          "timestamp": 1_700_000_001},
+    "c": {"english_name": "Alicia", "role_class": "G9-1", "thankful_for": "friends", "manual_order": 0},
+}
+
+
+def test_words_and_chinese_text_are_found():
+    index = SearchIndex.from_entries(ENTRIES)
+    assert index.search("family") == (["a"], 1)
+    assert index.search("感恩") == (["b"], 1)
+    assert index.search("恩") == (["b"], 1)
+    assert index.search("ben music") == (["b"], 1)
+    assert index.search("ben family") == ([], 0)
+
+
+def test_last_word_matches_as_a_prefix_letters_and_digits_alike():
+    index = SearchIndex.from_entries(ENTRIES)
+    # Ranked by score, then wall order (the manually placed entry first)
+    assert index.search("ali") == (["c", "a"], 2)
+    assert index.search("g1") == (["a"], 1)
+    assert index.search("g10 ali") == (["a"], 1)
+
+
+def test_updates_and_removals_keep_prefixes_in_step():
+    index = SearchIndex.from_entries(ENTRIES)
+    index.add("d", {"english_name": "Dana", "role_class": "G11-3", "timestamp": 1_700_000_005})
+    assert index.search("g11") == (["d"], 1)
+    assert index.newest_timestamp == 1_700_000_005
+    index.add("d", {"english_name": "Dana", "role_class": "G12-1", "timestamp": 1_700_000_005})
+    assert index.search("g11") == ([], 0)
+    index.remove("d")
+    assert index.search("g12") == ([], 0)
+    assert len(index) == 3
@@ -0,0 +1,65 @@
+"""SortedIndex against a plain sorted list, with buckets small enough to split and empty out"""
+import random
+
+import pytest
+
+from wall_store import SortedIndex
+
+
+@pytest.fixture(autouse=True)
+def small_buckets(monkeypatch):
+    monkeypatch.setattr(SortedIndex, "BUCKET_SIZE", 4)
+
+
+def check(index, expected):
+    assert len(index) == len(expected)
+    assert list(index) == expected
+    for start, stop in ((0, None), (3, 9), (len(expected) - 2, len(expected) + 5), (7, 7)):
+        assert list(index.slice(start, stop)) == expected[start:stop]
+    for position in range(0, len(expected), 7):
+        assert index.index(expected[position]) == position
+
+
+def test_random_adds_and_removes_match_a_sorted_list():
+    rng = random.Random(3)
+    items = [(rng.randint(0, 2), rng.random(), f"id{number}") for number in range(300)]
+    index = SortedIndex(items[:50])
+    expected = sorted(items[:50])
+    for item in items[50:]:
+        index.add(item)
+        expected.append(item)
+        expected.sort()
+        if rng.random() < 0.4:
+            removed = rng.choice(expected)
+            index.remove(removed)
+            expected.remove(removed)
+    check(index, sorted(expected))
+
+    # Empty it completely, bucket by bucket, then start again
+    for item in list(expected):
+        index.remove(item)
+    check(index, [])
+    index.add((1, 0.5, "again"))
+    check(index, [(1, 0.5, "again")])
+
+
+def test_missing_items_raise_value_error():
+    index = SortedIndex([(1, 1, "a"), (1, 2, "b")])
+    with pytest.raises(ValueError):
+        index.remove((1, 3, "c"))
+    with pytest.raises(ValueError):
+        index.index((0, 0, "z"))
+
+
+def test_copies_do_not_see_later_changes_on_either_side():
+    items = [(1, position, f"id{position}") for position in range(40)]
+    index = SortedIndex(items)
+    frozen = index.copy()
+    index.add((0, 0, "new"))
+    index.remove(items[10])
+    check(frozen, items)
+
+    other = frozen.copy()
+    frozen.remove(items[0])
+    check(other, items)
+    check(index, sorted([(0, 0, "new")] + items[:10] + items[11:]))
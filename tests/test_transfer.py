@@ -0,0 +1,84 @@
+"""Export and import: the streaming readers for each file format and the batched importer"""
+import io
+import json
+
+import pytest
+
+from bench_wall import synthetic_entries
+from wall_transfer import import_records, iter_records, write_export
+
+ENTRIES = {
+    "a": {"english_name": "Ann", "chinese_name": "安", "role_class": "G10-2", "thankful_for": "tea 茶",
+          "timestamp": 5.0},
+    "b": {"english_name": "Ben", "chinese_name": "本", "thankful_for": 'quotes " and, commas', "manual_order": 1},
+}
+
+
+def records(text, chunk_size=65536):
+    return list(iter_records(io.BytesIO(text.encode("utf-8")), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize("layout", ["pretty", "one line", "one entry per line"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_wall_json_is_read_in_any_layout_and_chunk_size(layout, chunk_size):
+    wall = {"version": 2, "entries": ENTRIES, "exported": [1, 2]}
+    if layout == "pretty":
+        text = json.dumps(wall, ensure_ascii=False, indent=2)
+    elif layout == "one line":
+        text = json.dumps(wall, ensure_ascii=False)
+    else:
+        text = '{"entries": {\n' + ",\n".join(
+            f"{json.dumps(entry_id)}: {json.dumps(entry, ensure_ascii=False)}" for entry_id, entry in ENTRIES.items()
+        ) + "\n}}\n"
+    assert records("\ufeff" + text, chunk_size) == list(ENTRIES.items())
+
+
+def test_truncated_wall_json_raises():
+    text = json.dumps({"entries": ENTRIES})[:-30]
+    with pytest.raises(ValueError):
+        records(text, chunk_size=8)
+
+
+def test_jsonl_keeps_going_past_a_bad_line():
+    text = '{"english_name": "Ann"}\nnot json\n\n{"english_name": "Ben"}\n'
+    read = records(text)
+    assert read[0] == (None, {"english_name": "Ann"})
+    assert isinstance(read[1][1], ValueError)
+    assert read[2] == (None, {"english_name": "Ben"})
+
+
+@pytest.mark.parametrize("export_format", ["jsonl", "csv"])
+def test_export_then_import_round_trips(export_format):
+    entries = synthetic_entries(120)
+    output = io.BytesIO()
+    write_export(entries.items(), export_format, output)
+    output.seek(0)
+
+    batches = []
+    # Chunks smaller than the file, but big enough for the first JSONL record (the format is sniffed from it)
+    report = import_records(iter_records(output, chunk_size=1000), batches.append, lambda: "unused", batch_size=50)
+    assert report.imported == 120 and report.skipped == 0
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    imported = {entry_id: entry for batch in batches for entry_id, entry in batch.items()}
+    assert set(imported) == set(entries)
+    for entry_id, entry in entries.items():
+        assert imported[entry_id]["thankful_for"] == entry["thankful_for"]
+        if "timestamp" in entry:
+            assert imported[entry_id]["timestamp"] == entry["timestamp"]
+
+
+def test_invalid_records_are_reported_and_skipped():
+    text = "\n".join(json.dumps(record, ensure_ascii=False) for record in [
+        {"english_name": "Ann", "chinese_name": "安", "thankful_for": "tea"},
+        {"english_name": "Ben", "thankful_for": "no chinese name"},
+        {"entry_id": "a/b", "english_name": "Cy", "chinese_name": "西", "thankful_for": "bad ID"},
+        {"english_name": "Di", "chinese_name": "迪", "thankful_for": "x" * 6000},
+    ])
+    batches = []
+    new_ids = iter(["new1", "new2"])
+    report = import_records(iter_records(io.BytesIO(text.encode("utf-8"))), batches.append, lambda: next(new_ids))
+    assert report.imported == 1 and report.skipped == 3
+    assert [error.split(":")[0] for error in report.errors] == ["Record 2", "Record 3", "Record 4"]
+    (batch,) = batches
+    assert batch["new1"]["role_class"] == "Not specified 未指定"
+    assert batch["new1"]["entry_id"] == "new1"
@@ -0,0 +1,126 @@
+"""Wall order in storage: FirestoreStorage.get_page's cursor pages, and moving an entry from the admin sidebar"""
+import math
+
+import pytest
+
+import fake_firestore
+from bench_wall import ADMIN_PASSWORD, APP_PATH, synthetic_entries
+from wall_storage import FirestoreStorage
+from wall_store import WallView
+
+COLLECTION = "thankful_entries"
+
+
+def wall_order(db):
+    return list(WallView.from_entries({doc.id: doc.to_dict() for doc in db.collection(COLLECTION).stream()}))
+
+
+def read_all_pages(storage, page_size, tail_ids):
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = storage.get_page(cursor, page_size, tail_ids)
+        pages.append([entry_id for entry_id, _ in page])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("size, page_size", [(0, 10), (30, 10), (37, 10), (300, 25), (300, 7)])
+def test_pages_follow_the_wall_order_including_the_untimestamped_tail(size, page_size):
+    db = fake_firestore.FakeFirestore()
+    entries = synthetic_entries(size)
+    db.collection(COLLECTION).seed(entries)
+    wall = WallView.from_entries(entries)
+
+    pages = read_all_pages(FirestoreStorage(db, COLLECTION), page_size, wall.untimestamped_ids)
+    assert [entry_id for page in pages for entry_id in page] == list(wall)
+    # Every page but the last is full, and the last one is not empty unless the wall is
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert pages[-1] or size == 0
+
+
+def test_tail_ids_are_only_asked_for_once_paging_reaches_the_tail():
+    db = fake_firestore.FakeFirestore()
+    entries = synthetic_entries(300)
+    db.collection(COLLECTION).seed(entries)
+    wall = WallView.from_entries(entries)
+    calls = []
+
+    def tail_ids():
+        calls.append(1)
+        return wall.untimestamped_ids()
+
+    storage = FirestoreStorage(db, COLLECTION)
+    page, cursor = storage.get_page(None, 25, tail_ids)
+    assert [entry_id for entry_id, _ in page] == list(wall)[:25]
+    assert not calls
+
+    # Skipped IDs from a stale tail (deleted since) leave the page short instead of failing
+    deleted = wall.untimestamped_ids()[0]
+    db.collection(COLLECTION).document(deleted).delete()
+    pages = read_all_pages(storage, 25, tail_ids)
+    assert calls
+    assert deleted not in [entry_id for page in pages for entry_id in page]
+
+
+@pytest.fixture
+def admin_app(tmp_path, monkeypatch):
+    """start(entries) runs the app on a fake wall and logs in as admin; returns (app, db)"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Run away from the repo so .streamlit/secrets.toml is never read
+    monkeypatch.chdir(tmp_path)
+
+    def start(entries):
+        st.cache_resource.clear()
+        db = fake_firestore.FakeFirestore()
+        db.collection(COLLECTION).seed(entries)
+        fake_firestore.install(db)
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.secrets["wall"] = {"realtime_listener": False, "local_path": str(tmp_path / "thankful_wall.json")}
+        at.run()
+        at.sidebar.text_input(key="admin_pass").input(ADMIN_PASSWORD).run()
+        assert not at.exception
+        return at, db
+
+    return start
+
+
+def move(at, entry_id, position):
+    at.sidebar.selectbox(key="move_select").set_value(entry_id).run()
+    at.sidebar.number_input(key="move_position").set_value(position).run()
+    at.sidebar.button(key="move_btn").click().run()
+    assert not at.exception and not at.error
+
+
+@pytest.mark.parametrize("from_position, to_position", [(30, 2), (2, 30), (35, 1), (1, 40), (12, 14)])
+def test_move_entry_puts_the_entry_at_the_chosen_position(admin_app, from_position, to_position):
+    at, db = admin_app(synthetic_entries(40))
+    before = wall_order(db)
+    moved = before[from_position - 1]
+    move(at, moved, to_position)
+
+    after = wall_order(db)
+    assert after.index(moved) == to_position - 1
+    # Everything else keeps its relative order
+    others = [entry_id for entry_id in before if entry_id != moved]
+    assert [entry_id for entry_id in after if entry_id != moved] == others
+
+
+def test_moving_between_orders_too_close_to_split_renumbers_them(admin_app):
+    entries = synthetic_entries(40)
+    first, second = list(entries)[:2]
+    entries[first]["manual_order"] = -2.0
+    # Adjacent floats: there is nothing between them
+    entries[second]["manual_order"] = math.nextafter(-2.0, 0)
+    at, db = admin_app(entries)
+    before = wall_order(db)
+    assert before[:2] == [first, second]
+
+    move(at, before[-1], 2)
+    after = wall_order(db)
+    assert after[:3] == [first, before[-1], second]
+    orders = [db.collection(COLLECTION).document(entry_id).get().to_dict()["manual_order"] for entry_id in after[:3]]
+    # The manually placed entries were renumbered 1..n
+    assert orders == [1, 2, 3]
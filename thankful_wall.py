@@ -1,12 +1,31 @@
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
+import hashlib
+import html
+import io
 import json
 import os
+import threading
 import time
+import uuid
+from collections import Counter
+
+from wall_cache import CardCache, SnapshotCache
+from wall_metrics import InstrumentedStorage, Metrics
+from wall_queue import SubmissionQueue
+from wall_resilience import ResilientStorage, StorageGuard
+from wall_search import SearchIndex
+from wall_maintenance import archive_wall
+from wall_storage import (DEFAULT_WALL, DELETE_FIELD, FirestoreStorage, LocalStorage, local_info_path,
+                          valid_wall_id, wall_collection, wall_info_document, wall_local_path)
+from wall_store import Entry, EntryStore, WallView, entry_timestamp
+from wall_transfer import EXPORT_FORMATS, import_records, iter_records, write_export
+
+# Projector/kiosk display: ?kiosk=1 shows a read-only wall that refreshes itself
+KIOSK_MODE = st.query_params.get("kiosk", "").lower() in ("1", "true", "yes", "on")
 
 # Set the page title and layout
-st.set_page_config(page_title="Thanksgiving Thankful Wall", layout="wide")
+st.set_page_config(page_title="Thanksgiving Thankful Wall", layout="wide",
+                   initial_sidebar_state="collapsed" if KIOSK_MODE else "auto")
 
 # Page header
 st.title("🦃 Happy Thanksgiving! 感恩节快乐! 🦃")
@@ -14,8 +33,9 @@ st.title("🦃 Happy Thanksgiving! 感恩节快乐! 🦃")
 # Add the smaller message about Python
 st.caption("This application was created entirely with Python! 这个应用程序完全使用Python创建!")
 
-# Mobile instructions
-st.info("""
+# Mobile instructions (there is no menu on the kiosk display)
+if not KIOSK_MODE:
+    st.info("""
 📱 **Mobile Users | 手机用户:** 
 Tap the two arrows (>>) in the **top left** to open the menu and add your entry!
 点击**左上角**的两个箭头 (>>) 打开菜单添加您的条目！
@@ -44,205 +64,929 @@ This is a special time of the year when we gather to express gratitude for all t
 """)
 
 
-# Initialize Firebase
-def initialize_firebase():
+def get_setting(name, default):
+    """Read an optional app setting from the [wall] section of Streamlit secrets"""
+    try:
+        return st.secrets.get("wall", {}).get(name, default)
+    except Exception:
+        return default
+
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide timing spans and storage counters; a no-op unless metrics_enabled is set"""
+    return Metrics(enabled=bool(get_setting("metrics_enabled", False)),
+                   log_path=get_setting("metrics_log_path", None),
+                   prometheus_path=get_setting("metrics_prometheus_path", None))
+
+
+metrics = get_metrics()
+rerun_stats = metrics.start_rerun()
+
+
+@st.cache_resource(show_spinner=False)
+def get_firestore_client():
+    """Create the Firestore client once per process and warm up its connection
+
+    firebase_admin and the Google client libraries are only imported here, so the
+    page header renders before any of them load.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     try:
-        # Check if Firebase app is already initialized
-        if not firebase_admin._apps:
-            # Use Streamlit secrets for Firebase configuration
-            firebase_config = {
-                "type": st.secrets["firebase"]["type"],
-                "project_id": st.secrets["firebase"]["project_id"],
-                "private_key_id": st.secrets["firebase"]["private_key_id"],
-                "private_key": st.secrets["firebase"]["private_key"].replace('\\n', '\n'),
-                "client_email": st.secrets["firebase"]["client_email"],
-                "client_id": st.secrets["firebase"]["client_id"],
-                "auth_uri": st.secrets["firebase"]["auth_uri"],
-                "token_uri": st.secrets["firebase"]["token_uri"],
-                "auth_provider_x509_cert_url": st.secrets["firebase"]["auth_provider_x509_cert_url"],
-                "client_x509_cert_url": st.secrets["firebase"]["client_x509_cert_url"]
-            }
-
-            cred = credentials.Certificate(firebase_config)
-            firebase_admin.initialize_app(cred)
-
-        return firestore.client()
+        firebase_admin.get_app()
+    except ValueError:
+        # Use Streamlit secrets for Firebase configuration
+        firebase_config = dict(st.secrets["firebase"])
+        firebase_config["private_key"] = firebase_config["private_key"].replace('\\n', '\n')
+        firebase_admin.initialize_app(credentials.Certificate(firebase_config))
+
+    client = firestore.client()
+
+    def warm_up():
+        # Open the gRPC channel and fetch an auth token before the first real read needs them
+        try:
+            list(client.collection(ENTRIES_COLLECTION).select([]).limit(1).stream())
+        except Exception:
+            pass
+
+    threading.Thread(target=warm_up, name="firestore-warm-up", daemon=True).start()
+    return client
+
+
+@st.cache_resource(show_spinner=False)
+def get_firestore_client_or_error():
+    """(client, None), or (None, error) if Firebase cannot be initialized
+
+    cache_resource does not cache exceptions, so the error is returned instead:
+    a failed initialization is tried once per process, not on every rerun.
+    """
+    try:
+        return get_firestore_client(), None
     except Exception as e:
-        st.error(f"Firebase initialization error: {e}")
-        return None
+        return None, e
 
 
 # Initialize Firebase
-db = initialize_firebase()
+def initialize_firebase():
+    client, error = get_firestore_client_or_error()
+    if error is None:
+        return client
+    if STORAGE_BACKEND == "auto":
+        # The local backend serves the wall, so say so once per session rather than show an error every rerun
+        if not st.session_state.get('local_fallback_noticed'):
+            st.session_state.local_fallback_noticed = True
+            st.toast(f"Firebase is unavailable ({error}); using local storage. 无法连接 Firebase，改用本地存储。",
+                     icon="💾")
+    else:
+        st.error(f"Firebase initialization error: {error}")
+    return None
+
+
+# Where the wall lives: "firestore" (default), "local" (thankful_wall.json + write
+# log, no cloud needed) or "auto" (Firestore, falling back to local if it fails)
+STORAGE_BACKEND = get_setting("storage_backend", "firestore")
+
+# Which wall to show: ?wall=<id> in the URL, else the wall_id setting. Every wall has
+# its own collection, so caches, listeners, stats and ordering are all per wall.
+# Walls other than the default one must be listed in the walls setting or have an
+# info document (see known_wall below).
+WALL_ID = st.query_params.get("wall") or get_setting("wall_id", DEFAULT_WALL)
+if not valid_wall_id(WALL_ID):
+    st.error("Unknown wall: wall IDs use only letters, digits, - and _ 感恩墙ID只能包含字母、数字、- 和 _")
+    st.stop()
+
+ENTRIES_COLLECTION = wall_collection(WALL_ID)
+
+# How far back incremental refreshes (the kiosk, the search index) look for entries written after a newer one
+REFRESH_LOOKBACK_SECONDS = 10
+
+# Most new entries a search index refresh fetches; with more than that it is rebuilt instead
+SEARCH_REFRESH_LIMIT = 500
+
+# What the sorted wall listing needs: names and role for the admin lists and the
+# stats, plus the two fields that decide the order. thankful_for, the bulk of each
+# document, is only fetched for entries that are actually shown or edited.
+LISTING_FIELDS = ('english_name', 'chinese_name', 'role_class', 'manual_order', 'timestamp')
+
+
+@st.cache_resource
+def get_snapshot_cache():
+    """One snapshot cache shared by every session in this Streamlit process"""
+    return SnapshotCache(float(get_setting("cache_ttl_seconds", 30)))
+
+
+snapshot_cache = get_snapshot_cache()
+# Stale snapshots are reported per rerun
+snapshot_cache.pop_stale()
+
+
+@st.cache_resource
+def get_local_storage(path):
+    """One local storage per process, so every session shares the same locks and log offset"""
+    return LocalStorage(path, compact_every=int(get_setting("local_compact_every", 1000)))
+
+
+@st.cache_resource
+def get_storage_guard(backend_name):
+    """Retries and circuit breaker shared by every session, so one outage trips it for all of them"""
+    return StorageGuard(retries=int(get_setting("storage_retries", 2)),
+                        deadline=float(get_setting("storage_deadline_seconds", 15)),
+                        failure_threshold=int(get_setting("breaker_failures", 5)),
+                        reset_seconds=float(get_setting("breaker_reset_seconds", 30)),
+                        count=metrics.count if metrics.enabled else None,
+                        firestore=backend_name == "FirestoreStorage")
+
+
+def open_storage(collection_name, local_path, info_document=None):
+    """The backend for one collection (or local file), wrapped for metrics and retries; None if unavailable"""
+    opened = None
+    if db is not None:
+        # Each RPC gives up after its deadline instead of the client's long default
+        opened = FirestoreStorage(db, collection_name, info_document=info_document,
+                                  timeout=float(get_setting("storage_timeout_seconds", 5)),
+                                  scan_timeout=float(get_setting("storage_scan_timeout_seconds", 120)))
+    elif STORAGE_BACKEND in ("local", "auto"):
+        try:
+            opened = get_local_storage(local_path)
+        except Exception as e:
+            st.error(f"Local storage error: {e}")
+            return None
+    if opened is not None and metrics.enabled:
+        # Time and count every storage call (only when metrics are switched on)
+        opened = InstrumentedStorage(opened, metrics)
+    if opened is not None:
+        # Retry what is safe to retry and fail fast while the backend is down (each attempt is timed above)
+        opened = ResilientStorage(opened, storage_guard)
+    return opened
+
+
+db = None
+if STORAGE_BACKEND in ("firestore", "auto"):
+    # Initialize Firebase
+    with metrics.span("initialize_firebase"):
+        db = initialize_firebase()
+backend_name = "FirestoreStorage" if db is not None else "LocalStorage"
+storage_guard = get_storage_guard(backend_name)
+
+LOCAL_PATH = get_setting("local_path", "thankful_wall.json")
+
+
+def get_wall_info(info_storage):
+    """This wall's info document (e.g. whether it is archived), or None if it has none
+
+    Cached like the wall itself, but only once it exists, so made-up wall IDs
+    do not fill the cache.
+    """
+    if info_storage is None:
+        return None
+    try:
+        return snapshot_cache.get((ENTRIES_COLLECTION, 'info'), info_storage.get_wall_info)
+    except Exception:
+        # The wall reads below report the problem
+        return None
 
 
-def get_all_entries():
-    """Get all entries from Firestore"""
-    if db is None:
-        return {}
+def known_wall(wall_id, wall_info):
+    """Whether a wall may be opened: the default wall, one in the walls setting, or one with an info document
 
+    Anything else would start a listener and fill caches (and, for local storage,
+    create files) for whatever ID someone typed into the URL.
+    """
+    if wall_id == DEFAULT_WALL or wall_id in get_setting("walls", []):
+        return True
+    if db is None:
+        # Checked before the local files are opened, so nothing is created for an unknown wall
+        return os.path.exists(local_info_path(wall_local_path(LOCAL_PATH, wall_id)))
+    return wall_info is not None
+
+
+live_storage = None
+wall_info = None
+if db is not None:
+    live_storage = open_storage(ENTRIES_COLLECTION, None, info_document=wall_info_document(WALL_ID))
+    wall_info = get_wall_info(live_storage)
+if not known_wall(WALL_ID, wall_info):
+    st.error(f"Unknown wall: {WALL_ID} 未知的感恩墙")
+    st.stop()
+if live_storage is None:
+    live_storage = open_storage(ENTRIES_COLLECTION, wall_local_path(LOCAL_PATH, WALL_ID))
+    wall_info = get_wall_info(live_storage)
+wall_info = wall_info or {}
+
+# An archived wall is read from the archive, without a listener, and takes no new entries
+WALL_ARCHIVED = bool(wall_info.get('archived'))
+storage = live_storage
+if WALL_ARCHIVED:
+    storage = open_storage(wall_collection(WALL_ID, archived=True),
+                           wall_local_path(LOCAL_PATH, WALL_ID, archived=True))
+# The collection actually read: cached reads are keyed by it, so live and archived entries never mix
+WALL_COLLECTION = wall_collection(WALL_ID, archived=WALL_ARCHIVED)
+
+
+@st.cache_resource
+def get_entry_store(backend_name, collection_name, _storage):
+    """Start one real-time listener per wall and process that mirrors the wall into memory"""
+    store = EntryStore()
+    store.listen(_storage)
+    # Give the first viewer a moment to receive the initial snapshot
+    store.wait_until_ready(timeout=5)
+    return store
+
+
+entry_store = None
+if storage is not None and not WALL_ARCHIVED and get_setting("realtime_listener", True):
     try:
-        entries_ref = db.collection('thankful_entries')
-        docs = entries_ref.stream()
+        entry_store = get_entry_store(backend_name, ENTRIES_COLLECTION, storage)
+    except Exception as e:
+        st.warning(f"Live updates unavailable, reading the wall directly instead: {e}")
 
-        entries = {}
-        for doc in docs:
-            entries[doc.id] = doc.to_dict()
 
-        return entries
-    except Exception as e:
-        st.error(f"Error getting entries: {e}")
-        return {}
+def split_update(new_data):
+    """Split an update dict into (fields, removed_fields); removed fields are set to DELETE_FIELD"""
+    removed_fields = [field for field, value in new_data.items() if value is DELETE_FIELD]
+    fields = {field: value for field, value in new_data.items() if value is not DELETE_FIELD}
+    return fields, removed_fields
+
+
+def mirror_update(entry_id, new_data):
+    """Apply a partial update to the live store right away; the listener confirms it later"""
+    if entry_store is None:
+        return
+    fields, removed_fields = split_update(new_data)
+    entry_store.patch(entry_id, fields, removed_fields)
 
 
 def get_all_entries_sorted():
-    """Get all entries sorted by manual order, then by timestamp (newest first)"""
-    if db is None:
+    """Get all entries sorted by manual order, then by timestamp (newest first)
+
+    Read from the live entry store when the listener is running (no network round
+    trip at all). Otherwise served from the shared snapshot cache, so reruns only
+    hit storage when the TTL has expired or a write has invalidated the snapshot.
+    """
+    if storage is None:
         return {}
 
     try:
-        entries_ref = db.collection('thankful_entries')
-        docs = entries_ref.stream()
-
-        manual_ordered = []
-        auto_ordered = []
-        
-        for doc in docs:
-            entry_data = doc.to_dict()
-            entry_data['firebase_id'] = doc.id
-            
-            # Separate entries with manual order from those without
-            if entry_data.get('manual_order') is not None:
-                manual_ordered.append((doc.id, entry_data))
-            else:
-                auto_ordered.append((doc.id, entry_data))
-        
-        # Sort manually ordered entries by their manual_order (ascending)
-        manual_ordered.sort(key=lambda x: x[1].get('manual_order', 999999))
-        
-        # Sort auto entries by timestamp (newest first)
-        # Handle entries with and without timestamps properly
-        auto_ordered_with_timestamp = []
-        auto_ordered_without_timestamp = []
-        
-        for entry in auto_ordered:
-            if entry[1].get('timestamp'):
-                auto_ordered_with_timestamp.append(entry)
-            else:
-                auto_ordered_without_timestamp.append(entry)
-        
-        # Sort entries with timestamps (newest first)
-        auto_ordered_with_timestamp.sort(key=lambda x: x[1].get('timestamp', 0), reverse=True)
-        
-        # Sort entries without timestamps by Firebase ID (newest first)
-        # Firebase IDs are chronological, so reverse gives newest first
-        auto_ordered_without_timestamp.sort(key=lambda x: x[0], reverse=True)
-        
-        # Combine all auto entries: timestamped first, then non-timestamped
-        auto_ordered = auto_ordered_with_timestamp + auto_ordered_without_timestamp
-        
-        # Combine: manual ordered first, then auto ordered (newest first)
-        sorted_entries = {}
-        for entry_id, entry_data in manual_ordered + auto_ordered:
-            sorted_entries[entry_id] = entry_data
-        
-        return sorted_entries
+        # Pick up writes made by other processes (a no-op for Firestore)
+        storage.sync()
+        if entry_store is not None and entry_store.is_ready():
+            return entry_store.snapshot()
+        wall = snapshot_cache.get(WALL_COLLECTION, load_sorted_entries)
     except Exception as e:
         st.error(f"Error getting sorted entries: {e}")
         return {}
+    return with_own_submissions(wall)
 
 
-def add_single_entry(entry_data):
-    """Add a single entry to Firestore"""
-    if db is None:
-        st.error("Database not connected")
-        return False
+def with_own_submissions(wall):
+    """The cached wall plus this session's submissions that it does not show yet
+
+    Without the listener nothing updates the shared snapshot straight away, so
+    each session lays its own unsaved or not yet reloaded entries over it.
+    """
+    pending = st.session_state.get('optimistic_entries')
+    if not pending:
+        return wall
+    for entry_id in [entry_id for entry_id in pending if entry_id in wall]:
+        # The snapshot has caught up with this one
+        del pending[entry_id]
+    return wall.with_entries(pending) if pending else wall
+
+
+def load_sorted_entries():
+    """Read the listing fields of every entry from storage and sort them"""
+    entries = {entry_id: Entry(entry_id, entry_data)
+               for entry_id, entry_data in storage.stream_entries(fields=LISTING_FIELDS)}
+
+    with metrics.span("sort"):
+        return WallView.from_entries(entries)
+
+
+def search_entries(query, limit):
+    """Best matches for a search query as (entry_ids, total_matches)
+
+    Answered from an inverted index instead of scanning the wall. The live entry
+    store keeps its index up to date. Without it the index is cached: writes made
+    here update it in place (see update_search_index), when the TTL runs out it
+    picks up the entries added since, and it is only rebuilt after bulk changes
+    such as an import or every search_rebuild_seconds.
+    """
+    if entry_store is not None and entry_store.is_ready():
+        return entry_store.search_index().search(query, limit)
 
     try:
-        entries_ref = db.collection('thankful_entries')
-        # Generate a new document ID
-        new_doc_ref = entries_ref.document()
-        entry_data['entry_id'] = new_doc_ref.id
-        entry_data['timestamp'] = time.time()  # ADD TIMESTAMP for reliable sorting
-        new_doc_ref.set(entry_data)
-        return True
+        search_index = snapshot_cache.get((WALL_COLLECTION, 'search'), load_search_index,
+                                          refresh=refresh_search_index)
     except Exception as e:
-        st.error(f"Error adding entry: {e}")
-        return False
+        st.error(f"Error searching entries: {e}")
+        return [], 0
+    return search_index.search(query, limit) if search_index else ([], 0)
+
+
+def load_search_index():
+    """Index every entry on the wall"""
+    # Needs the full documents (thankful_for is searchable), unlike the projected listing
+    return SearchIndex.from_entries(dict(storage.stream_entries()))
+
+
+def refresh_search_index(search_index):
+    """Add the entries written since the index was last brought up to date, instead of indexing the wall again
+
+    Edits and deletions made by other processes are not seen that way, so the
+    index is still rebuilt every search_rebuild_seconds.
+    """
+    if time.monotonic() - search_index.created_at > float(get_setting("search_rebuild_seconds", 600)):
+        return load_search_index()
+    newer = storage.get_entries_since(search_index.newest_timestamp - REFRESH_LOOKBACK_SECONDS,
+                                      SEARCH_REFRESH_LIMIT)
+    if len(newer) == SEARCH_REFRESH_LIMIT:
+        # There may be more than one fetch can tell
+        return load_search_index()
+    for entry_id, entry_data in newer:
+        search_index.add(entry_id, entry_data)
+    return search_index
+
+
+def update_search_index(entry_id, entry_data=None):
+    """Apply one write to the cached search index, if there is one; entry_data=None removes the entry
+
+    entry_data must be the whole entry (every searchable field plus the order
+    fields). Safe to call from the submission queue's thread.
+    """
+    search_index = snapshot_cache.peek((WALL_COLLECTION, 'search'))
+    if search_index is None:
+        return
+    if entry_data is None:
+        search_index.remove(entry_id)
+    else:
+        search_index.add(entry_id, entry_data)
+
+
+def get_full_entries(entry_ids):
+    """Full entries, thankful_for included, as {entry_id: Entry}
+
+    The live entry store already holds them. Otherwise the missing ones are
+    fetched with one batched get and cached per entry, separately from the
+    projected wall listing.
+    """
+    if storage is None:
+        return {}
+
+    if entry_store is not None and entry_store.is_ready():
+        wall = entry_store.snapshot()
+        return {entry_id: wall[entry_id] for entry_id in entry_ids if entry_id in wall}
+
+    def load_entries(missing_keys):
+        loaded = storage.get_entries([key[2] for key in missing_keys])
+        return {(WALL_COLLECTION, 'entry', entry_id): Entry(entry_id, entry_data)
+                for entry_id, entry_data in loaded.items()}
+
+    keys = [(WALL_COLLECTION, 'entry', entry_id) for entry_id in entry_ids]
+    try:
+        found = snapshot_cache.get_many(keys, load_entries)
+    except Exception as e:
+        st.error(f"Error getting entries: {e}")
+        return {}
+    return {key[2]: found[key] for key in keys if key in found}
+
+
+def get_wall_page(page_number, page_size):
+    """Get one page of the sorted wall as (page_entries, has_next_page)
+
+    Sliced straight out of the live entry store when the listener is running.
+    Otherwise pages come from cursor queries and are cached for every session, so
+    viewers never stream the whole collection just to look at the wall. A session
+    whose own submissions the cache does not show yet pages its overlay instead.
+    """
+    if storage is None:
+        return [], False
+
+    if entry_store is not None and entry_store.is_ready():
+        wall = entry_store.snapshot()
+        start = page_number * page_size
+        return list(wall.slice(start, start + page_size)), start + page_size < len(wall)
+
+    pending = st.session_state.get('optimistic_entries')
+    if pending:
+        # This session's own submissions are not in the cached pages yet: page the wall they are laid over
+        # (which also forgets the ones the cached wall has caught up with)
+        wall = get_all_entries_sorted()
+        if pending and wall:
+            start = page_number * page_size
+            page_ids = [entry_id for entry_id, _ in wall.slice(start, start + page_size)]
+            full_entries = get_full_entries([entry_id for entry_id in page_ids if entry_id not in pending])
+            full_entries.update(pending)
+            return ([(entry_id, full_entries[entry_id]) for entry_id in page_ids if entry_id in full_entries],
+                    start + page_size < len(wall))
+
+    try:
+        page = load_cached_page(page_number, page_size)
+    except Exception as e:
+        st.error(f"Error getting entries: {e}")
+        return [], False
+    return page['entries'], page['next_cursor'] is not None
+
+
+def load_cached_page(page_number, page_size):
+    """One cursor-query page from the shared cache (earlier pages supply the cursor)"""
+    def page_key(number):
+        return WALL_COLLECTION, 'page', page_size, number
+
+    def tail_ids():
+        # Entries without a timestamp are paged from the cached listing instead of a scan by ID,
+        # which is only loaded once a page reaches them
+        listing = get_all_entries_sorted()
+        return listing.untimestamped_ids() if isinstance(listing, WallView) else []
+
+    def load_page(cursor):
+        page_entries, next_cursor = storage.get_page(cursor, page_size, tail_ids)
+        return {'entries': [(entry_id, Entry(entry_id, entry_data)) for entry_id, entry_data in page_entries],
+                'next_cursor': next_cursor}
+
+    # Start after the nearest earlier page that is still fresh, then load forward one page at a time
+    first = page_number
+    cursor = None
+    while first > 0:
+        previous = snapshot_cache.peek(page_key(first - 1), fresh=True)
+        if previous is not None:
+            cursor = previous['next_cursor']
+            break
+        first -= 1
+
+    page = None
+    for number in range(first, page_number + 1):
+        if number > 0 and cursor is None:
+            return {'entries': [], 'next_cursor': None}
+        page = snapshot_cache.get(page_key(number), lambda: load_page(cursor))
+        cursor = page['next_cursor']
+    return page
+
+
+def get_entries_since(timestamp, limit):
+    """Up to `limit` entries added after `timestamp` (newest first), for kiosk refreshes
+
+    Read from the live entry store when the listener is running, otherwise
+    straight from storage. Either way the cost grows with the number of new
+    entries, not with the size of the wall.
+    """
+    if storage is None:
+        return []
+
+    if entry_store is not None and entry_store.is_ready():
+        return list(entry_store.snapshot().newer_than(timestamp, limit))
+
+    try:
+        newer = storage.get_entries_since(timestamp, limit)
+    except Exception as e:
+        st.error(f"Error getting new entries: {e}")
+        return []
+    return [(entry_id, Entry(entry_id, entry_data)) for entry_id, entry_data in newer]
+
+
+@st.cache_resource
+def get_submission_queue(backend_name, collection_name, _storage):
+    """One write-coalescing queue per wall and process: submissions from every session are written in batches"""
+    def record_flush(count, seconds, error):
+        if metrics.enabled:
+            metrics.record_span("submission_flush", seconds)
+            metrics.count("submissions_flushed", count)
+
+    return SubmissionQueue(_storage.set_entries, flush_interval=float(get_setting("submit_flush_interval", 0.05)),
+                           on_flush=record_flush)
+
+
+def submission_key(entry_data):
+    """Idempotency key (and document ID) for a submission from this session
+
+    The same session submitting the same text twice (a double click, or a retry)
+    gets the same key, so it ends up as one document.
+    """
+    if 'submission_token' not in st.session_state:
+        st.session_state.submission_token = uuid.uuid4().hex
+    payload = json.dumps([st.session_state.submission_token, entry_data], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def add_single_entry_async(entry_data, idempotency_key):
+    """Add an entry straight to the wall and queue the storage write
+
+    The entry is put into the live entry store right away (without the listener,
+    into this session's overlay of the cached wall), so it shows up on this
+    rerun; the submission queue writes it together with everyone else's. Returns
+    a future that resolves once storage has the document (and raises if it could
+    not be saved), or None if the database is not connected. A key that is already
+    queued or written gets the earlier future back instead of a second document.
+    """
+    if storage is None:
+        st.error("Database not connected")
+        return None
+
+    # The idempotency key doubles as the document ID
+    entry_id = idempotency_key
+    entry_data['entry_id'] = entry_id
+    entry_data['timestamp'] = time.time()  # ADD TIMESTAMP for reliable sorting
+    if entry_store is not None and entry_id not in entry_store.snapshot():
+        entry_store.upsert(entry_id, entry_data)
+    if entry_store is None or not entry_store.is_ready():
+        st.session_state.setdefault('optimistic_entries', {})[entry_id] = Entry(entry_id, entry_data)
+    update_search_index(entry_id, entry_data)
+
+    def confirm(future):
+        # Runs on the queue's thread: no st.* calls in here
+        if future.exception() is not None:
+            update_search_index(entry_id)
+            if entry_store is not None:
+                entry_store.remove(entry_id)
+        snapshot_cache.invalidate(WALL_COLLECTION, keep=('search',))
+
+    future = get_submission_queue(backend_name, ENTRIES_COLLECTION, storage).submit(entry_id, entry_data)
+    future.add_done_callback(confirm)
+    return future
 
 
 def delete_entry(entry_id):
-    """Delete a specific entry from Firestore"""
-    if db is None:
+    """Delete a specific entry from storage"""
+    if storage is None:
         st.error("Database not connected")
         return False
 
     try:
-        db.collection('thankful_entries').document(entry_id).delete()
+        storage.delete_entry(entry_id)
+        update_search_index(entry_id)
+        snapshot_cache.invalidate(WALL_COLLECTION, keep=('search',))
+        if entry_store is not None:
+            entry_store.remove(entry_id)
         return True
     except Exception as e:
         st.error(f"Error deleting entry: {e}")
         return False
 
 
-def update_entry_order(entry_id, new_data):
-    """Update a specific entry with new data"""
-    if db is None:
+def update_entries_order(new_orders, entries):
+    """Set manual_order for many entries at once, all or nothing
+
+    new_orders maps entry_id to its new manual_order (or DELETE_FIELD to
+    remove it). Only entries whose order actually changes are written, in as few
+    batched commits as the backend allows.
+    Returns (success, number_of_entries_changed).
+    """
+    if storage is None:
         st.error("Database not connected")
-        return False
+        return False, 0
+
+    updates = {}
+    rollback = {}
+    for entry_id, new_order in new_orders.items():
+        old_order = entries[entry_id].get('manual_order') if entry_id in entries else None
+        if new_order is DELETE_FIELD:
+            if old_order is None:
+                continue
+            updates[entry_id] = ({}, ['manual_order'])
+        elif old_order == new_order:
+            continue
+        else:
+            updates[entry_id] = ({'manual_order': new_order}, [])
+        rollback[entry_id] = ({}, ['manual_order']) if old_order is None else ({'manual_order': old_order}, [])
+
+    if not updates:
+        return True, 0
 
     try:
-        db.collection('thankful_entries').document(entry_id).update(new_data)
-        return True
+        storage.update_entries(updates, rollback, workers=int(get_setting("batch_commit_workers", 1)))
     except Exception as e:
-        st.error(f"Error updating entry: {e}")
-        return False
+        st.error(f"Error updating order: {e}")
+        snapshot_cache.invalidate(WALL_COLLECTION)
+        return False, 0
+
+    snapshot_cache.invalidate(WALL_COLLECTION, keep=('search',))
+    search_index = snapshot_cache.peek((WALL_COLLECTION, 'search'))
+    for entry_id, (fields, removed_fields) in updates.items():
+        if search_index is not None and entry_id in entries:
+            # Only the order changed, which breaks ties between equally good matches
+            search_index.reorder(entry_id, entries[entry_id].replace(fields, removed_fields))
+        if entry_store is not None:
+            entry_store.patch(entry_id, fields, removed_fields)
+    return True, len(updates)
+
+
+def move_entry(entry_id, new_position, entries):
+    """Move one entry to new_position (1-based) on the wall
+
+    Only the moved entry is written: it gets a manual_order between its new
+    neighbours (a fraction if needed). Moving below entries that have no manual
+    order pins those entries first, and the manual entries are renumbered 1..n
+    in the rare case two neighbours' orders are too close to split.
+    Returns (success, number_of_entries_changed).
+    """
+    order = [other_id for other_id in entries if other_id != entry_id]
+    target = min(max(new_position, 1), len(order) + 1) - 1
+    before = order[target - 1] if target > 0 else None
+    after = order[target] if target < len(order) else None
+
+    def manual_order(other_id):
+        return entries[other_id].get('manual_order') if other_id is not None else None
+
+    if before is not None and manual_order(before) is None:
+        # Entries above the new spot are sorted by time; pin them where they are
+        new_orders = {}
+        next_order = 0
+        for other_id in order[:target]:
+            if manual_order(other_id) is None:
+                new_orders[other_id] = next_order + 1
+            next_order = new_orders.get(other_id, manual_order(other_id))
+        new_orders[entry_id] = next_order + 1
+        return update_entries_order(new_orders, entries)
+
+    low, high = manual_order(before), manual_order(after)
+    if low is None and high is None:
+        new_order = 1
+    elif low is None:
+        new_order = high - 1
+    elif high is None:
+        new_order = low + 1
+    else:
+        new_order = (low + high) / 2
+        if not low < new_order < high:
+            # Out of room between the two neighbours, renumber the manual entries
+            manual_ids = [other_id for other_id in order if manual_order(other_id) is not None]
+            manual_ids.insert(manual_ids.index(after), entry_id)
+            return update_entries_order(
+                {other_id: position for position, other_id in enumerate(manual_ids, 1)}, entries)
+
+    return update_entries_order({entry_id: new_order}, entries)
 
 
 def update_entry(entry_id, updated_data):
     """Update an existing entry with new data"""
-    if db is None:
+    if storage is None:
         st.error("Database not connected")
         return False
 
     try:
-        db.collection('thankful_entries').document(entry_id).update(updated_data)
-        return True
+        storage.update_entry(entry_id, *split_update(updated_data))
+        snapshot_cache.invalidate(WALL_COLLECTION, keep=('search',))
+        mirror_update(entry_id, updated_data)
     except Exception as e:
         st.error(f"Error updating entry: {e}")
         return False
 
+    if snapshot_cache.peek((WALL_COLLECTION, 'search')) is not None:
+        # The order fields are not in the form: re-index the entry as storage now has it
+        updated_entry = get_full_entries([entry_id]).get(entry_id)
+        if updated_entry is not None:
+            update_search_index(entry_id, updated_entry)
+    return True
 
-def delete_all_entries():
-    """Delete all entries from Firestore"""
-    if db is None:
+
+def delete_all_entries(on_progress=None):
+    """Delete all entries from storage
+
+    On Firestore this uses the bulk delete engine from wall_storage (batched,
+    parallel, retried). on_progress(total_deleted, docs_per_second) is called
+    after every batch.
+    """
+    if storage is None:
         st.error("Database not connected")
         return False
 
+    def record_progress(deleted_ids, total_deleted, elapsed_seconds):
+        if entry_store is not None:
+            entry_store.apply_changes([('REMOVED', entry_id, None) for entry_id in deleted_ids])
+        if on_progress is not None:
+            on_progress(total_deleted, total_deleted / elapsed_seconds if elapsed_seconds else 0)
+
     try:
-        entries_ref = db.collection('thankful_entries')
-        docs = entries_ref.stream()
-        for doc in docs:
-            doc.reference.delete()
+        storage.delete_all(on_progress=record_progress, workers=int(get_setting("delete_workers", 4)))
         return True
     except Exception as e:
         st.error(f"Error deleting all entries: {e}")
         return False
+    finally:
+        # Even a partial delete changes the wall
+        snapshot_cache.invalidate(WALL_COLLECTION)
 
 
-# Load the current data - USING SORTED ENTRIES
-entries = get_all_entries_sorted()
+def export_wall(export_format):
+    """The whole wall as a JSONL or CSV file, streamed from storage one entry at a time
+
+    Only the encoded file is held in memory (Streamlit needs its bytes to serve
+    the download), never the list of entries. Runs on Streamlit's download
+    thread, so it must not call st.*.
+    """
+    export_file = io.BytesIO()
+    with metrics.span("export"):
+        write_export(storage.stream_entries(), export_format, export_file)
+    export_file.seek(0)
+    return export_file
+
+
+def import_entries(import_file, on_progress=None):
+    """Bulk import a thankful_wall.json, JSONL or CSV file through batched writes
+
+    Returns an ImportReport, or None if the file could not be read or a write
+    failed (the batches before the failure stay written).
+    on_progress(imported, skipped) is called after every batch.
+    """
+    if storage is None:
+        st.error("Database not connected")
+        return None
+
+    def write_batch(batch):
+        storage.set_entries(batch)
+        if entry_store is not None:
+            entry_store.apply_changes([('ADDED', entry_id, entry_data) for entry_id, entry_data in batch.items()])
+
+    def record_progress(report):
+        if on_progress is not None:
+            on_progress(report.imported, report.skipped)
+
+    try:
+        with metrics.span("import"):
+            return import_records(iter_records(import_file), write_batch, storage.new_entry_id,
+                                  on_progress=record_progress)
+    except Exception as e:
+        st.error(f"Error importing entries: {e}")
+        return None
+    finally:
+        # Even a partial import changes the wall
+        snapshot_cache.invalidate(WALL_COLLECTION)
+
+
+def entry_to_html(entry_id, info, position, compact=True):
+    """Render one wall card as escaped HTML (names, role and thanks in columns unless compact)"""
+    role_class = info.get('role_class', 'Not specified 未指定')
+    if info.get('manual_order') is not None:
+        caption = f"Position: {position} • 位置: {position} • Entry ID: {entry_id[:8]}..."
+    else:
+        caption = f"Entry ID: {entry_id[:8]}... • 条目ID: {entry_id[:8]}..."
+    english_name = html.escape(str(info['english_name']))
+    chinese_name = html.escape(str(info['chinese_name']))
+    role_class = html.escape(str(role_class))
+    thankful_for = html.escape(str(info['thankful_for'])).replace('\n', '<br>')
+    if compact:
+        names = (f"<p><b>English Name:</b> {english_name} &nbsp;•&nbsp; "
+                 f"<b>Chinese Name:</b> {chinese_name} &nbsp;•&nbsp; "
+                 f"<b>Class/Role:</b> {role_class}</p>")
+    else:
+        # The same 1:1:2 columns the card used to get from st.columns
+        names = ('<div style="display: flex; flex-wrap: wrap; gap: 1rem;">'
+                 f'<p style="flex: 1 1 0;"><b>English Name:</b> {english_name}</p>'
+                 f'<p style="flex: 1 1 0;"><b>Chinese Name:</b> {chinese_name}</p>'
+                 f'<p style="flex: 2 1 0;"><b>Class/Role:</b> {role_class}</p></div>')
+    return (
+        '<div style="margin-bottom: 1rem;">'
+        f"{names}"
+        f"<p><b>Thankful For:</b> {thankful_for}</p>"
+        f'<p style="opacity: 0.6; font-size: 0.85em;">{html.escape(caption)}</p>'
+        "<hr></div>"
+    )
+
+
+@st.cache_resource
+def get_card_cache():
+    """One card cache shared by every session in this Streamlit process"""
+    return CardCache(entry_to_html, int(get_setting("card_cache_size", 5000)))
 
-# --- Sidebar for Adding New Entries ---
-st.sidebar.header("Add Your Gratitude 添加感恩")
+
+card_cache = get_card_cache()
+
+
+def entries_to_html(page_entries, positions, compact=True):
+    """Render a whole page of cards (at the given wall positions) as one HTML block of cached fragments"""
+    return "".join(card_cache.render(entry_id, info, position, compact)
+                   for position, (entry_id, info) in zip(positions, page_entries))
+
+
+def move_wall(restore=False, on_progress=None):
+    """Archive this wall (or restore it); returns the number of entries moved, or None on error"""
+    archive = open_storage(wall_collection(WALL_ID, archived=True),
+                           wall_local_path(LOCAL_PATH, WALL_ID, archived=True))
+
+    def settle():
+        # The wall is marked archived: let this process see it and write what is already queued
+        snapshot_cache.invalidate(ENTRIES_COLLECTION)
+        get_submission_queue(backend_name, ENTRIES_COLLECTION, live_storage).flush(timeout=30)
+
+    try:
+        with metrics.span("archive_wall"):
+            moved = archive_wall(live_storage, archive, restore=restore, on_progress=on_progress, settle=settle)
+    except Exception as e:
+        st.error(f"Error {'restoring' if restore else 'archiving'} the wall: {e}")
+        return None
+    finally:
+        # The entries moved from one collection to the other; both are read again
+        snapshot_cache.invalidate(ENTRIES_COLLECTION)
+        snapshot_cache.invalidate(wall_collection(WALL_ID, archived=True))
+    if not restore:
+        # Nobody reads the live collection of an archived wall: stop mirroring it
+        if entry_store is not None:
+            entry_store.stop()
+        get_entry_store.clear(backend_name, ENTRIES_COLLECTION, None)
+    return moved
+
+
+def show_stale_notice(placeholder):
+    """Warn that the wall shown is a saved copy, if the cache had to serve one this rerun"""
+    stale_since = snapshot_cache.pop_stale()
+    if stale_since is not None:
+        as_of = time.strftime('%H:%M:%S', time.localtime(stale_since))
+        placeholder.warning(f"⚠️ The database is not responding, so this is the wall as of {as_of}. "
+                            f"数据库暂时无响应，显示的是 {as_of} 的感恩墙。")
+
+
+def flash(message, icon="✅"):
+    """Queue a toast for the next rerun, so it survives st.rerun()"""
+    st.session_state.flash_messages.append((message, icon))
+
+
+# --- Kiosk Mode: read-only wall for a projector ---
+if KIOSK_MODE:
+    st.header("Our Thankful Wall 我们的感恩墙" + (f" • {WALL_ID}" if WALL_ID != DEFAULT_WALL else ""))
+    kiosk_refresh_seconds = float(get_setting("kiosk_refresh_seconds", 10))
+    kiosk_page_size = int(get_setting("page_size", 25))
+
+    # The top of the wall is rendered once per full run; refreshes only add what is new above it
+    with metrics.span("get_wall_page"):
+        kiosk_entries, _ = get_wall_page(0, kiosk_page_size)
+    st.session_state.kiosk = {
+        "since": max([entry_timestamp(info) for _, info in kiosk_entries if info.get('manual_order') is None],
+                     default=time.time()),
+        "seen": {entry_id for entry_id, _ in kiosk_entries},
+        "html": "",
+        "count": 0,
+    }
+
+    @st.fragment(run_every=kiosk_refresh_seconds)
+    def show_new_kiosk_entries():
+        kiosk = st.session_state.kiosk
+        # Look back a little: queued submissions can land a moment after their timestamp
+        with metrics.span("kiosk_refresh"):
+            newer = get_entries_since(kiosk["since"] - REFRESH_LOOKBACK_SECONDS, kiosk_page_size)
+            new_entries = [(entry_id, info) for entry_id, info in newer if entry_id not in kiosk["seen"]]
+        if new_entries:
+            kiosk["seen"].update(entry_id for entry_id, _ in new_entries)
+            kiosk["since"] = max(kiosk["since"], max(entry_timestamp(info) for _, info in new_entries))
+            kiosk["count"] += len(new_entries)
+            # New cards carry no manual order, so they show no position
+            kiosk["html"] = entries_to_html(new_entries, [None] * len(new_entries)) + kiosk["html"]
+            if kiosk["count"] > kiosk_page_size:
+                # Plenty of new cards: start over from the top of the wall
+                st.rerun(scope="app")
+        if kiosk["html"]:
+            st.markdown(kiosk["html"], unsafe_allow_html=True)
+
+    show_stale_notice(st.empty())
+    show_new_kiosk_entries()
+    if kiosk_entries:
+        st.markdown(entries_to_html(kiosk_entries, range(1, len(kiosk_entries) + 1)), unsafe_allow_html=True)
+    else:
+        st.info("📝 The wall is empty... Let's add some gratitude! 墙上空空的... 让我们添加一些感恩!")
+
+    st.session_state.last_rerun_metrics = metrics.finish_rerun(
+        rerun_stats, st.session_state.setdefault("metrics_session", Counter()))
+    st.stop()
+
+# Load the current data - USING SORTED ENTRIES
+with metrics.span("get_all_entries_sorted"):
+    entries = get_all_entries_sorted()
 
 # Initialize session state for form submission
-if 'submitted' not in st.session_state:
-    st.session_state.submitted = False
-if 'success_message' not in st.session_state:
-    st.session_state.success_message = ""
+if 'flash_messages' not in st.session_state:
+    st.session_state.flash_messages = []
+if 'pending_submissions' not in st.session_state:
+    st.session_state.pending_submissions = []
+if 'submitted_keys' not in st.session_state:
+    st.session_state.submitted_keys = set()
 if 'editing_entry' not in st.session_state:
     st.session_state.editing_entry = None
+if st.session_state.get('wall_id') != WALL_ID:
+    # Switched walls: pages and edits of the previous wall do not apply here
+    st.session_state.wall_id = WALL_ID
+    st.session_state.wall_page = 0
+    st.session_state.editing_entry = None
+
+# Show messages queued before the last rerun
+for message, icon in st.session_state.flash_messages:
+    st.toast(message, icon=icon)
+st.session_state.flash_messages = []
+
+# --- Sidebar for Adding New Entries ---
+st.sidebar.header("Add Your Gratitude 添加感恩")
+
+# Check on submissions that were still being saved at the last rerun
+for pending in list(st.session_state.pending_submissions):
+    future, submitted_name, submitted_key = pending
+    if future.done():
+        st.session_state.pending_submissions.remove(pending)
+        if future.exception() is not None:
+            # Let the same text be submitted again, and take it back off this session's wall
+            st.session_state.submitted_keys.discard(submitted_key)
+            st.session_state.get('optimistic_entries', {}).pop(submitted_key, None)
+            st.sidebar.error(f"❌ Failed to save the entry for {submitted_name}. Please try again. 保存失败，请重试。")
+        else:
+            st.toast(f"Saved the entry for {submitted_name}! 已保存!", icon="☁️")
 
 # Simple form without clear_on_submit for better control
 english_name = st.sidebar.text_input("English Name 英文名", key="english_name")
@@ -251,116 +995,130 @@ role_class = st.sidebar.text_input(
     "Class or Role (e.g., G10-2, Teacher, Administrator, etc.) 班级或身份 (例如: A班, 老师, 家长等)", key="role_class")
 thankful_for = st.sidebar.text_area("What are you thankful for? 你感恩什么?", key="thankful_for")
 
+if WALL_ARCHIVED:
+    st.sidebar.info("📦 This wall is archived and no longer takes new entries. 此感恩墙已归档，不再接受新条目。")
+
 # Submit button
-if st.sidebar.button("Submit 提交", type="primary"):
+if st.sidebar.button("Submit 提交", type="primary", disabled=WALL_ARCHIVED):
     if english_name and chinese_name and thankful_for:
-        # Show loading state
-        with st.sidebar:
-            with st.spinner("Saving your entry... 正在保存您的条目..."):
-                entry_data = {
-                    "english_name": english_name,
-                    "chinese_name": chinese_name,
-                    "role_class": role_class if role_class else "Not specified 未指定",
-                    "thankful_for": thankful_for
-                }
-
-                if add_single_entry(entry_data):
-                    # Set simplified success message
-                    st.session_state.success_message = """
-                    🎉 **Thank you! Your entry has been saved successfully! 谢谢！您的条目已成功保存！**
-
-                    ⏳ **Please wait a moment for the page to update and show your entry below.**
-                    ⏳ **请稍等片刻，页面将更新并在下方显示您的条目。**
-                    """
-                    st.session_state.submitted = True
-
-                    # Force immediate rerun to show success message and refresh data
-                    st.rerun()
-                else:
-                    st.sidebar.error("❌ Failed to save entry. Please try again. 保存失败，请重试。")
+        entry_data = {
+            "english_name": english_name,
+            "chinese_name": chinese_name,
+            "role_class": role_class if role_class else "Not specified 未指定",
+            "thankful_for": thankful_for
+        }
+
+        idempotency_key = submission_key(entry_data)
+        if idempotency_key in st.session_state.submitted_keys:
+            # Double click or resubmit: the entry is already on the wall
+            st.sidebar.info("✅ This entry is already on the wall. 此条目已在感恩墙上。")
+        else:
+            future = add_single_entry_async(entry_data, idempotency_key)
+            if future is not None:
+                # The entry is already on the wall below; the queue writes it in the background
+                st.session_state.submitted_keys.add(idempotency_key)
+                st.session_state.pending_submissions.append((future, english_name, idempotency_key))
+                st.toast("Thank you! Your entry has been added! 谢谢！您的条目已添加！", icon="🎉")
+                st.sidebar.success("🎉 **Thank you! Your entry has been added to the wall! 谢谢！您的条目已添加到感恩墙！**")
+            else:
+                st.sidebar.error("❌ Failed to save entry. Please try again. 保存失败，请重试。")
     else:
         st.sidebar.error("❌ Please fill in name fields and what you're thankful for. 请填写姓名字段和您感恩的内容。")
 
-# Display success message if form was submitted
-if st.session_state.submitted and st.session_state.success_message:
-    st.sidebar.success(st.session_state.success_message)
-
-    # Show a progress bar to indicate waiting time
-    progress_bar = st.sidebar.progress(0)
-    for i in range(100):
-        # Update progress bar
-        progress_bar.progress(i + 1)
-        time.sleep(0.03)  # 3 second total wait time
-
-    # Clear the message and refresh
-    st.session_state.submitted = False
-    st.session_state.success_message = ""
-    st.rerun()
-
 # --- Main Area: Display the Thankful Wall ---
 st.header("Our Thankful Wall - 👇Scroll down to view 👇我们的感恩墙 - 向下滚动查看 👇")
+if WALL_ID != DEFAULT_WALL:
+    st.caption(f"Wall 感恩墙: **{WALL_ID}**")
+if WALL_ARCHIVED:
+    archived_on = time.strftime('%Y-%m-%d', time.localtime(wall_info.get('archived_at', 0)))
+    st.info(f"📦 This wall was archived on {archived_on}. 此感恩墙已于 {archived_on} 归档。")
+# Filled in below if any part of the wall had to come from an old copy
+stale_notice = st.empty()
 
 # Refresh entries data - USING SORTED ENTRIES
-entries = get_all_entries_sorted()
+with metrics.span("get_all_entries_sorted"):
+    entries = get_all_entries_sorted()
 
 # Display all entries
 if not entries:
     st.info("📝 The wall is empty... Let's add some gratitude! 墙上空空的... 让我们添加一些感恩!")
 else:
-    # Show statistics
+    # Show statistics - kept up to date as entries change, so reading them is free
+    wall_stats = entries.stats
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Entries 总条目数", len(entries))
-
-    # Count teachers - safely handle missing role_class fields
-    teachers = 0
-    students = 0
-    for entry in entries.values():
-        role = entry.get("role_class", "").lower()
-        if "teacher" in role:
-            teachers += 1
-        else:
-            students += 1
-
+        st.metric("Total Entries 总条目数", wall_stats.total)
     with col2:
-        st.metric("Students 学生", students)
+        st.metric("Students 学生", wall_stats.students)
     with col3:
-        st.metric("Teachers 老师", teachers)
+        st.metric("Teachers 老师", wall_stats.teachers)
+
+    with st.expander("Entries by Class/Role 按班级或身份统计"):
+        st.dataframe(
+            [{"Class/Role 班级或身份": role, "Entries 条目数": count}
+             for role, count in sorted(wall_stats.by_role.items(), key=lambda item: (-item[1], item[0]))],
+            hide_index=True)
 
     # Check if manual ordering is being used
-    has_manual_order = any(entry.get('manual_order') for entry in entries.values())
-    if has_manual_order:
+    if wall_stats.has_manual_order:
         st.subheader(f"All Entries (Manual Order + Newest First) 所有条目 (手动排序 + 最新优先)")
     else:
         st.subheader(f"All Entries (Newest First) 所有条目 (最新优先)")
 
-    # Show loading message while entries refresh
-    if st.session_state.get('submitted', False):
-        st.info("🔄 Loading latest entries... Please wait. 正在加载最新条目... 请稍候。")
-
-    # Display entries in the sorted order (already sorted by get_all_entries_sorted)
-    for entry_id, info in entries.items():
-        with st.container():
-            # Create a nice card-like display
-            col1, col2, col3 = st.columns([1, 1, 2])
-            with col1:
-                st.write(f"**English Name:** {info['english_name']}")
-            with col2:
-                st.write(f"**Chinese Name:** {info['chinese_name']}")
-            with col3:
-                # Safely handle missing role_class field
-                role_class = info.get('role_class', 'Not specified 未指定')
-                st.write(f"**Class/Role:** {role_class}")
-
-            st.write(f"**Thankful For:** {info['thankful_for']}")
-
-            # Show manual order if it exists
-            if info.get('manual_order'):
-                st.caption(
-                    f"Position: {info['manual_order']} • 位置: {info['manual_order']} • Entry ID: {entry_id[:8]}...")
-            else:
-                st.caption(f"Entry ID: {entry_id[:8]}... • 条目ID: {entry_id[:8]}...")
-            st.divider()
+    # Only one page of cards is rendered per rerun
+    page_size = int(get_setting("page_size", 25))
+
+    search_query = st.text_input("🔍 Search the wall 搜索感恩墙", key="wall_search",
+                                 placeholder="Name, class or words 姓名、班级或关键词").strip()
+    if search_query:
+        # Best matches replace the paged wall while searching
+        with metrics.span("search"):
+            match_ids, match_count = search_entries(search_query, page_size)
+            full_entries = get_full_entries([entry_id for entry_id in match_ids if entry_id in entries])
+        page_entries = [(entry_id, full_entries[entry_id]) for entry_id in match_ids if entry_id in full_entries]
+        positions = [entries.position(entry_id) for entry_id, _ in page_entries]
+        if match_count > len(page_entries):
+            st.caption(f"{match_count} matching entries, showing the best {len(page_entries)} "
+                       f"• 找到 {match_count} 个条目，显示前 {len(page_entries)} 个")
+        else:
+            st.caption(f"{match_count} matching entries • 找到 {match_count} 个条目")
+    else:
+        if 'wall_page' not in st.session_state:
+            st.session_state.wall_page = 0
+        with metrics.span("get_wall_page"):
+            page_entries, has_next_page = get_wall_page(st.session_state.wall_page, page_size)
+            if not page_entries and st.session_state.wall_page > 0:
+                # The wall shrank under us, go back to the start
+                st.session_state.wall_page = 0
+                page_entries, has_next_page = get_wall_page(0, page_size)
+
+        # Positions shown on cards count from the top of the wall
+        first_position = st.session_state.wall_page * page_size + 1
+        positions = range(first_position, first_position + len(page_entries))
+
+    compact_view = st.toggle("Compact view 紧凑视图", value=bool(get_setting("compact_view", False)),
+                             key="compact_view")
+
+    # Display entries in the sorted order (already sorted by get_wall_page), as one markdown
+    # block of cached card fragments instead of several elements per card
+    with metrics.span("render_wall"):
+        st.markdown(entries_to_html(page_entries, positions, compact=compact_view), unsafe_allow_html=True)
+
+    # Page controls (not needed for search results)
+    if not search_query:
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("◀ Previous 上一页", key="prev_page", disabled=st.session_state.wall_page == 0):
+                st.session_state.wall_page -= 1
+                st.rerun()
+        with page_col:
+            st.caption(f"Page {st.session_state.wall_page + 1} • 第 {st.session_state.wall_page + 1} 页")
+        with next_col:
+            if st.button("Next 下一页 ▶", key="next_page", disabled=not has_next_page):
+                st.session_state.wall_page += 1
+                st.rerun()
+
+show_stale_notice(stale_notice)
 
 # --- Admin Section in the Sidebar ---
 st.sidebar.header("Admin Section 管理员部分")
@@ -369,25 +1127,89 @@ admin_password = st.sidebar.text_input("Password 密码", type="password", key="
 if admin_password == "))$%17k60ZCS":  # Updated password check
     st.sidebar.success("🔓 Access Granted 访问批准")
 
+    # Show whether the shared wall cache is saving us Firestore reads
+    cache_stats = snapshot_cache.stats()
+    st.sidebar.caption(
+        f"Wall cache 缓存: {cache_stats['hits']} hits • {cache_stats['misses']} misses • "
+        f"{cache_stats['stale_hits']} stale • TTL {cache_stats['ttl_seconds']:g}s")
+    card_stats = card_cache.stats()
+    st.sidebar.caption(
+        f"Card cache 卡片缓存: {card_stats['hits']} hits • {card_stats['misses']} misses • "
+        f"{card_stats['cards']}/{card_stats['max_cards']} cards")
+
+    # Is the backend healthy, and how often are calls being retried?
+    guard_stats = storage_guard.stats()
+    st.sidebar.caption(
+        f"Storage 存储: breaker {guard_stats['state']}"
+        + (f" (retry in {guard_stats['retry_in_seconds']:.0f}s)" if guard_stats['state'] == "open" else "")
+        + f" • {guard_stats['retries']} retries • {guard_stats['failures']} failures • "
+        f"{guard_stats['rejected']} rejected • opened {guard_stats['times_opened']}×")
+    if guard_stats['state'] != "closed" and guard_stats['last_error']:
+        st.sidebar.warning(f"Last storage error 最近的存储错误: {guard_stats['last_error']}")
+
+    # How far behind the batched submission writes are
+    if storage is not None:
+        queue_stats = get_submission_queue(backend_name, ENTRIES_COLLECTION, storage).stats()
+        last_flush = queue_stats['last_flush_seconds']
+        st.sidebar.caption(
+            f"Submission queue 提交队列: {queue_stats['depth']} waiting • {queue_stats['written']} written in "
+            f"{queue_stats['flushes']} batches • {queue_stats['duplicates']} duplicates • last flush "
+            + (f"{last_flush * 1000:.0f} ms" if last_flush is not None else "-"))
+
+    # Where the time and the storage calls go (needs the metrics_enabled setting)
+    if metrics.enabled:
+        with st.sidebar.expander("Diagnostics 诊断"):
+            last_rerun = st.session_state.get("last_rerun_metrics")
+            if last_rerun:
+                st.write(f"**Last rerun 上次运行:** {last_rerun['seconds'] * 1000:.0f} ms")
+                st.dataframe([{"Span": name, "ms": seconds * 1000} for name, seconds in last_rerun['spans'].items()],
+                             hide_index=True)
+                st.json(last_rerun['counters'], expanded=False)
+            st.write("**This session 本会话:**")
+            st.json(dict(st.session_state.get("metrics_session", {})), expanded=False)
+            st.write("**This process 本进程:**")
+            st.json(dict(metrics.counters), expanded=False)
+            st.dataframe(metrics.summary(), hide_index=True)
+            st.download_button("Prometheus metrics", metrics.to_prometheus(), file_name="thankful_wall.prom",
+                               mime="text/plain", key="metrics_download")
+
+    def entry_option_label(entry_id, short_id=False):
+        """Dropdown label for an entry ID (the empty option stays empty)"""
+        if not entry_id:
+            return ""
+        info = entries[entry_id]
+        # Safely handle missing role_class field
+        role_class = info.get('role_class', 'Not specified')
+        return f"ID {entry_id[:8]}{'...' if short_id else ''}: {info['english_name']} - {role_class}"
+
+    # Searching narrows the edit, move and delete lists below to the best matches
+    admin_query = st.sidebar.text_input("🔍 Find entries 查找条目", key="admin_search",
+                                        placeholder="Name, class or words 姓名、班级或关键词").strip()
+    admin_entry_ids = entries
+    if admin_query and entries:
+        match_ids, match_count = search_entries(admin_query, 200)
+        match_ids = [entry_id for entry_id in match_ids if entry_id in entries]
+        if match_ids:
+            admin_entry_ids = match_ids
+            st.sidebar.caption(f"{match_count} matching entries • 找到 {match_count} 个条目")
+        else:
+            st.sidebar.caption("No matching entries, showing all 没有匹配的条目，显示全部")
+
     # Edit Entry Section
     st.sidebar.subheader("Edit Entry 编辑条目")
 
     if entries:
-        # Create a dropdown of all entries for editing
-        edit_entry_options = {}
-        for entry_id, info in entries.items():
-            role_class = info.get('role_class', 'Not specified')
-            edit_entry_options[f"ID {entry_id[:8]}: {info['english_name']} - {role_class}"] = entry_id
-
-        selected_edit_entry = st.sidebar.selectbox(
+        # Create a dropdown of the entries for editing (options and widget state are just IDs)
+        entry_id_to_edit = st.sidebar.selectbox(
             "Select entry to edit 选择要编辑的条目",
-            [""] + list(edit_entry_options.keys()),
+            [""] + list(admin_entry_ids),
+            format_func=entry_option_label,
             key="edit_select"
         )
 
-        if selected_edit_entry:
-            entry_id_to_edit = edit_entry_options[selected_edit_entry]
-            entry_to_edit = entries[entry_id_to_edit]
+        if entry_id_to_edit:
+            # The listing has no thankful_for; fetch the whole entry being edited
+            entry_to_edit = get_full_entries([entry_id_to_edit]).get(entry_id_to_edit, entries[entry_id_to_edit])
 
             # Pre-fill form with existing data
             st.sidebar.write("**Edit Entry Details 编辑条目详情:**")
@@ -409,7 +1231,7 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
             )
             edit_thankful_for = st.sidebar.text_area(
                 "What are you thankful for? 你感恩什么?",
-                value=entry_to_edit['thankful_for'],
+                value=entry_to_edit.get('thankful_for', ''),
                 key="edit_thankful_for"
             )
 
@@ -425,8 +1247,7 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
                             }
 
                             if update_entry(entry_id_to_edit, updated_data):
-                                st.sidebar.success("✅ Entry updated successfully! 条目更新成功!")
-                                time.sleep(2)
+                                flash("Entry updated successfully! 条目更新成功!")
                                 st.rerun()
                             else:
                                 st.sidebar.error("❌ Failed to update entry. 更新条目失败。")
@@ -436,84 +1257,62 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
     else:
         st.sidebar.info("No entries to edit 没有可编辑的条目")
 
-    # Reorder Entries Section - UPDATED WITH DRAG-AND-DROP STYLE (OPTION 2)
+    # Reorder Entries Section - move one entry at a time so big walls stay usable
     st.sidebar.subheader("Reorder Entries 重新排序条目")
 
     if entries:
-        st.sidebar.write("Drag-and-Drop Reorder 拖拽重新排序:")
-
-        # Get current order
-        current_order = list(entries.items())
-
-        # Initialize new order in session state if not exists
-        if 'new_order' not in st.session_state:
-            st.session_state.new_order = current_order.copy()
-
-        # Create reorder interface
-        st.sidebar.write("Select new order from top to bottom 从上到下选择新顺序:")
-
-        # Create a list to track used entries
-        used_entries = []
-
-        for position in range(len(current_order)):
-            available_entries = [entry for entry in current_order if entry[0] not in used_entries]
-
-            if available_entries:
-                # Create options for this position
-                entry_options = {f"{info['english_name']} ({info['chinese_name']})": (entry_id, info)
-                                 for entry_id, info in available_entries}
-
-                # Get current selection for this position
-                current_selection = st.session_state.new_order[position] if position < len(
-                    st.session_state.new_order) else available_entries[0]
-                current_display = f"{current_selection[1]['english_name']} ({current_selection[1]['chinese_name']})"
-
-                selected = st.sidebar.selectbox(
-                    f"Position {position + 1} 位置 {position + 1}",
-                    list(entry_options.keys()),
-                    index=list(entry_options.keys()).index(current_display) if current_display in entry_options else 0,
-                    key=f"pos_{position}"
-                )
-
-                if selected:
-                    selected_id, selected_info = entry_options[selected]
-                    # Update the new order
-                    st.session_state.new_order[position] = (selected_id, selected_info)
-                    used_entries.append(selected_id)
-
-        # Apply new order button
-        if st.sidebar.button("Apply New Order 应用新顺序", key="apply_order"):
+        # Wall positions (1-based) for labelling the options
+        if admin_entry_ids is entries:
+            wall_positions = {entry_id: position for position, entry_id in enumerate(entries, 1)}
+        else:
+            wall_positions = {entry_id: entries.position(entry_id) for entry_id in admin_entry_ids}
+
+        move_entry_id = st.sidebar.selectbox(
+            "Select entry to move 选择要移动的条目",
+            list(wall_positions),
+            format_func=lambda entry_id: (f"{wall_positions[entry_id]}. {entries[entry_id]['english_name']} "
+                                          f"({entries[entry_id]['chinese_name']})"),
+            key="move_select"
+        )
+        current_position = wall_positions[move_entry_id]
+
+        up_col, down_col, top_col = st.sidebar.columns(3)
+        target_position = None
+        if up_col.button("⬆️ Up 上移", key="move_up", disabled=current_position == 1):
+            target_position = current_position - 1
+        if down_col.button("⬇️ Down 下移", key="move_down", disabled=current_position == len(entries)):
+            target_position = current_position + 1
+        if top_col.button("⏫ Top 置顶", key="move_top", disabled=current_position == 1):
+            target_position = 1
+
+        new_position = st.sidebar.number_input(
+            "Move to position 移动到位置", min_value=1, max_value=len(entries), value=current_position,
+            key="move_position")
+        if st.sidebar.button("Move 移动", key="move_btn") and new_position != current_position:
+            target_position = int(new_position)
+
+        if target_position is not None:
             with st.sidebar:
                 with st.spinner("Updating order... 正在更新顺序..."):
-                    success_count = 0
-                    for new_position, (entry_id, info) in enumerate(st.session_state.new_order, 1):
-                        if update_entry_order(entry_id, {'manual_order': new_position}):
-                            success_count += 1
-
-                    if success_count == len(st.session_state.new_order):
-                        st.success("✅ Order updated successfully! 顺序更新成功!")
-                        time.sleep(2)
+                    success, changed_count = move_entry(move_entry_id, target_position, entries)
+
+                    if success:
+                        flash(f"Moved to position {target_position} ({changed_count} changed)! 顺序更新成功!")
                         st.rerun()
                     else:
-                        st.error("❌ Some entries failed to update. 部分条目更新失败。")
+                        st.error("❌ Order was not updated. 顺序更新失败。")
 
         # Reset order button
         if st.sidebar.button("Reset to Default Order 重置为默认顺序", key="reset_order"):
             with st.sidebar:
                 with st.spinner("Resetting order... 正在重置顺序..."):
-                    success_count = 0
-                    for entry_id in entries.keys():
-                        # Use DELETE_FIELD to remove the manual_order field
-                        if update_entry_order(entry_id, {'manual_order': firestore.DELETE_FIELD}):
-                            success_count += 1
-
-                    # Clear the new order from session state
-                    if 'new_order' in st.session_state:
-                        del st.session_state.new_order
-
-                    st.sidebar.success(f"✅ Order reset for {success_count} entries! 已重置{success_count}个条目的顺序!")
-                    time.sleep(2)
-                    st.rerun()
+                    # Use DELETE_FIELD to remove the manual_order field
+                    success, reset_count = update_entries_order(
+                        {entry_id: DELETE_FIELD for entry_id in entries.keys()}, entries)
+
+                    if success:
+                        flash(f"Order reset for {reset_count} entries! 已重置{reset_count}个条目的顺序!")
+                        st.rerun()
 
     else:
         st.sidebar.info("No entries to reorder 没有可重新排序的条目")
@@ -521,23 +1320,15 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
     # Individual entry deletion
     st.sidebar.subheader("Delete Specific Entry 删除特定条目")
     if entries:
-        # Create a dropdown of all entries for deletion
-        entry_options = {}
-        for entry_id, info in entries.items():
-            # Safely handle missing role_class field
-            role_class = info.get('role_class', 'Not specified')
-            # Show shortened ID for better display
-            short_id = entry_id[:8] + "..."
-            entry_options[f"ID {short_id}: {info['english_name']} - {role_class}"] = entry_id
-
-        selected_entry = st.sidebar.selectbox(
+        # Create a dropdown of the entries for deletion
+        entry_id_to_delete = st.sidebar.selectbox(
             "Select entry to delete 选择要删除的条目",
-            [""] + list(entry_options.keys()),
+            [""] + list(admin_entry_ids),
+            format_func=lambda entry_id: entry_option_label(entry_id, short_id=True),
             key="delete_select"
         )
 
-        if selected_entry and st.sidebar.button("Delete Selected Entry 删除选定条目", key="delete_btn"):
-            entry_id_to_delete = entry_options[selected_entry]
+        if entry_id_to_delete and st.sidebar.button("Delete Selected Entry 删除选定条目", key="delete_btn"):
             # Store the entry info before deleting for confirmation message
             deleted_entry = entries[entry_id_to_delete]
 
@@ -545,17 +1336,72 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
                 with st.spinner("Deleting entry... 正在删除条目..."):
                     if delete_entry(entry_id_to_delete):
                         # Show deletion confirmation
-                        st.sidebar.error(
-                            f"🗑️ Deleted: {deleted_entry['english_name']} ({deleted_entry['chinese_name']}) 已删除!")
-                        time.sleep(2)
+                        flash(f"Deleted: {deleted_entry['english_name']} ({deleted_entry['chinese_name']}) 已删除!",
+                              icon="🗑️")
                         st.rerun()
     else:
         st.sidebar.info("No entries to delete 没有可删除的条目")
 
+    # Export and import the whole wall
+    st.sidebar.subheader("Export & Import 导出和导入")
+    if storage is not None:
+        export_format = st.sidebar.selectbox("Export format 导出格式", list(EXPORT_FORMATS), key="export_format",
+                                             format_func=str.upper)
+        export_mime, export_extension = EXPORT_FORMATS[export_format]
+        # The file is only built when the button is clicked
+        st.sidebar.download_button(
+            "⬇️ Export Wall 导出", data=lambda: export_wall(export_format),
+            file_name=f"thankful_wall_{time.strftime('%Y%m%d')}.{export_extension}", mime=export_mime,
+            key="export_btn", on_click="ignore")
+
+        import_file = st.sidebar.file_uploader(
+            "Import entries 导入条目 (thankful_wall.json, JSONL or CSV)", type=["json", "jsonl", "csv"],
+            key="import_file")
+        if import_file is not None and st.sidebar.button("⬆️ Import 导入", key="import_btn"):
+            with st.sidebar:
+                with st.spinner("Importing entries... 正在导入条目..."):
+                    import_progress = st.empty()
+
+                    def show_import_progress(imported, skipped):
+                        import_progress.caption(
+                            f"Imported {imported} entries, skipped {skipped} 已导入 {imported} 个条目")
+
+                    import_report = import_entries(import_file, on_progress=show_import_progress)
+            if import_report is not None:
+                for import_error in import_report.errors:
+                    st.sidebar.warning(import_error)
+                flash(f"Imported {import_report.imported} entries, skipped {import_report.skipped}. "
+                      f"已导入 {import_report.imported} 个条目。", icon="📥")
+                if not import_report.errors:
+                    st.rerun()
+
+    # Move a finished wall out of the live collections (or bring it back)
+    st.sidebar.subheader("Archive Wall 归档感恩墙")
+    if live_storage is not None and st.sidebar.toggle("Show Archive Options 显示归档选项", key="archive_toggle"):
+        if WALL_ARCHIVED:
+            st.sidebar.caption("Restoring moves the entries back and reopens the wall for new entries. "
+                               "恢复后感恩墙将重新接受新条目。")
+            archive_label = "♻️ Restore Wall 恢复感恩墙"
+        else:
+            st.sidebar.caption("Archiving moves every entry to the archive. The wall stays readable, "
+                               "but takes no new entries. 归档后感恩墙只能浏览。")
+            archive_label = "📦 Archive Wall 归档感恩墙"
+        if st.sidebar.button(archive_label, key="archive_btn"):
+            with st.sidebar:
+                with st.spinner("Moving entries... 正在移动条目..."):
+                    archive_progress = st.empty()
+                    moved = move_wall(restore=WALL_ARCHIVED, on_progress=lambda copied: archive_progress.caption(
+                        f"Copied {copied} entries 已复制 {copied} 个条目"))
+            if moved is not None:
+                flash(f"{'Restored' if WALL_ARCHIVED else 'Archived'} {moved} entries. "
+                      f"{'已恢复' if WALL_ARCHIVED else '已归档'} {moved} 个条目。", icon="📦")
+                st.rerun()
+
     # Delete all entries with confirmation
     st.sidebar.subheader("Delete All Entries 删除所有条目")
 
-    if st.sidebar.button("Show Delete All Options 显示删除所有选项", key="delete_all_btn"):
+    # A toggle rather than a button, so the options stay open while the confirmation is typed
+    if st.sidebar.toggle("Show Delete All Options 显示删除所有选项", key="delete_all_btn"):
         st.sidebar.warning("⚠️ This will delete ALL entries! 这将删除所有条目!")
 
         # Double confirmation for delete all
@@ -568,9 +1414,14 @@ if admin_password == "))$%17k60ZCS":  # Updated password check
             if st.sidebar.button("🚨 CONFIRM DELETE ALL 确认删除所有", type="primary", key="confirm_delete_all"):
                 with st.sidebar:
                     with st.spinner("Deleting all entries... 正在删除所有条目..."):
-                        if delete_all_entries():
-                            st.sidebar.error("❌ All entries have been deleted. 所有条目已被删除。")
-                            time.sleep(2)
+                        delete_progress = st.empty()
+
+                        def show_delete_progress(total_deleted, docs_per_second):
+                            delete_progress.caption(
+                                f"Deleted {total_deleted} entries ({docs_per_second:.0f}/s) 已删除 {total_deleted} 个条目")
+
+                        if delete_all_entries(on_progress=show_delete_progress):
+                            flash("All entries have been deleted. 所有条目已被删除。", icon="❌")
                             st.rerun()
         elif confirm_text and confirm_text != "DELETE ALL":
             st.sidebar.error("Incorrect confirmation text 确认文本不正确")
@@ -594,6 +1445,8 @@ st.markdown("""
 
 # Add a refresh button for good measure
 if st.button("🔄 Refresh Page 刷新页面", key="refresh_btn"):
-    with st.spinner("Refreshing... 正在刷新..."):
-        time.sleep(1)
-        st.rerun()
+    st.rerun()
+
+# Close this rerun's spans and counters (a run cut short by st.rerun() is simply not recorded)
+st.session_state.last_rerun_metrics = metrics.finish_rerun(
+    rerun_stats, st.session_state.setdefault("metrics_session", Counter()))
@@ -0,0 +1,229 @@
+"""Process-wide caches shared by every session of the Streamlit app
+
+SnapshotCache holds what was read from storage (the sorted listing, pages,
+single entries, the search index) for a TTL. Only one load per key runs at a
+time, writes invalidate a collection's keys, and when a reload fails the last
+good copy is served instead, marked stale.
+
+CardCache keeps rendered card HTML, so a rerun only renders the cards whose
+entries changed.
+"""
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class SnapshotCache:
+    """TTL cache keyed by a collection name or a (collection, part, ...) tuple"""
+
+    # How long a stale copy is served before the backend is tried again
+    STALE_RETRY_SECONDS = 5.0
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        # key -> (expires_at (monotonic), snapshot, loaded_at (wall clock), stale)
+        self._snapshots = {}
+        # key -> Event set when the load in progress for it finishes
+        self._loading = {}
+        # collection name -> number of invalidations, so a load that raced a write is not kept as fresh
+        self._generations = Counter()
+        # Only held for lookups and bookkeeping, never while loading
+        self._lock = threading.Lock()
+        self._stale = threading.local()
+
+    def get(self, collection_name, loader, refresh=None):
+        """The cached value, else loader()'s result (None is not cached); the last good copy if loader() fails
+
+        refresh(old_value), if given, replaces loader() for a value that only ran
+        past its TTL (not one that was invalidated), to bring it up to date.
+        """
+        while True:
+            with self._lock:
+                cached = self._snapshots.get(collection_name)
+                if self._fresh(cached):
+                    self.hits += 1
+                    self._note_stale(cached)
+                    return cached[1]
+                loading = self._loading.get(collection_name)
+                if loading is None:
+                    self.misses += 1
+                    done = self._loading[collection_name] = threading.Event()
+                    generation = self._generation(collection_name)
+                    break
+            # Another session is loading this key: wait for its result rather than load it twice
+            loading.wait()
+
+        try:
+            try:
+                if refresh is not None and cached is not None and cached[0] != -math.inf:
+                    snapshot = refresh(cached[1])
+                else:
+                    snapshot = loader()
+            except Exception:
+                if cached is None:
+                    raise
+                with self._lock:
+                    return self._serve_stale(collection_name, cached)
+            if snapshot is not None:
+                with self._lock:
+                    self._store(collection_name, snapshot, generation)
+            return snapshot
+        finally:
+            self._finish_loading([collection_name], done)
+
+    def get_many(self, keys, loader):
+        """get() for several keys at once; loader(missing_keys) returns {key: value} for those it found"""
+        found = {}
+        waiting = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                cached = self._snapshots.get(key)
+                if self._fresh(cached):
+                    found[key] = cached[1]
+                    self._note_stale(cached)
+                elif key in self._loading:
+                    waiting[key] = self._loading[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+            done = threading.Event()
+            for key in missing:
+                self._loading[key] = done
+            generations = {key: self._generation(key) for key in missing}
+
+        if missing:
+            try:
+                try:
+                    loaded = loader(missing)
+                except Exception:
+                    with self._lock:
+                        stale = {key: self._snapshots[key] for key in missing if key in self._snapshots}
+                        if not stale:
+                            raise
+                        loaded = {key: self._serve_stale(key, cached) for key, cached in stale.items()}
+                else:
+                    with self._lock:
+                        for key, value in loaded.items():
+                            self._store(key, value, generations[key])
+                found.update(loaded)
+            finally:
+                self._finish_loading(missing, done)
+
+        # Keys another session was already loading: wait for them, then read them from the cache
+        if waiting:
+            for loading in waiting.values():
+                loading.wait()
+            found.update(self.get_many(list(waiting), loader))
+        return found
+
+    def invalidate(self, collection_name, keep=()):
+        """Expire a collection's keys, except parts named in keep (e.g. 'search') that were updated in place"""
+        with self._lock:
+            self._generations[collection_name] += 1
+            for key, cached in list(self._snapshots.items()):
+                if isinstance(key, tuple) and key[0] == collection_name and key[1] in keep:
+                    continue
+                if key == collection_name or (isinstance(key, tuple) and key[0] == collection_name):
+                    # Kept as the fallback for when that read fails
+                    self._snapshots[key] = (-math.inf,) + cached[1:]
+
+    def peek(self, key, fresh=False):
+        """The cached value for a key without loading anything; None if there is none (or, with fresh, it expired)"""
+        with self._lock:
+            cached = self._snapshots.get(key)
+        if cached is None or (fresh and not self._fresh(cached)):
+            return None
+        return cached[1]
+
+    def pop_stale(self):
+        """Wall-clock time of the oldest stale snapshot served on this thread since the last call, or None"""
+        stale_since = getattr(self._stale, 'since', None)
+        self._stale.since = None
+        return stale_since
+
+    def stats(self):
+        """Hit/miss counters for checking that the cache is doing its job"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "cached_collections": len(self._snapshots),
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def _store(self, key, snapshot, generation):
+        # Invalidated while it was loading: keep it as the fallback, but reload it next time
+        expires_at = time.monotonic() + self.ttl_seconds if generation == self._generation(key) else -math.inf
+        self._snapshots[key] = (expires_at, snapshot, time.time(), False)
+
+    def _generation(self, key):
+        return self._generations[key[0] if isinstance(key, tuple) else key]
+
+    def _finish_loading(self, keys, done):
+        with self._lock:
+            for key in keys:
+                self._loading.pop(key, None)
+        done.set()
+
+    def _fresh(self, cached):
+        return cached is not None and time.monotonic() < cached[0]
+
+    def _serve_stale(self, key, cached):
+        # The reload failed: keep serving the old copy, and retry it a little later
+        self.stale_hits += 1
+        cached = (time.monotonic() + min(self.ttl_seconds, self.STALE_RETRY_SECONDS), cached[1], cached[2], True)
+        self._snapshots[key] = cached
+        self._note_stale(cached)
+        return cached[1]
+
+    def _note_stale(self, cached):
+        if cached[3]:
+            current = getattr(self._stale, 'since', None)
+            self._stale.since = cached[2] if current is None else min(current, cached[2])
+
+
+class CardCache:
+    """Bounded LRU of rendered card HTML, one fragment per entry and layout, reused while the entry is unchanged"""
+
+    def __init__(self, render_card, max_cards=5000):
+        # render_card(entry_id, info, position, compact) -> HTML fragment
+        self.render_card = render_card
+        self.max_cards = max_cards
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, entry_id, info, position, compact=True):
+        # A card's version is the fields it shows, plus its position for hand-placed cards (the caption shows it)
+        placed = info.get('manual_order') is not None
+        version = (placed, position if placed else None, info.get('english_name'), info.get('chinese_name'),
+                   info.get('role_class'), info.get('thankful_for'))
+        key = (entry_id, compact)
+        with self._lock:
+            cached = self._fragments.get(key)
+            if cached is not None and cached[0] == version:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        fragment = self.render_card(entry_id, info, position, compact)
+        with self._lock:
+            self._fragments[key] = (version, fragment)
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_cards:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cards": len(self._fragments),
+                    "max_cards": self.max_cards}
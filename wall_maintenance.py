@@ -0,0 +1,172 @@
+"""Maintenance tasks for the thankful wall that also run outside Streamlit
+
+Usage:
+    python wall_maintenance.py delete-all [--collection thankful_entries] [--workers 4] [--yes]
+    python wall_maintenance.py export wall.jsonl [--format jsonl|csv] [--collection thankful_entries]
+    python wall_maintenance.py import thankful_wall.json [--collection thankful_entries]
+    python wall_maintenance.py archive WALL_ID [--restore] [--settle-seconds 35]
+
+Credentials are read from the [firebase] section of .streamlit/secrets.toml, the
+same place the Streamlit app reads them from.
+"""
+import argparse
+import sys
+import time
+import tomllib
+
+from wall_storage import BATCH_LIMIT, FirestoreStorage, bulk_delete_collection, wall_collection, wall_info_document
+from wall_transfer import import_records, iter_records, write_export
+
+
+def connect_firestore(secrets_path=".streamlit/secrets.toml"):
+    """Create a Firestore client from the app's secrets file"""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        with open(secrets_path, "rb") as secrets_file:
+            firebase_config = dict(tomllib.load(secrets_file)["firebase"])
+        firebase_config["private_key"] = firebase_config["private_key"].replace('\\n', '\n')
+        firebase_admin.initialize_app(credentials.Certificate(firebase_config))
+
+    return firestore.client()
+
+
+def copy_entries(source, target, on_progress=None, skip=()):
+    """Copy every entry (except the IDs in skip) from one storage to another in batches
+
+    Returns the set of IDs copied.
+    """
+    copied = set()
+    batch = {}
+    for entry_id, entry_data in source.stream_entries():
+        if entry_id in skip:
+            continue
+        batch[entry_id] = entry_data
+        if len(batch) == BATCH_LIMIT:
+            target.set_entries(batch)
+            copied.update(batch)
+            batch = {}
+            if on_progress is not None:
+                on_progress(len(skip) + len(copied))
+    if batch:
+        target.set_entries(batch)
+        copied.update(batch)
+    if on_progress is not None:
+        on_progress(len(skip) + len(copied))
+    return copied
+
+
+def archive_wall(live, archive, restore=False, on_progress=None, settle=None):
+    """Move a finished wall from its live storage to its archive (or back, with restore=True)
+
+    Archiving marks the wall archived first, so the app stops taking entries for
+    it, and calls settle() to let writes already on their way land (the app
+    flushes its submission queue, the command line waits out the apps' cached
+    wall info). The entries are then copied in two passes, the second picking up
+    anything written during the first, and only the IDs that were copied are
+    deleted. An entry that still arrives later stays in the live collection
+    instead of being lost; running this again moves it, because copies overwrite
+    by entry ID. Restoring copies everything back before flipping the info.
+    Returns the number of entries moved.
+    """
+    source, target = (archive, live) if restore else (live, archive)
+    info = live.get_wall_info() or {}
+    if not restore and not info.get('archived'):
+        live.set_wall_info(dict(info, archived=True, archived_at=time.time()))
+        if settle is not None:
+            settle()
+
+    copied = copy_entries(source, target, on_progress)
+    copied |= copy_entries(source, target, on_progress, skip=copied)
+
+    if restore and info.get('archived'):
+        live.set_wall_info(dict(info, archived=False, restored_at=time.time()))
+    if copied:
+        source.delete_entries(copied)
+    return len(copied)
+
+
+def print_progress(deleted_ids, total_deleted, elapsed_seconds):
+    rate = total_deleted / elapsed_seconds if elapsed_seconds else 0
+    print(f"Deleted {total_deleted} documents ({rate:.0f}/s)", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thankful wall maintenance tasks")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    delete_all = subcommands.add_parser("delete-all", help="Delete every entry on the wall")
+    delete_all.add_argument("--collection", default="thankful_entries")
+    delete_all.add_argument("--workers", type=int, default=4, help="Batches committed at the same time")
+    delete_all.add_argument("--secrets", default=".streamlit/secrets.toml")
+    delete_all.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+
+    export = subcommands.add_parser("export", help="Stream every entry to a JSONL or CSV file")
+    export.add_argument("output")
+    export.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    export.add_argument("--collection", default="thankful_entries")
+    export.add_argument("--secrets", default=".streamlit/secrets.toml")
+
+    import_wall = subcommands.add_parser("import", help="Add entries from a thankful_wall.json, JSONL or CSV file")
+    import_wall.add_argument("input")
+    import_wall.add_argument("--collection", default="thankful_entries")
+    import_wall.add_argument("--secrets", default=".streamlit/secrets.toml")
+
+    archive = subcommands.add_parser("archive", help="Move a finished wall out of the live collections")
+    archive.add_argument("wall_id")
+    archive.add_argument("--restore", action="store_true", help="Move an archived wall back instead")
+    archive.add_argument("--settle-seconds", type=float, default=35.0,
+                         help="Wait after closing the wall, so running apps see it archived (their cache TTL)")
+    archive.add_argument("--secrets", default=".streamlit/secrets.toml")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "delete-all":
+        if not args.yes:
+            answer = input(f"Type 'DELETE ALL' to delete every document in {args.collection}: ")
+            if answer != "DELETE ALL":
+                print("Cancelled.")
+                return 1
+
+        db = connect_firestore(args.secrets)
+        started = time.monotonic()
+        deleted = bulk_delete_collection(db, args.collection, workers=args.workers, on_progress=print_progress)
+        print(f"Done: deleted {deleted} documents in {time.monotonic() - started:.1f}s")
+
+    elif args.command in ("export", "import"):
+        storage = FirestoreStorage(connect_firestore(args.secrets), args.collection)
+        started = time.monotonic()
+        if args.command == "export":
+            with open(args.output, "wb") as output_file:
+                written = write_export(storage.stream_entries(), args.format, output_file)
+            print(f"Done: wrote {written} bytes to {args.output} in {time.monotonic() - started:.1f}s")
+        else:
+            def print_import_progress(report):
+                print(f"Imported {report.imported} entries, skipped {report.skipped}", flush=True)
+
+            with open(args.input, "rb") as input_file:
+                report = import_records(iter_records(input_file), storage.set_entries, storage.new_entry_id,
+                                        on_progress=print_import_progress)
+            for error in report.errors:
+                print(error)
+            print(f"Done: imported {report.imported} entries in {time.monotonic() - started:.1f}s")
+
+    elif args.command == "archive":
+        db = connect_firestore(args.secrets)
+        live = FirestoreStorage(db, wall_collection(args.wall_id), info_document=wall_info_document(args.wall_id))
+        archive = FirestoreStorage(db, wall_collection(args.wall_id, archived=True))
+        started = time.monotonic()
+        moved = archive_wall(live, archive, restore=args.restore,
+                             on_progress=lambda copied: print(f"Copied {copied} entries", flush=True),
+                             settle=lambda: time.sleep(args.settle_seconds))
+        print(f"Done: {'restored' if args.restore else 'archived'} {moved} entries "
+              f"in {time.monotonic() - started:.1f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""Timing spans and storage call accounting for the thankful wall
+
+One Metrics object per process collects:
+- span timings (initialize_firebase, get_all_entries_sorted, sort, render_wall, ...)
+  as latency histograms,
+- storage calls (reads, writes, deletes and how many documents each touched), with
+  a latency histogram per storage method.
+
+Everything also lands in the RerunStats of the rerun running on the current thread,
+so the app can show per-rerun and per-session numbers. Metrics(enabled=False) hands
+out a shared no-op span and leaves storage unwrapped, so switching it off costs a
+couple of attribute lookups per rerun.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+# Histogram bucket upper bounds in seconds (Prometheus style, +Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Storage methods by the kind of work they do
+READ_METHODS = ('stream_entries', 'get_entries', 'get_page', 'get_entries_since', 'get_wall_info')
+WRITE_METHODS = ('set_entry', 'set_entries', 'update_entry', 'update_entries', 'set_wall_info')
+DELETE_METHODS = ('delete_entry', 'delete_entries', 'delete_all')
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects it"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (inf if past the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else math.inf
+        return math.inf
+
+
+class RerunStats:
+    """Spans and storage counters for one script run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.counters = Counter()
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        return {
+            'seconds': time.perf_counter() - self.started,
+            'spans': dict(self.spans),
+            'counters': dict(self.counters),
+        }
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics.record_span(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class Metrics:
+    """Process-wide spans, counters and histograms"""
+
+    def __init__(self, enabled=True, log_path=None, prometheus_path=None, prometheus_every=10.0):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_every = prometheus_every
+        self.counters = Counter()
+        self.span_histograms = {}
+        self.storage_histograms = {}
+        self._current = threading.local()
+        self._lock = threading.Lock()
+        self._prometheus_written = 0.0
+
+    # --- Recording ---
+
+    def span(self, name):
+        """Context manager timing a named block"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record_span(self, name, seconds):
+        with self._lock:
+            self.span_histograms.setdefault(name, Histogram()).observe(seconds)
+        rerun = self.current_rerun()
+        if rerun is not None:
+            rerun.add_span(name, seconds)
+
+    def count(self, name, amount=1):
+        """Add to a process counter and to the current rerun's counter"""
+        with self._lock:
+            self.counters[name] += amount
+        rerun = self.current_rerun()
+        if rerun is not None:
+            rerun.counters[name] += amount
+
+    def record_storage_call(self, method, seconds, documents, failed=False):
+        if method in READ_METHODS:
+            kind, unit = 'reads', 'docs_read'
+        elif method in WRITE_METHODS:
+            kind, unit = 'writes', 'docs_written'
+        elif method in DELETE_METHODS:
+            kind, unit = 'deletes', 'docs_deleted'
+        else:
+            kind, unit = 'other_calls', None
+
+        with self._lock:
+            self.storage_histograms.setdefault(method, Histogram()).observe(seconds)
+        self.count(kind)
+        if unit is not None and documents:
+            self.count(unit, documents)
+        if failed:
+            self.count('errors')
+
+    # --- Reruns ---
+
+    def start_rerun(self):
+        """Begin collecting a rerun on this thread (returns None when disabled)"""
+        if not self.enabled:
+            return None
+        rerun = RerunStats()
+        self._current.rerun = rerun
+        return rerun
+
+    def current_rerun(self):
+        return getattr(self._current, 'rerun', None)
+
+    def finish_rerun(self, rerun, session_counters=None):
+        """Close a rerun: record its total time, fold it into the session and export it
+
+        Returns the rerun as a dict, or None when disabled.
+        """
+        if rerun is None:
+            return None
+        self._current.rerun = None
+        record = rerun.as_dict()
+        with self._lock:
+            self.span_histograms.setdefault('rerun', Histogram()).observe(record['seconds'])
+            self.counters['reruns'] += 1
+        if session_counters is not None:
+            session_counters.update(rerun.counters)
+            session_counters['reruns'] += 1
+
+        if self.log_path:
+            self.append_log(record)
+        if self.prometheus_path and time.monotonic() - self._prometheus_written >= self.prometheus_every:
+            self.write_prometheus(self.prometheus_path)
+        return record
+
+    # --- Export ---
+
+    def append_log(self, record):
+        record = dict(record, time=time.time())
+        with self._lock, open(self.log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(json.dumps(record) + '\n')
+
+    def to_prometheus(self):
+        """All counters and histograms in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"thankful_wall_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            lines += _histogram_lines('thankful_wall_span_seconds', 'span', self.span_histograms)
+            lines += _histogram_lines('thankful_wall_storage_seconds', 'method', self.storage_histograms)
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the text format atomically, e.g. for node_exporter's textfile collector"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as prometheus_file:
+            prometheus_file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+        self._prometheus_written = time.monotonic()
+
+    def summary(self):
+        """Rows of (name, count, total seconds, p50, p95) for every span and storage method"""
+        with self._lock:
+            histograms = [(f"span {name}", histogram) for name, histogram in sorted(self.span_histograms.items())]
+            histograms += [(f"storage {name}", histogram)
+                           for name, histogram in sorted(self.storage_histograms.items())]
+            return [{'name': name, 'count': histogram.count, 'total_seconds': histogram.sum,
+                     'p50_seconds': histogram.quantile(0.5), 'p95_seconds': histogram.quantile(0.95)}
+                    for name, histogram in histograms]
+
+
+def _histogram_lines(metric, label, histograms):
+    lines = [f"# TYPE {metric} histogram"] if histograms else []
+    for name, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {histogram.sum}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {histogram.count}')
+    return lines
+
+
+class InstrumentedStorage:
+    """Wraps a storage backend, timing and counting every call made through it"""
+
+    def __init__(self, storage, metrics):
+        self._storage = storage
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def _timed(self, method, call, documents=lambda result: 0):
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self._metrics.record_storage_call(method, time.perf_counter() - started, 0, failed=True)
+            raise
+        self._metrics.record_storage_call(method, time.perf_counter() - started, documents(result))
+        return result
+
+    def stream_entries(self, fields=None):
+        # Still a stream (exports rely on it); recorded once the scan is used up,
+        # so the time includes whatever the caller does between documents
+        started = time.perf_counter()
+        documents = 0
+        try:
+            for item in self._storage.stream_entries(fields):
+                documents += 1
+                yield item
+        except Exception:
+            self._metrics.record_storage_call('stream_entries', time.perf_counter() - started, documents, failed=True)
+            raise
+        self._metrics.record_storage_call('stream_entries', time.perf_counter() - started, documents)
+
+    def get_entries(self, entry_ids):
+        return self._timed('get_entries', lambda: self._storage.get_entries(entry_ids), len)
+
+    def get_page(self, cursor, page_size, tail_ids=None):
+        return self._timed('get_page', lambda: self._storage.get_page(cursor, page_size, tail_ids),
+                           lambda result: len(result[0]))
+
+    def get_entries_since(self, timestamp, limit):
+        return self._timed('get_entries_since', lambda: self._storage.get_entries_since(timestamp, limit), len)
+
+    def get_wall_info(self):
+        return self._timed('get_wall_info', self._storage.get_wall_info, lambda result: 1)
+
+    def new_entry_id(self):
+        return self._timed('new_entry_id', self._storage.new_entry_id)
+
+    def set_entry(self, entry_id, entry_data):
+        return self._timed('set_entry', lambda: self._storage.set_entry(entry_id, entry_data), lambda result: 1)
+
+    def set_entries(self, entries):
+        return self._timed('set_entries', lambda: self._storage.set_entries(entries), lambda result: len(entries))
+
+    def update_entry(self, entry_id, fields, removed_fields=()):
+        return self._timed('update_entry', lambda: self._storage.update_entry(entry_id, fields, removed_fields),
+                           lambda result: 1)
+
+    def update_entries(self, updates, rollback, workers=1):
+        return self._timed('update_entries', lambda: self._storage.update_entries(updates, rollback, workers),
+                           lambda result: len(updates))
+
+    def set_wall_info(self, info):
+        return self._timed('set_wall_info', lambda: self._storage.set_wall_info(info), lambda result: 1)
+
+    def delete_entry(self, entry_id):
+        return self._timed('delete_entry', lambda: self._storage.delete_entry(entry_id), lambda result: 1)
+
+    def delete_entries(self, entry_ids):
+        entry_ids = list(entry_ids)
+        return self._timed('delete_entries', lambda: self._storage.delete_entries(entry_ids),
+                           lambda result: len(entry_ids))
+
+    def delete_all(self, on_progress=None, workers=4):
+        return self._timed('delete_all', lambda: self._storage.delete_all(on_progress, workers),
+                           lambda result: result or 0)
+
+    def sync(self):
+        return self._timed('sync', self._storage.sync)
+
+    def on_snapshot(self, callback):
+        def counted_callback(collection_snapshot, changes, read_time):
+            # Listener deliveries are billed as document reads
+            self._metrics.count('listener_docs_read', len(changes))
+            return callback(collection_snapshot, changes, read_time)
+
+        return self._storage.on_snapshot(counted_callback)
@@ -0,0 +1,156 @@
+"""Process-wide queue that turns bursts of wall submissions into batched writes
+
+When a whole class submits at once, every session hands its entry to one
+SubmissionQueue and gets a Future back straight away. A single background thread
+waits a short flush interval for more entries to arrive, then writes everything
+pending with one storage.set_entries() call (one Firestore WriteBatch per 500).
+
+Each submission carries an idempotency key that is also its document ID, so a
+double click or a retry with the same key is one document, not two.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from wall_storage import BATCH_LIMIT
+
+
+class SubmissionQueue:
+    """Coalesces set-entry writes from many sessions into batched commits
+
+    write_batch({entry_id: entry_data}) does the actual write; it is called on the
+    queue's own thread. Futures for recent keys are remembered (up to
+    remember_keys of them) so duplicates get the original future back.
+    """
+
+    def __init__(self, write_batch, flush_interval=0.05, max_batch=BATCH_LIMIT, remember_keys=10000,
+                 on_flush=None):
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.remember_keys = remember_keys
+        self.on_flush = on_flush
+        self.submitted = 0
+        self.duplicates = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = None
+        self.max_flush_seconds = 0.0
+        self.last_wait_seconds = None
+        self._pending = OrderedDict()
+        self._futures = OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="wall-submissions", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, entry_data):
+        """Queue entry_data under document ID `key`; returns a Future resolving to the key
+
+        Submitting a key that is pending or was recently written returns the
+        existing Future and writes nothing.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Submission queue is closed")
+            existing = self._futures.get(key)
+            if existing is not None and not (existing.done() and existing.exception() is not None):
+                # A failed key may be retried; anything else is a duplicate
+                self.duplicates += 1
+                return existing
+
+            future = Future()
+            self._futures[key] = future
+            self._futures.move_to_end(key)
+            while len(self._futures) > self.remember_keys:
+                self._futures.popitem(last=False)
+            self._pending[key] = (dict(entry_data), future, time.perf_counter())
+            self.submitted += 1
+            self._condition.notify()
+            return future
+
+    def depth(self):
+        """Number of submissions waiting to be written"""
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "depth": len(self._pending),
+                "submitted": self.submitted,
+                "duplicates": self.duplicates,
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_flush_seconds": self.last_flush_seconds,
+                "max_flush_seconds": self.max_flush_seconds,
+                "last_wait_seconds": self.last_wait_seconds,
+            }
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written (or failed)"""
+        with self._condition:
+            futures = [future for future in self._futures.values() if not future.done()]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+    def close(self, timeout=None):
+        """Write what is pending, then stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                # Give the rest of the burst a moment to arrive so it shares the commit
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False))
+            self._write(batch)
+
+    def _write(self, batch):
+        # batch is a list of (key, (entry_data, future, submitted_at)) pairs, oldest first
+        started = time.perf_counter()
+        error = None
+        try:
+            self.write_batch({key: entry_data for key, (entry_data, _, _) in batch})
+        except Exception as e:
+            error = e
+        seconds = time.perf_counter() - started
+
+        with self._condition:
+            self.flushes += 1
+            self.last_flush_seconds = seconds
+            self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+            # From the oldest submission in the batch being queued to it being written
+            self.last_wait_seconds = time.perf_counter() - batch[0][1][2]
+            if error is None:
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+
+        for key, (_, future, _) in batch:
+            if error is None:
+                future.set_result(key)
+            else:
+                future.set_exception(error)
+        if self.on_flush is not None:
+            self.on_flush(len(batch), seconds, error)
@@ -0,0 +1,277 @@
+"""Retries and a circuit breaker around the storage backend
+
+StorageGuard is shared by the whole process. Every storage call goes through it:
+- calls that are safe to repeat (reads, and writes to known document IDs) are
+  retried on transient errors with jittered exponential backoff, within an
+  overall deadline,
+- a circuit breaker counts consecutive transient failures and, once the backend
+  looks down, fails calls straight away with BackendUnavailable instead of
+  letting every rerun wait for timeouts. After reset_seconds one probe call is
+  let through; if it succeeds the breaker closes again.
+
+Each attempt's own deadline is the backend's job (FirestoreStorage passes a
+timeout to every RPC). ResilientStorage wraps a backend for one rerun, the same
+way InstrumentedStorage does, and sends its calls through the guard.
+"""
+import random
+import threading
+import time
+from collections import Counter
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Storage calls that can safely run twice: reads, and writes to a known document ID
+IDEMPOTENT_METHODS = ('stream_entries', 'get_entries', 'get_page', 'get_entries_since', 'get_wall_info',
+                      'set_entry', 'set_entries', 'update_entry', 'delete_entry', 'delete_entries',
+                      'set_wall_info')
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open"""
+
+
+def transient_errors(firestore=False):
+    """Exception types worth retrying: timeouts, dropped connections and server-side hiccups
+
+    The Firestore client's own error types are only imported (google.api_core is
+    a heavy import) when firestore is True, i.e. when that backend is in use.
+    """
+    errors = (ConnectionError, TimeoutError)
+    if not firestore:
+        return errors
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return errors
+    return errors + (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+                     exceptions.TooManyRequests, exceptions.Aborted, exceptions.GatewayTimeout,
+                     exceptions.RetryError)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` failures in a row -> half open after `reset_seconds`"""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.last_error = None
+        # Thread ident of the call probing a half open breaker, if any
+        self._probing = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the backend now (half open lets one probe through at a time)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probing is None:
+                self._probing = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probing = None
+
+    def record_failure(self, error):
+        """Count a transient failure; returns True if this one opened the breaker"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            self._probing = None
+            if self.state == HALF_OPEN or (self.state == CLOSED
+                                           and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                return True
+            return False
+
+    def end_call(self):
+        """Give up the probe if this thread holds it; called in a finally block after every call
+
+        Otherwise a probe that never got to record a result (KeyboardInterrupt, a
+        stream closed early) would keep the breaker half open for good.
+        """
+        with self._lock:
+            if self._probing == threading.get_ident():
+                self._probing = None
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless open)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+class StorageGuard:
+    """Process-wide retry policy, circuit breaker and counters for storage calls"""
+
+    def __init__(self, retries=2, base_delay=0.2, max_delay=2.0, deadline=15.0, failure_threshold=5,
+                 reset_seconds=30.0, count=None, firestore=False):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        # count(name, amount) also reports the counters elsewhere, e.g. Metrics.count
+        self._count = count
+        self.counters = Counter()
+        self._transient = transient_errors(firestore)
+        self._lock = threading.Lock()
+
+    def call(self, method, operation):
+        """Run operation() for a storage method, retrying it if the method is idempotent"""
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+        started = time.monotonic()
+        for attempt in range(attempts):
+            self._check_breaker()
+            try:
+                result = operation()
+            except self._transient as e:
+                self._record_failure(e)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                if attempt + 1 == attempts or time.monotonic() - started + delay >= self.deadline:
+                    raise
+                self.count('storage_retries')
+                time.sleep(delay)
+                continue
+            except Exception:
+                # The backend answered (e.g. not found, permission denied): it is up, the call was wrong
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self.breaker.end_call()
+
+    def stream(self, method, make_stream):
+        """Iterate make_stream(), retried like call() as long as nothing has been yielded yet"""
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+        started = time.monotonic()
+        for attempt in range(attempts):
+            self._check_breaker()
+            yielded = False
+            try:
+                for item in make_stream():
+                    if not yielded:
+                        yielded = True
+                        self.breaker.record_success()
+                    yield item
+            except self._transient as e:
+                self._record_failure(e)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                # Part of the stream has been handed out already, so it cannot start over
+                if yielded or attempt + 1 == attempts or time.monotonic() - started + delay >= self.deadline:
+                    raise
+                self.count('storage_retries')
+                time.sleep(delay)
+                continue
+            except Exception:
+                self.breaker.record_success()
+                raise
+            finally:
+                self.breaker.end_call()
+            if not yielded:
+                self.breaker.record_success()
+            return
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+        if self._count is not None:
+            self._count(name, amount)
+
+    def stats(self):
+        """Breaker state and counters, for the admin sidebar"""
+        breaker = self.breaker
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'state': breaker.state,
+            'consecutive_failures': breaker.consecutive_failures,
+            'times_opened': breaker.times_opened,
+            'retry_in_seconds': breaker.retry_in(),
+            'last_error': breaker.last_error,
+            'retries': counters.get('storage_retries', 0),
+            'failures': counters.get('storage_failures', 0),
+            'rejected': counters.get('breaker_rejections', 0),
+        }
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self.count('breaker_rejections')
+            raise BackendUnavailable(
+                f"Storage is not responding; trying again in {self.breaker.retry_in():.0f}s "
+                f"({self.breaker.last_error})")
+
+    def _record_failure(self, error):
+        self.count('storage_failures')
+        if self.breaker.record_failure(error):
+            self.count('breaker_opened')
+
+
+class ResilientStorage:
+    """Wraps a storage backend so every call goes through a StorageGuard"""
+
+    def __init__(self, storage, guard):
+        self._storage = storage
+        self._guard = guard
+
+    def __getattr__(self, name):
+        # new_entry_id, sync and on_snapshot (the listener reconnects by itself) pass straight through
+        return getattr(self._storage, name)
+
+    def stream_entries(self, fields=None):
+        return self._guard.stream('stream_entries', lambda: self._storage.stream_entries(fields))
+
+    def get_entries(self, entry_ids):
+        return self._guard.call('get_entries', lambda: self._storage.get_entries(entry_ids))
+
+    def get_page(self, cursor, page_size, tail_ids=None):
+        return self._guard.call('get_page', lambda: self._storage.get_page(cursor, page_size, tail_ids))
+
+    def get_entries_since(self, timestamp, limit):
+        return self._guard.call('get_entries_since', lambda: self._storage.get_entries_since(timestamp, limit))
+
+    def get_wall_info(self):
+        return self._guard.call('get_wall_info', self._storage.get_wall_info)
+
+    def set_wall_info(self, info):
+        return self._guard.call('set_wall_info', lambda: self._storage.set_wall_info(info))
+
+    def set_entry(self, entry_id, entry_data):
+        return self._guard.call('set_entry', lambda: self._storage.set_entry(entry_id, entry_data))
+
+    def set_entries(self, entries):
+        return self._guard.call('set_entries', lambda: self._storage.set_entries(entries))
+
+    def update_entry(self, entry_id, fields, removed_fields=()):
+        return self._guard.call('update_entry', lambda: self._storage.update_entry(entry_id, fields, removed_fields))
+
+    def update_entries(self, updates, rollback, workers=1):
+        # Not retried: a failed call has already rolled back what it could
+        return self._guard.call('update_entries', lambda: self._storage.update_entries(updates, rollback, workers))
+
+    def delete_entry(self, entry_id):
+        return self._guard.call('delete_entry', lambda: self._storage.delete_entry(entry_id))
+
+    def delete_entries(self, entry_ids):
+        return self._guard.call('delete_entries', lambda: self._storage.delete_entries(entry_ids))
+
+    def delete_all(self, on_progress=None, workers=4):
+        # Not retried here: every batch inside it already is
+        return self._guard.call('delete_all', lambda: self._storage.delete_all(on_progress, workers))
@@ -0,0 +1,198 @@
+"""In-memory full-text search over the wall, for English and Chinese text
+
+English (and any other space-separated text) is indexed by word; Chinese is
+indexed by single characters and character bigrams, so both 感恩 and 恩 find
+感恩节. The index is updated one entry at a time as the wall changes, so queries
+never scan the collection.
+"""
+import bisect
+import functools
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from wall_store import entry_timestamp, order_key
+
+# CJK Unified Ideographs (plus extension A and the compatibility block)
+_CJK = '㐀-䶿一-鿿豈-﫿'
+_TOKEN_RUNS = re.compile(f'(?P<cjk>[{_CJK}]+)|[^\\W_{_CJK}]+')
+
+# Most words a prefix expands to, so a one-letter query stays fast
+MAX_PREFIX_WORDS = 200
+
+# Matches in names count more than matches in what someone is thankful for
+FIELD_WEIGHTS = {
+    'english_name': 3.0,
+    'chinese_name': 3.0,
+    'role_class': 2.0,
+    'thankful_for': 1.0,
+}
+
+
+def _runs(text):
+    """(is_cjk, run) pairs of a normalized, lower-cased text"""
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    for match in _TOKEN_RUNS.finditer(text):
+        yield match.lastgroup == 'cjk', match.group()
+
+
+@functools.lru_cache(maxsize=4096)
+def index_terms(text):
+    """Terms stored for a piece of text: words, CJK characters and CJK bigrams"""
+    terms = []
+    for is_cjk, run in _runs(text):
+        if is_cjk:
+            terms.extend(run)
+            terms.extend([run[i:i + 2] for i in range(len(run) - 1)])
+        else:
+            terms.append(run)
+    return tuple(terms)
+
+
+def query_terms(text):
+    """Terms a query must all match: words, and CJK bigrams (single characters on their own)"""
+    terms = []
+    for is_cjk, run in _runs(text):
+        if is_cjk and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+class SearchIndex:
+    """Inverted index from terms to {entry_id: weight}, kept up to date per entry
+
+    Safe to query from script threads while the listener thread updates it.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._doc_terms = {}
+        self._order_keys = {}
+        # Sorted non-CJK terms (words, and codes like g10), for matching the word still being typed as a prefix
+        self._words = []
+        self._lock = threading.RLock()
+        # For refreshing the index from the entries added since instead of rebuilding it
+        self.created_at = time.monotonic()
+        self.newest_timestamp = 0
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Index a whole {entry_id: entry_data} mapping at once"""
+        index = cls()
+        for entry_id, entry_data in entries.items():
+            index._add(entry_id, entry_data, sort_words=False)
+        index._words.sort()
+        return index
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, entry_id, entry_data):
+        """Index an entry, replacing whatever was indexed for it before"""
+        with self._lock:
+            self._add(entry_id, entry_data, sort_words=True)
+
+    def remove(self, entry_id):
+        with self._lock:
+            for term in self._doc_terms.pop(entry_id, {}):
+                posting = self._postings[term]
+                del posting[entry_id]
+                if not posting:
+                    del self._postings[term]
+                    if not _is_cjk(term):
+                        del self._words[bisect.bisect_left(self._words, term)]
+            self._order_keys.pop(entry_id, None)
+
+    def reorder(self, entry_id, entry_data):
+        """Move an indexed entry to its new place in the wall order without re-indexing its text"""
+        with self._lock:
+            if entry_id in self._order_keys:
+                self._order_keys[entry_id] = order_key(entry_id, entry_data)
+
+    def search(self, query, limit=50):
+        """Best matches for a query as (entry_ids, total_matches)
+
+        Every query term has to match; the last word also matches longer words
+        it is the start of. Ranked by weighted term frequency times inverse
+        document frequency, then by wall order.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return [], 0
+
+        with self._lock:
+            total_docs = len(self._doc_terms) or 1
+            candidates = []
+            for position, term in enumerate(terms):
+                is_last_word = position == len(terms) - 1 and not _is_cjk(term)
+                postings = self._prefix_postings(term) if is_last_word else [self._postings.get(term, {})]
+                matches = {}
+                for posting in postings:
+                    idf = math.log(1 + total_docs / len(posting)) if posting else 0
+                    for entry_id, weight in posting.items():
+                        score = weight * idf
+                        if score > matches.get(entry_id, 0):
+                            matches[entry_id] = score
+                if not matches:
+                    return [], 0
+                candidates.append(matches)
+
+            candidates.sort(key=len)
+            scores = {}
+            for entry_id, score in candidates[0].items():
+                for other in candidates[1:]:
+                    other_score = other.get(entry_id)
+                    if other_score is None:
+                        break
+                    score += other_score
+                else:
+                    scores[entry_id] = score
+
+            best = heapq.nsmallest(limit, scores, key=lambda entry_id: (-scores[entry_id], self._order_keys[entry_id]))
+            return best, len(scores)
+
+    def _add(self, entry_id, entry_data, sort_words):
+        # Must be called with the lock held (or before the index is shared)
+        if entry_id in self._doc_terms:
+            self.remove(entry_id)
+
+        weights = {}
+        for field, field_weight in FIELD_WEIGHTS.items():
+            # Role and other repeated values come straight out of the tokenizer cache
+            for term in index_terms(str(entry_data.get(field) or '')):
+                weights[term] = weights.get(term, 0.0) + field_weight
+
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                if not _is_cjk(term):
+                    if sort_words:
+                        bisect.insort(self._words, term)
+                    else:
+                        self._words.append(term)
+            posting[entry_id] = weight
+        self._doc_terms[entry_id] = weights
+        self._order_keys[entry_id] = order_key(entry_id, entry_data)
+        self.newest_timestamp = max(self.newest_timestamp, entry_timestamp(entry_data))
+
+    def _prefix_postings(self, prefix):
+        postings = [self._postings[prefix]] if prefix in self._postings else []
+        position = bisect.bisect_right(self._words, prefix)
+        end = min(position + MAX_PREFIX_WORDS, len(self._words))
+        while position < end and self._words[position].startswith(prefix):
+            postings.append(self._postings[self._words[position]])
+            position += 1
+        return postings
+
+
+_CJK_START = re.compile(f'[{_CJK}]')
+
+
+def _is_cjk(term):
+    return bool(_CJK_START.match(term))
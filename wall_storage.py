@@ -0,0 +1,797 @@
+"""Storage backends for the thankful wall
+
+Both backends offer the same small set of operations, so the Streamlit app does
+not care where the entries live:
+
+    stream_entries(fields=None)              -> iterable of (entry_id, entry_data), optionally
+                                                only the listed fields
+    get_entries(entry_ids)                   -> {entry_id: entry_data} for the ones that exist
+    new_entry_id()                           -> a fresh document ID
+    set_entry(entry_id, entry_data)
+    set_entries(entries)                     -> write {entry_id: entry_data} in batches
+    update_entry(entry_id, fields, removed_fields=())
+    update_entries(updates, rollback, workers=1)
+    delete_entry(entry_id)
+    delete_entries(entry_ids)                -> delete the given entries in batches
+    delete_all(on_progress=None, workers=4)  -> number of entries deleted
+    on_snapshot(callback)                    -> watch with unsubscribe()
+    sync()                                   -> pick up changes made by other processes
+    get_page(cursor, page_size, tail_ids=None) -> (page_entries, next_cursor)
+    get_entries_since(timestamp, limit)      -> [(entry_id, entry_data)] added after timestamp
+    get_wall_info()                          -> the wall's settings, e.g. {'archived': True}; None if unset
+    set_wall_info(info)
+
+FirestoreStorage talks to a Firestore collection. LocalStorage keeps the wall in
+thankful_wall.json plus an append-only JSONL write log, for running an event (or a
+benchmark) without any cloud dependency.
+
+Each wall has its own collection (or file), so reading one wall never touches
+the others: see wall_collection() and wall_local_path(). The default wall keeps
+the original thankful_entries collection and thankful_wall.json.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from wall_resilience import transient_errors
+from wall_store import LocalWatch, SnapshotChange, WallView, entry_timestamp, order_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+DEFAULT_WALL = 'default'
+
+# Firestore allows at most 500 writes in one batch
+BATCH_LIMIT = 500
+
+# Wall IDs end up in collection paths and file names
+_WALL_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def valid_wall_id(wall_id):
+    return bool(_WALL_ID.fullmatch(wall_id or ''))
+
+
+def wall_collection(wall_id, archived=False):
+    """Firestore collection holding one wall's entries
+
+    Walls are subcollections of walls/{wall_id}, whose document holds the wall
+    info. Archived walls move to archived_walls/{wall_id}/entries, away from
+    anything live readers or listeners touch.
+    """
+    if archived:
+        return f'archived_walls/{wall_id}/entries'
+    return 'thankful_entries' if wall_id == DEFAULT_WALL else f'walls/{wall_id}/entries'
+
+
+def wall_info_document(wall_id):
+    return f'walls/{wall_id}'
+
+
+def wall_local_path(local_path, wall_id, archived=False):
+    """Local file for one wall: the default wall is local_path, others sit next to it in walls/ and archive/"""
+    if wall_id == DEFAULT_WALL and not archived:
+        return local_path
+    return os.path.join(os.path.dirname(local_path), 'archive' if archived else 'walls', f'{wall_id}.json')
+
+
+def local_info_path(local_path):
+    """Where LocalStorage keeps the wall info for the wall stored at local_path"""
+    return os.path.splitext(local_path)[0] + ".info.json"
+
+
+class _DeleteField:
+    def __repr__(self):
+        return 'DELETE_FIELD'
+
+
+# Marks a field to remove in app-level updates, like firestore.DELETE_FIELD but
+# usable without importing the Firestore client
+DELETE_FIELD = _DeleteField()
+
+
+def with_retries(operation, max_retries=5, base_delay=0.5, max_delay=30.0):
+    """Run operation(), retrying with jittered exponential backoff when it fails with a transient error
+
+    Other errors (permission denied, invalid argument) are raised straight away.
+    """
+    transient = transient_errors(firestore=True)
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except transient:
+            if attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+
+
+def bulk_delete_collection(db, collection_name, page_size=BATCH_LIMIT, workers=4, max_retries=5,
+                           on_progress=None):
+    """Delete every document in a collection without downloading any field data
+
+    Document references are paged with select([]) and cursor queries, and each
+    page is deleted as one batch. Up to `workers` batches are in flight at once;
+    each batch is retried with backoff before giving up.
+
+    on_progress(deleted_ids, total_deleted, elapsed_seconds) is called on the
+    caller's thread after every batch commits (so Streamlit elements can be
+    updated from it). Returns the total number of documents deleted.
+    """
+    collection_ref = db.collection(collection_name)
+    page_size = min(page_size, BATCH_LIMIT)
+    started = time.monotonic()
+    total_deleted = 0
+    pending = set()
+
+    def delete_page(doc_refs):
+        def commit():
+            batch = db.batch()
+            for doc_ref in doc_refs:
+                batch.delete(doc_ref)
+            batch.commit()
+
+        with_retries(commit, max_retries=max_retries)
+        return [doc_ref.id for doc_ref in doc_refs]
+
+    def report(finished):
+        nonlocal total_deleted
+        for future in finished:
+            pending.discard(future)
+            deleted_ids = future.result()
+            total_deleted += len(deleted_ids)
+            if on_progress is not None:
+                on_progress(deleted_ids, total_deleted, time.monotonic() - started)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        last_doc = None
+        while True:
+            query = collection_ref.select([]).limit(page_size)
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            docs = with_retries(lambda: list(query.stream()), max_retries=max_retries)
+            if not docs:
+                break
+
+            # Bound the number of batches in flight before queueing another one
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                report(done)
+            pending.add(executor.submit(delete_page, [doc.reference for doc in docs]))
+            last_doc = docs[-1]
+
+            if len(docs) < page_size:
+                break
+
+        report(list(pending))
+
+    return total_deleted
+
+
+class FirestoreStorage:
+    """Entries stored as documents in one Firestore collection
+
+    With a timeout, every RPC gets that deadline (scan_timeout for whole-wall
+    streams) and the client's own retries are switched off, so the caller
+    decides what to retry (see wall_resilience). Without one the client
+    defaults apply. The wall info lives in the info_document, if there is one.
+    """
+
+    def __init__(self, db, collection_name, timeout=None, scan_timeout=None, info_document=None):
+        self.db = db
+        self.collection_name = collection_name
+        self.timeout = timeout
+        self.scan_timeout = scan_timeout or timeout
+        self.info_document = info_document
+
+    @property
+    def collection(self):
+        return self.db.collection(self.collection_name)
+
+    def stream_entries(self, fields=None):
+        # A select() projection only downloads the listed fields
+        query = self.collection if fields is None else self.collection.select(list(fields))
+        for doc in query.stream(**self._rpc_options(self.scan_timeout)):
+            yield doc.id, doc.to_dict()
+
+    def get_entries(self, entry_ids):
+        docs = self.db.get_all([self.collection.document(entry_id) for entry_id in entry_ids],
+                               **self._rpc_options())
+        return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+
+    def new_entry_id(self):
+        return self.collection.document().id
+
+    def set_entry(self, entry_id, entry_data):
+        self.collection.document(entry_id).set(entry_data, **self._rpc_options())
+
+    def set_entries(self, entries):
+        """Write {entry_id: entry_data} as WriteBatch commits of up to 500 documents each"""
+        items = list(entries.items())
+        for start in range(0, len(items), BATCH_LIMIT):
+            batch = self.db.batch()
+            for entry_id, entry_data in items[start:start + BATCH_LIMIT]:
+                batch.set(self.collection.document(entry_id), entry_data)
+            batch.commit(**self._rpc_options())
+
+    def update_entry(self, entry_id, fields, removed_fields=()):
+        self.collection.document(entry_id).update(self._update_data(fields, removed_fields), **self._rpc_options())
+
+    def update_entries(self, updates, rollback, workers=1):
+        """Apply {entry_id: (fields, removed_fields)} updates, all or nothing
+
+        Writes go through WriteBatch chunks of up to 500, committed concurrently
+        when workers > 1. Each chunk is atomic; if one fails, chunks that already
+        committed are put back using the matching rollback updates before the
+        error is raised.
+        """
+        try:
+            self._commit_in_batches(updates, workers)
+        except Exception as e:
+            committed = [entry_id for chunk in getattr(e, 'committed_chunks', []) for entry_id, _ in chunk]
+            if committed:
+                try:
+                    self._commit_in_batches({entry_id: rollback[entry_id] for entry_id in committed})
+                except Exception as rollback_error:
+                    raise RuntimeError(f"{e} (rollback also failed: {rollback_error})") from e
+            raise
+
+    def delete_entry(self, entry_id):
+        self.collection.document(entry_id).delete(**self._rpc_options())
+
+    def delete_entries(self, entry_ids):
+        """Delete the given entries as WriteBatch commits of up to 500 documents each"""
+        entry_ids = list(entry_ids)
+        for start in range(0, len(entry_ids), BATCH_LIMIT):
+            batch = self.db.batch()
+            for entry_id in entry_ids[start:start + BATCH_LIMIT]:
+                batch.delete(self.collection.document(entry_id))
+            batch.commit(**self._rpc_options())
+
+    def delete_all(self, on_progress=None, workers=4):
+        return bulk_delete_collection(self.db, self.collection_name, workers=workers, on_progress=on_progress)
+
+    def on_snapshot(self, callback):
+        return self.collection.on_snapshot(callback)
+
+    def sync(self):
+        # Firestore readers always see the latest data; nothing to catch up on
+        pass
+
+    def get_page(self, cursor, page_size, tail_ids=None):
+        """Fetch one page of the wall with limit/start_after cursor queries
+
+        The wall order has three parts (see order_key in wall_store): manual_order
+        ascending, timestamp newest first, and entries without a timestamp. The
+        timestamp query also returns manually ordered entries, which are skipped.
+        Every write and import sets a timestamp, so the last part only holds old
+        entries; Firestore cannot query for a missing field, so instead of walking
+        the whole collection by ID, tail_ids() returns their IDs (in wall order,
+        e.g. from the cached listing) and they are fetched by ID. It is only
+        called once a page gets that far.
+
+        Each query asks for one document more than it needs, so the last page
+        knows it is the last. cursor is None for the first page, otherwise the
+        next_cursor of the previous page. Returns (page_entries, next_cursor);
+        next_cursor is None at the end.
+        """
+        segment, position = cursor or (0, None)
+        # (entry_id, entry_data, cursor that starts right after it), up to one past the page
+        found = []
+
+        while segment < 2 and len(found) <= page_size:
+            limit = page_size + 1 - len(found)
+            query = self._segment_query(segment).limit(limit)
+            if position is not None:
+                query = query.start_after(position)
+            docs = list(query.stream(**self._rpc_options()))
+
+            for doc in docs:
+                position = doc
+                entry_data = doc.to_dict()
+                if order_key(doc.id, entry_data)[0] != segment:
+                    continue
+                found.append((doc.id, entry_data, (segment, doc)))
+                if len(found) > page_size:
+                    break
+            else:
+                # This part of the wall is used up, carry on with the next one
+                if len(docs) < limit:
+                    segment, position = segment + 1, None
+
+        if segment == 2 and len(found) <= page_size:
+            offset = position or 0
+            wanted = list(tail_ids()[offset:offset + page_size + 1 - len(found)]) if tail_ids is not None else []
+            # The lookahead only needs to exist, so it is not fetched
+            fetch = wanted[:page_size - len(found)]
+            docs = self.get_entries(fetch) if fetch else {}
+            found.extend((entry_id, docs.get(entry_id), (2, offset + n + 1)) for n, entry_id in enumerate(wanted))
+
+        next_cursor = found[page_size - 1][2] if len(found) > page_size else None
+        page_entries = [(entry_id, entry_data) for entry_id, entry_data, _ in found[:page_size] if entry_data]
+        return page_entries, next_cursor
+
+    def get_entries_since(self, timestamp, limit):
+        """Entries not placed by hand with a timestamp after `timestamp`, newest first, at most `limit`
+
+        Walks the timestamp order from the top in pages that start at one
+        document and double, stopping at the first older one, so a refresh that
+        finds k new entries reads about 2k + 1 documents whatever the wall size.
+        """
+        newer = []
+        query = self._segment_query(1)
+        page_size = 1
+        last_doc = None
+        while len(newer) < limit:
+            page_query = query.limit(page_size)
+            if last_doc is not None:
+                page_query = page_query.start_after(last_doc)
+            docs = list(page_query.stream(**self._rpc_options()))
+            for doc in docs:
+                entry_data = doc.to_dict()
+                if entry_timestamp(entry_data) <= timestamp:
+                    return newer
+                last_doc = doc
+                if entry_data.get('manual_order') is None:
+                    newer.append((doc.id, entry_data))
+            if len(docs) < page_size:
+                break
+            page_size = min(page_size * 2, BATCH_LIMIT)
+        return newer[:limit]
+
+    def get_wall_info(self):
+        if self.info_document is None:
+            return None
+        doc = self.db.document(self.info_document).get(**self._rpc_options())
+        return doc.to_dict() if doc.exists else None
+
+    def set_wall_info(self, info):
+        self.db.document(self.info_document).set(info, **self._rpc_options())
+
+    def _rpc_options(self, timeout=None):
+        # Deadline for one RPC, without the client's built-in retries
+        timeout = timeout or self.timeout
+        if timeout is None:
+            return {}
+        return {'retry': None, 'timeout': timeout}
+
+    def _segment_query(self, segment):
+        from firebase_admin import firestore
+
+        if segment == 0:
+            return self.collection.order_by('manual_order')
+        return self.collection.order_by('timestamp', direction=firestore.Query.DESCENDING)
+
+    def _update_data(self, fields, removed_fields):
+        from firebase_admin import firestore
+
+        update_data = dict(fields)
+        for field in removed_fields:
+            update_data[field] = firestore.DELETE_FIELD
+        return update_data
+
+    def _commit_in_batches(self, updates, workers=1):
+        # On failure the first error is raised, carrying the chunks that did
+        # commit as its committed_chunks
+        items = list(updates.items())
+        chunks = [items[i:i + BATCH_LIMIT] for i in range(0, len(items), BATCH_LIMIT)]
+
+        def commit_chunk(chunk):
+            batch = self.db.batch()
+            for entry_id, (fields, removed_fields) in chunk:
+                batch.update(self.collection.document(entry_id), self._update_data(fields, removed_fields))
+            batch.commit(**self._rpc_options())
+
+        committed_chunks = []
+        errors = []
+        if workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [(chunk, executor.submit(commit_chunk, chunk)) for chunk in chunks]
+                for chunk, future in futures:
+                    try:
+                        future.result()
+                        committed_chunks.append(chunk)
+                    except Exception as e:
+                        errors.append(e)
+        else:
+            for chunk in chunks:
+                try:
+                    commit_chunk(chunk)
+                    committed_chunks.append(chunk)
+                except Exception as e:
+                    errors.append(e)
+                    break
+
+        if errors:
+            errors[0].committed_chunks = committed_chunks
+            raise errors[0]
+
+
+class LocalStorage:
+    """Entries stored on disk: thankful_wall.json plus an append-only write log
+
+    Every write is one JSON line appended to the log and fsynced, so it is durable
+    without rewriting the whole wall. Once the log holds compact_every records it
+    is folded back into the JSON file (written to a temp file, then swapped in).
+
+    Writes hold an in-process lock plus an exclusive lock on a .lock file, so
+    sessions in this process and other processes sharing the files never
+    interleave. Before each write (and on sync()) the log is read from where this
+    process last stopped, so changes made elsewhere are picked up.
+    """
+
+    def __init__(self, path="thankful_wall.json", compact_every=1000, fsync=True):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + ".log.jsonl"
+        self.lock_path = path + ".lock"
+        self.info_path = local_info_path(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._entries = {}
+        self._log_offset = 0
+        self._log_inode = None
+        self._log_records = 0
+        # Log lines that were not valid JSON and were skipped
+        self.skipped_records = 0
+        self._callbacks = []
+        self._lock = threading.RLock()
+        with self._file_lock():
+            self._load()
+
+    # --- Reading ---
+
+    def stream_entries(self, fields=None):
+        with self._lock:
+            if fields is None:
+                return list(self._entries.items())
+            return [(entry_id, {field: entry_data[field] for field in fields if field in entry_data})
+                    for entry_id, entry_data in self._entries.items()]
+
+    def get_entries(self, entry_ids):
+        with self._lock:
+            return {entry_id: dict(self._entries[entry_id]) for entry_id in entry_ids if entry_id in self._entries}
+
+    def on_snapshot(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+            callback(None, [SnapshotChange('ADDED', entry_id, entry_data)
+                            for entry_id, entry_data in self._entries.items()], None)
+        return LocalWatch(self._callbacks, callback)
+
+    def sync(self):
+        """Pick up writes other processes appended to the log (cheap when there are none)"""
+        if _file_state(self.log_path) != (self._log_inode, self._log_offset):
+            with self._lock, self._file_lock():
+                self._catch_up()
+
+    def get_page(self, cursor, page_size, tail_ids=None):
+        """One page of the wall; the cursor is simply the position to start at (tail_ids is not needed)"""
+        start = cursor or 0
+        with self._lock:
+            wall = WallView.from_entries(self._entries)
+        page_entries = [(entry_id, dict(entry_data)) for entry_id, entry_data in wall.slice(start, start + page_size)]
+        next_cursor = start + page_size if start + page_size < len(wall) else None
+        return page_entries, next_cursor
+
+    def get_entries_since(self, timestamp, limit):
+        """Entries not placed by hand with a timestamp after `timestamp`, newest first, at most `limit`"""
+        with self._lock:
+            newer = [(entry_id, dict(entry_data)) for entry_id, entry_data in self._entries.items()
+                     if entry_data.get('manual_order') is None and entry_timestamp(entry_data) > timestamp]
+        newer.sort(key=lambda item: order_key(*item))
+        return newer[:limit]
+
+    def get_wall_info(self):
+        try:
+            with open(self.info_path, encoding="utf-8") as info_file:
+                return json.load(info_file)
+        except FileNotFoundError:
+            return None
+
+    # --- Writing ---
+
+    def new_entry_id(self):
+        return uuid.uuid4().hex[:20]
+
+    def set_wall_info(self, info):
+        temp_path = self.info_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as info_file:
+            json.dump(info, info_file, ensure_ascii=False)
+        os.replace(temp_path, self.info_path)
+
+    def set_entry(self, entry_id, entry_data):
+        self._write({'op': 'set', 'id': entry_id, 'data': entry_data})
+
+    def set_entries(self, entries):
+        """Write {entry_id: entry_data} as one log record"""
+        self._write({'op': 'batch', 'ops': [
+            {'op': 'set', 'id': entry_id, 'data': entry_data} for entry_id, entry_data in entries.items()]})
+
+    def update_entry(self, entry_id, fields, removed_fields=()):
+        self._write({'op': 'update', 'id': entry_id, 'data': fields, 'removed': list(removed_fields)},
+                    must_exist=entry_id)
+
+    def update_entries(self, updates, rollback, workers=1):
+        """Apply {entry_id: (fields, removed_fields)} updates as one log record (all or nothing)"""
+        self._write({'op': 'batch', 'ops': [
+            {'op': 'update', 'id': entry_id, 'data': fields, 'removed': list(removed_fields)}
+            for entry_id, (fields, removed_fields) in updates.items()]})
+
+    def delete_entry(self, entry_id):
+        self._write({'op': 'delete', 'id': entry_id})
+
+    def delete_entries(self, entry_ids):
+        """Delete the given entries as one log record"""
+        self._write({'op': 'batch', 'ops': [{'op': 'delete', 'id': entry_id} for entry_id in entry_ids]})
+
+    def delete_all(self, on_progress=None, workers=4):
+        started = time.monotonic()
+        with self._lock:
+            deleted_ids = list(self._entries)
+            self._write({'op': 'clear'})
+        if on_progress is not None:
+            on_progress(deleted_ids, len(deleted_ids), time.monotonic() - started)
+        return len(deleted_ids)
+
+    def compact(self):
+        """Fold the write log into thankful_wall.json and start a fresh log"""
+        with self._lock, self._file_lock():
+            self._catch_up()
+            self._compact()
+
+    # --- Internals ---
+
+    def _write(self, record, must_exist=None):
+        # must_exist: an entry ID that has to be there, checked after catching up (like Firestore's update)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, self._file_lock():
+            # Apply anything other processes wrote first, so our view stays in log order
+            self._catch_up()
+            if must_exist is not None and must_exist not in self._entries:
+                raise KeyError(f"No entry with ID {must_exist}")
+            if _file_state(self.log_path) != (self._log_inode, self._log_offset):
+                # A torn last line from a writer that crashed (live writers hold the lock):
+                # cut it off, or this record would be glued onto it
+                os.truncate(self.log_path, self._log_offset)
+            with open(self.log_path, "a", encoding="utf-8") as log_file:
+                log_file.write(line)
+                log_file.flush()
+                if self.fsync:
+                    os.fsync(log_file.fileno())
+                self._log_offset = log_file.tell()
+                self._log_inode = os.fstat(log_file.fileno()).st_ino
+            self._log_records += 1
+            self._emit(self._apply(record))
+
+            if self._log_records >= self.compact_every:
+                self._compact()
+
+    def _apply(self, record):
+        # Returns the (kind, entry_id, entry_data) changes the record made
+        op = record['op']
+        if op == 'batch':
+            changes = []
+            for sub_record in record['ops']:
+                changes.extend(self._apply(sub_record))
+            return changes
+        if op == 'clear':
+            changes = [('REMOVED', entry_id, None) for entry_id in self._entries]
+            self._entries = {}
+            return changes
+
+        entry_id = record['id']
+        if op == 'set':
+            kind = 'MODIFIED' if entry_id in self._entries else 'ADDED'
+            self._entries[entry_id] = dict(record['data'])
+            return [(kind, entry_id, self._entries[entry_id])]
+        if op == 'update':
+            if entry_id not in self._entries:
+                return []
+            entry_data = dict(self._entries[entry_id])
+            entry_data.update(record['data'])
+            for field in record.get('removed', ()):
+                entry_data.pop(field, None)
+            self._entries[entry_id] = entry_data
+            return [('MODIFIED', entry_id, entry_data)]
+        if op == 'delete':
+            if self._entries.pop(entry_id, None) is None:
+                return []
+            return [('REMOVED', entry_id, None)]
+        return []
+
+    def _emit(self, changes):
+        if changes:
+            snapshot_changes = [SnapshotChange(kind, entry_id, entry_data) for kind, entry_id, entry_data in changes]
+            for callback in list(self._callbacks):
+                callback(None, snapshot_changes, None)
+
+    def _load(self):
+        # Start from the compacted file, then replay the log on top of it
+        self._entries = dict(_read_entries(self.path))
+        self._log_inode, _ = _file_state(self.log_path)
+        self._log_offset = 0
+        self._log_records = 0
+        self._replay_log()
+
+    def _catch_up(self):
+        log_inode, log_size = _file_state(self.log_path)
+
+        if log_inode != self._log_inode:
+            # The log was replaced by a compaction (or created): reload everything
+            old_entries = self._entries
+            self._load()
+            removed = [('REMOVED', entry_id, None) for entry_id in old_entries if entry_id not in self._entries]
+            changed = [('MODIFIED', entry_id, entry_data) for entry_id, entry_data in self._entries.items()
+                       if old_entries.get(entry_id) != entry_data]
+            self._emit(removed + changed)
+        elif log_size != self._log_offset:
+            self._emit(self._replay_log())
+
+    def _replay_log(self):
+        # Apply log records from the last offset on; returns the changes they made
+        changes = []
+        if self._log_inode is None:
+            return changes
+        with open(self.log_path, "rb") as log_file:
+            log_file.seek(self._log_offset)
+            # Stream the log a line at a time; a torn last line is left for later
+            for raw_line in log_file:
+                if not raw_line.endswith(b"\n"):
+                    break
+                self._log_offset += len(raw_line)
+                if not raw_line.strip():
+                    continue
+                try:
+                    record = json.loads(raw_line)
+                except ValueError:
+                    # A line mangled by an earlier crash: skip it rather than refuse to load the wall
+                    self.skipped_records += 1
+                    continue
+                changes.extend(self._apply(record))
+                self._log_records += 1
+        return changes
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as wall_file:
+            # One entry per line keeps the file valid JSON and easy to stream back in
+            wall_file.write('{"entries": {\n')
+            last = len(self._entries) - 1
+            for position, (entry_id, entry_data) in enumerate(self._entries.items()):
+                separator = ",\n" if position < last else "\n"
+                wall_file.write(f"{json.dumps(entry_id)}: {json.dumps(entry_data, ensure_ascii=False)}{separator}")
+            wall_file.write("}}\n")
+            wall_file.flush()
+            os.fsync(wall_file.fileno())
+        os.replace(temp_path, self.path)
+
+        # Swap in a new, empty log file: other processes notice the new inode and reload
+        temp_log_path = self.log_path + ".tmp"
+        open(temp_log_path, "w").close()
+        os.replace(temp_log_path, self.log_path)
+        self._log_inode, self._log_offset = _file_state(self.log_path)
+        self._log_records = 0
+
+    def _file_lock(self):
+        return _FileLock(self.lock_path)
+
+
+class _FileLock:
+    # Exclusive advisory lock on a side file, shared by every process using the wall
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _file_state(path):
+    # (inode, size) of a file, or (None, 0) if it does not exist yet
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, 0
+    return stat.st_ino, stat.st_size
+
+
+def _read_entries(path):
+    """Yield (entry_id, entry_data) from a thankful_wall.json file
+
+    Parsed incrementally, whatever the layout (one entry per line as written by
+    LocalStorage, or a hand-edited file), so the whole file is never held as one
+    string.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, encoding="utf-8") as wall_file:
+        yield from iter_json_entries("", wall_file)
+
+
+def iter_json_entries(head, text_file, chunk_size=65536):
+    """Incrementally parse {"entries": {id: entry, ...}} without loading the file
+
+    Only the current entry plus one read chunk is held in memory, whatever the
+    file's layout (pretty-printed, one entry per line or a single line).
+    """
+    decoder = json.JSONDecoder()
+    buffer = head
+    position = 0
+
+    def fill():
+        nonlocal buffer, position
+        chunk = text_file.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        return bool(chunk)
+
+    def skip(characters):
+        # Skip whitespace plus the given punctuation; returns the next character ('' at EOF)
+        nonlocal position
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in characters):
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ''
+
+    def decode():
+        # Decode the next JSON value, reading more of the file until it is complete
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # A value that runs to the end of the buffer (e.g. a number) may continue
+                if end < len(buffer) or not fill():
+                    position = end
+                    return value
+            except ValueError:
+                if not fill():
+                    raise
+
+    if skip('') != '{':
+        raise ValueError("Expected a JSON object with an \"entries\" object")
+    position += 1
+    while True:
+        next_character = skip(',')
+        if next_character == '}':
+            return
+        key = decode()
+        if skip(':') == '':
+            raise ValueError("Unexpected end of file")
+        if key != 'entries':
+            decode()  # Skip anything that is not the entries object
+            continue
+        if skip('') != '{':
+            raise ValueError("\"entries\" must be a JSON object")
+        position += 1
+        while True:
+            next_character = skip(',')
+            if next_character == '}':
+                position += 1
+                break
+            if next_character == '':
+                raise ValueError("Unexpected end of file inside \"entries\"")
+            entry_id = decode()
+            skip(':')
+            yield entry_id, decode()
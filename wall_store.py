@@ -0,0 +1,526 @@
+"""In-memory copy of the thankful wall, kept up to date by a Firestore listener
+
+The Streamlit script reruns for every click and keystroke, but this module is only
+imported once per process, so one EntryStore can be shared by every session.
+"""
+import bisect
+import functools
+import sys
+import threading
+from collections.abc import Mapping
+
+
+def order_key(entry_id, entry_data):
+    """Sort key that puts an entry in its place on the wall
+
+    Manual order (ascending) comes first, then timestamped entries (newest first),
+    then entries without a timestamp by Firebase ID (newest first, because
+    Firebase IDs are chronological). Ties fall back to the document ID, which is
+    the order Firestore streams documents in.
+    """
+    manual_order = entry_data.get('manual_order')
+    if manual_order is not None:
+        return (0, manual_order, entry_id)
+
+    timestamp = entry_timestamp(entry_data)
+    if timestamp:
+        return (1, -timestamp, entry_id)
+
+    # Negated code points sort the ID in reverse; the trailing 1 makes longer IDs win ties
+    return (2, tuple(-ord(char) for char in entry_id) + (1,), entry_id)
+
+
+def entry_timestamp(entry_data):
+    """An entry's timestamp as seconds since the epoch (0 when it has none)"""
+    timestamp = entry_data.get('timestamp') or 0
+    # Firestore may hand back a datetime instead of the float we write
+    if hasattr(timestamp, 'timestamp'):
+        timestamp = timestamp.timestamp()
+    return timestamp
+
+
+def normalize_role(role_class):
+    """Group key for a Class/Role value: collapsed whitespace, upper case (e.g. 'g10-2 ' -> 'G10-2')"""
+    return ' '.join(str(role_class or 'Not specified 未指定').split()).upper()
+
+
+@functools.lru_cache(maxsize=4096)
+def _role_info(role_class):
+    # (interned role, interned group key, is a teacher), worked out once per distinct role
+    return sys.intern(role_class), sys.intern(normalize_role(role_class)), 'teacher' in role_class.lower()
+
+
+class Entry(Mapping):
+    """One wall entry as an immutable, compact record that reads like its document dict
+
+    __slots__ keep it to a fraction of a dict's size. role_class is interned (a
+    whole class shares one string) and comes with its group key and teacher flag
+    worked out once per distinct role. Fields the document does not have are
+    missing here too: entry['thankful_for'] raises KeyError and .get() returns
+    the default. Entries are never changed, so one snapshot of the wall can be
+    shared by every session; replace() returns an updated copy.
+    """
+
+    __slots__ = ('entry_id', 'english_name', 'chinese_name', 'role_class', 'thankful_for', 'manual_order',
+                 'timestamp', 'role_key', 'is_teacher')
+
+    FIELDS = ('entry_id', 'english_name', 'chinese_name', 'role_class', 'thankful_for', 'manual_order', 'timestamp')
+
+    def __init__(self, entry_id, data):
+        set_field = object.__setattr__
+        set_field(self, 'entry_id', entry_id)
+        for field in self.FIELDS[1:]:
+            set_field(self, field, data.get(field))
+        role_class, role_key, is_teacher = _role_info(str(self.role_class) if self.role_class is not None else '')
+        if self.role_class is not None:
+            set_field(self, 'role_class', role_class)
+        set_field(self, 'role_key', role_key)
+        set_field(self, 'is_teacher', is_teacher)
+
+    @classmethod
+    def of(cls, entry_id, data):
+        """data as an Entry (returned as is when it already is one)"""
+        return data if isinstance(data, Entry) else cls(entry_id, data)
+
+    def __getitem__(self, field):
+        value = getattr(self, field, None) if field in self.FIELDS else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Entry is immutable; use replace()")
+
+    def __reduce__(self):
+        return Entry, (self.entry_id, dict(self))
+
+    def __repr__(self):
+        return f"Entry({self.entry_id!r}, {dict(self)!r})"
+
+    def replace(self, fields, removed_fields=()):
+        """A copy with fields updated and removed_fields dropped"""
+        data = dict(self)
+        data.update(fields)
+        for field in removed_fields:
+            data.pop(field, None)
+        return Entry(self.entry_id, data)
+
+
+class WallStats:
+    """Running totals behind the metrics row, updated one entry at a time"""
+
+    def __init__(self):
+        self.total = 0
+        self.teachers = 0
+        self.manual = 0
+        self.untimestamped = 0
+        self.by_role = {}
+
+    @property
+    def students(self):
+        # Everyone who is not a teacher counts as a student, as before
+        return self.total - self.teachers
+
+    @property
+    def has_manual_order(self):
+        return self.manual > 0
+
+    def add(self, entry, count=1):
+        """Count an Entry in (or out, with count=-1)"""
+        self.total += count
+        if entry.is_teacher:
+            self.teachers += count
+        if entry.manual_order is not None:
+            self.manual += count
+        elif not entry_timestamp(entry):
+            self.untimestamped += count
+
+        role = entry.role_key
+        role_count = self.by_role.get(role, 0) + count
+        if role_count:
+            self.by_role[role] = role_count
+        else:
+            del self.by_role[role]
+
+    def remove(self, entry):
+        self.add(entry, count=-1)
+
+    def copy(self):
+        other = WallStats()
+        other.total, other.teachers, other.manual = self.total, self.teachers, self.manual
+        other.untimestamped = self.untimestamped
+        other.by_role = dict(self.by_role)
+        return other
+
+
+class SortedIndex:
+    """Ordered collection of (key, entry_id) pairs kept in small sorted buckets
+
+    Insert and remove are a binary search over bucket maxima plus a short list
+    shift, so they stay logarithmic-ish without any extra dependency. copy() is
+    cheap: buckets are shared and only copied when one side changes them.
+    """
+
+    BUCKET_SIZE = 512
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self._buckets = [items[i:i + self.BUCKET_SIZE] for i in range(0, len(items), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._owned = [True] * len(self._buckets)
+        self._len = len(items)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def copy(self):
+        """A frozen copy for readers; both sides copy a bucket before changing it"""
+        other = SortedIndex.__new__(SortedIndex)
+        other._buckets = list(self._buckets)
+        other._maxes = list(self._maxes)
+        other._owned = [False] * len(self._buckets)
+        other._len = self._len
+        self._owned = [False] * len(self._buckets)
+        return other
+
+    def add(self, item):
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            self._owned.append(True)
+            self._len = 1
+            return
+
+        pos = bisect.bisect_left(self._maxes, item)
+        if pos == len(self._maxes):
+            pos -= 1
+        bucket = self._own(pos)
+        bisect.insort(bucket, item)
+        self._maxes[pos] = bucket[-1]
+        self._len += 1
+
+        # Split oversized buckets so inserts stay cheap
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = len(bucket) // 2
+            self._buckets[pos:pos + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[pos:pos + 1] = [bucket[half - 1], bucket[-1]]
+            self._owned[pos:pos + 1] = [True, True]
+
+    def remove(self, item):
+        pos = bisect.bisect_left(self._maxes, item)
+        if pos == len(self._maxes):
+            raise ValueError(f"{item!r} not in index")
+        index = bisect.bisect_left(self._buckets[pos], item)
+        if index == len(self._buckets[pos]) or self._buckets[pos][index] != item:
+            raise ValueError(f"{item!r} not in index")
+
+        bucket = self._own(pos)
+        del bucket[index]
+        self._len -= 1
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            del self._owned[pos]
+
+    def index(self, item):
+        """Position of an item (0-based), found by bucket instead of by scanning"""
+        pos = bisect.bisect_left(self._maxes, item)
+        if pos < len(self._maxes):
+            index = bisect.bisect_left(self._buckets[pos], item)
+            if index < len(self._buckets[pos]) and self._buckets[pos][index] == item:
+                return sum(len(bucket) for bucket in self._buckets[:pos]) + index
+        raise ValueError(f"{item!r} not in index")
+
+    def slice(self, start=0, stop=None):
+        """Iterate items start..stop in order, skipping whole buckets before start"""
+        if stop is None or stop > self._len:
+            stop = self._len
+        position = 0
+        for bucket in self._buckets:
+            if position >= stop:
+                return
+            if position + len(bucket) > start:
+                yield from bucket[max(start - position, 0):stop - position]
+            position += len(bucket)
+
+    def _own(self, pos):
+        # Copy-on-write: never change a bucket that a frozen copy still uses
+        if not self._owned[pos]:
+            self._buckets[pos] = list(self._buckets[pos])
+            self._owned[pos] = True
+        return self._buckets[pos]
+
+
+class WallView(Mapping):
+    """Read-only, ordered view of the wall: {entry_id: Entry} in wall order
+
+    Works anywhere the old sorted dict did (items(), values(), len(), lookups),
+    and slice() walks part of the wall without building a new dict. stats holds
+    the WallStats for exactly these entries.
+    """
+
+    def __init__(self, entries, index, stats):
+        self._entries = entries
+        self._index = index
+        self.stats = stats
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Sort a plain {entry_id: entry_data} dict once into a view (of Entry records)"""
+        entries = {entry_id: Entry.of(entry_id, entry_data) for entry_id, entry_data in entries.items()}
+        stats = WallStats()
+        for entry in entries.values():
+            stats.add(entry)
+        return cls(entries, SortedIndex(
+            (order_key(entry_id, entry), entry_id) for entry_id, entry in entries.items()), stats)
+
+    def __getitem__(self, entry_id):
+        return self._entries[entry_id]
+
+    def __iter__(self):
+        for _, entry_id in self._index:
+            yield entry_id
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, entry_id):
+        return entry_id in self._entries
+
+    def position(self, entry_id):
+        """1-based wall position of an entry"""
+        return self._index.index((order_key(entry_id, self._entries[entry_id]), entry_id)) + 1
+
+    def slice(self, start=0, stop=None):
+        """Yield (entry_id, entry_data) pairs for wall positions start..stop"""
+        for _, entry_id in self._index.slice(start, stop):
+            yield entry_id, self._entries[entry_id]
+
+    def with_entries(self, entries):
+        """A new view with {entry_id: entry_data} added (or replacing what is there); this one is unchanged"""
+        merged = dict(self._entries)
+        index = self._index.copy()
+        stats = self.stats.copy()
+        for entry_id, entry_data in entries.items():
+            entry = Entry.of(entry_id, entry_data)
+            old_entry = merged.get(entry_id)
+            if old_entry is not None:
+                index.remove((order_key(entry_id, old_entry), entry_id))
+                stats.remove(old_entry)
+            index.add((order_key(entry_id, entry), entry_id))
+            merged[entry_id] = entry
+            stats.add(entry)
+        return WallView(merged, index, stats)
+
+    def untimestamped_ids(self):
+        """IDs of the entries without a timestamp, in wall order (they are always last)"""
+        return [entry_id for _, entry_id in self._index.slice(len(self._index) - self.stats.untimestamped)]
+
+    def newer_than(self, timestamp, limit):
+        """Yield up to `limit` (entry_id, entry_data) pairs not placed by hand and newer than timestamp
+
+        Those sit right after the manually ordered entries, newest first, so
+        this only walks the entries it returns.
+        """
+        for key, entry_id in self._index.slice(self.stats.manual, self.stats.manual + limit):
+            if key[0] != 1 or -key[1] <= timestamp:
+                return
+            yield entry_id, self._entries[entry_id]
+
+
+class EntryStore:
+    """Shared, listener-fed store of wall entries
+
+    Deltas update a SortedIndex in place under a lock, one O(log n) step per entry.
+    Readers get a WallView built from frozen copies the first time they ask after
+    a change; views (and the Entry records inside them) are never modified again,
+    so every session shares the same snapshot() without locking or copying and
+    always sees a consistent wall.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._index = SortedIndex()
+        self._stats = WallStats()
+        self._snapshot = WallView({}, SortedIndex(), WallStats())
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._unsubscribe = None
+        self._search = None
+        self.version = 0
+
+    # --- Reading ---
+
+    def snapshot(self):
+        """The latest wall as a read-only WallView"""
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    self._snapshot = WallView(dict(self._entries), self._index.copy(), self._stats.copy())
+                    self._dirty = False
+        return self._snapshot
+
+    def is_ready(self):
+        """True once the first full snapshot has arrived from the listener"""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def search_index(self):
+        """SearchIndex over the wall, built the first time someone searches and kept up to date after that"""
+        if self._search is None:
+            # Imported here because wall_search itself imports this module
+            from wall_search import SearchIndex
+            with self._lock:
+                if self._search is None:
+                    self._search = SearchIndex.from_entries(self._entries)
+        return self._search
+
+    # --- Listening ---
+
+    def listen(self, source):
+        """Attach to anything with an on_snapshot(callback) method
+
+        That is normally the wall's storage backend, or a FakeSnapshotEmitter in
+        the tests.
+        """
+        watch = source.on_snapshot(self.on_snapshot)
+        self._unsubscribe = watch.unsubscribe
+        return watch
+
+    def stop(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    def on_snapshot(self, collection_snapshot, changes, read_time):
+        """Firestore listener callback; runs on the listener's background thread"""
+        deltas = []
+        for change in changes:
+            if change.type.name == 'REMOVED':
+                deltas.append(('REMOVED', change.document.id, None))
+            else:
+                deltas.append((change.type.name, change.document.id, change.document.to_dict()))
+        self.apply_changes(deltas)
+        self._ready.set()
+
+    # --- Applying deltas ---
+
+    def apply_changes(self, deltas):
+        """Apply a list of (kind, entry_id, data) deltas
+
+        kind is 'ADDED', 'MODIFIED' or 'REMOVED' (data is ignored for removals).
+        """
+        with self._lock:
+            for kind, entry_id, data in deltas:
+                if kind == 'REMOVED':
+                    self._set(entry_id, None)
+                else:
+                    self._set(entry_id, Entry(entry_id, data or {}))
+
+    def upsert(self, entry_id, data):
+        """Record a local write straight away instead of waiting for the listener"""
+        self.apply_changes([('MODIFIED', entry_id, data)])
+
+    def patch(self, entry_id, fields, removed_fields=()):
+        """Merge a partial update into an entry the store already knows about"""
+        with self._lock:
+            if entry_id not in self._entries:
+                return
+            self._set(entry_id, self._entries[entry_id].replace(fields, removed_fields))
+
+    def remove(self, entry_id):
+        self.apply_changes([('REMOVED', entry_id, None)])
+
+    def _set(self, entry_id, entry_data):
+        # Must be called with the lock held; entry_data is an Entry, or None to remove the entry
+        old_entry = self._entries.pop(entry_id, None)
+        if old_entry is not None:
+            # Entries never change, so the old sort key can be worked out again
+            self._index.remove((order_key(entry_id, old_entry), entry_id))
+            self._stats.remove(old_entry)
+        if entry_data is not None:
+            self._index.add((order_key(entry_id, entry_data), entry_id))
+            self._entries[entry_id] = entry_data
+            self._stats.add(entry_data)
+        if self._search is not None:
+            if entry_data is None:
+                self._search.remove(entry_id)
+            else:
+                self._search.add(entry_id, entry_data)
+        self._dirty = True
+        self.version += 1
+
+
+class _ChangeType:
+    def __init__(self, name):
+        self.name = name
+
+
+class _ChangeDocument:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class SnapshotChange:
+    """One document change shaped like Firestore's, for local change sources"""
+
+    def __init__(self, kind, doc_id, data):
+        self.type = _ChangeType(kind)
+        self.document = _ChangeDocument(doc_id, data)
+
+
+class LocalWatch:
+    """Handle returned by a local on_snapshot(); unsubscribe() stops the callbacks"""
+
+    def __init__(self, callbacks, callback):
+        self._callbacks = callbacks
+        self._callback = callback
+
+    def unsubscribe(self):
+        self._callbacks.remove(self._callback)
+
+
+class FakeSnapshotEmitter:
+    """Local stand-in for a Firestore collection's on_snapshot, used by the tests
+
+    Like Firestore, a new listener immediately gets every existing document as ADDED.
+    """
+
+    def __init__(self, documents=None):
+        self._documents = dict(documents or {})
+        self._callbacks = []
+
+    def on_snapshot(self, callback):
+        self._callbacks.append(callback)
+        callback(None, [SnapshotChange('ADDED', doc_id, data) for doc_id, data in self._documents.items()], None)
+        return LocalWatch(self._callbacks, callback)
+
+    def emit(self, kind, doc_id, data=None):
+        """Send one ADDED / MODIFIED / REMOVED change to every listener"""
+        if kind == 'REMOVED':
+            self._documents.pop(doc_id, None)
+        else:
+            self._documents[doc_id] = dict(data)
+        for callback in list(self._callbacks):
+            callback(None, [SnapshotChange(kind, doc_id, data)], None)
@@ -0,0 +1,248 @@
+"""Export and import of the whole wall, streamed so 100k entries fit in bounded memory
+
+Exports are generators of text chunks (JSONL or CSV), written one entry at a time.
+Imports read thankful_wall.json files ({"entries": {entry_id: entry}}, in any
+layout), JSONL or CSV one record at a time, validate each record and hand them
+to a write function in batches, so only one batch is ever held in memory.
+"""
+import csv
+import io
+import json
+import math
+import time
+from datetime import datetime
+
+from wall_storage import BATCH_LIMIT, iter_json_entries
+
+EXPORT_FORMATS = {
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Columns written to CSV (JSONL keeps every field)
+CSV_FIELDS = ('entry_id', 'english_name', 'chinese_name', 'role_class', 'thankful_for', 'manual_order', 'timestamp')
+
+REQUIRED_FIELDS = ('english_name', 'chinese_name', 'thankful_for')
+TEXT_FIELDS = ('english_name', 'chinese_name', 'role_class', 'thankful_for')
+MAX_TEXT_LENGTH = 5000
+
+# At most this many problems are kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+# --- Export ---
+
+def export_jsonl(entries):
+    """Yield one JSON line per (entry_id, entry_data)"""
+    for entry_id, entry_data in entries:
+        yield json.dumps(dict(entry_data, entry_id=entry_id), ensure_ascii=False, default=str) + "\n"
+
+
+def export_csv(entries):
+    """Yield a header row, then one CSV row per (entry_id, entry_data)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for entry_id, entry_data in entries:
+        writer.writerow([entry_id if field == 'entry_id' else _csv_value(entry_data.get(field))
+                         for field in CSV_FIELDS])
+        if buffer.tell() >= 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_entries(entries, export_format):
+    return {'jsonl': export_jsonl, 'csv': export_csv}[export_format](entries)
+
+
+def write_export(entries, export_format, output):
+    """Stream an export into a binary file object; returns the number of bytes written"""
+    written = 0
+    for chunk in export_entries(entries, export_format):
+        data = chunk.encode('utf-8')
+        output.write(data)
+        written += len(data)
+    return written
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return value
+
+
+# --- Reading import files ---
+
+def iter_records(binary_file, chunk_size=65536):
+    """Yield (entry_id or None, record) from a thankful_wall.json, JSONL or CSV file
+
+    The format is sniffed from the first chunk: a complete JSON object without
+    an "entries" key starts a JSONL file, any other JSON is read as
+    thankful_wall.json and anything else as CSV. Lines that are not valid JSON
+    come through as (None, ValueError) so the importer can count them.
+    """
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    head = text_file.read(chunk_size)
+    stripped = head.lstrip()
+
+    if not stripped.startswith(('{', '[')):
+        yield from _iter_csv(_lines(head, text_file))
+        return
+
+    try:
+        first_record, _ = json.JSONDecoder().raw_decode(stripped)
+    except ValueError:
+        first_record = None
+    if isinstance(first_record, dict) and 'entries' not in first_record:
+        yield from _iter_jsonl(_lines(head, text_file))
+    else:
+        yield from iter_json_entries(head, text_file, chunk_size)
+
+
+def _lines(head, text_file):
+    # Lines of the file, given the part already read into head
+    lines = head.split('\n')
+    for line in lines[:-1]:
+        yield line + '\n'
+    last_line = lines[-1] + text_file.readline()
+    if last_line:
+        yield last_line
+    yield from text_file
+
+
+def _iter_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield None, json.loads(line)
+        except ValueError as e:
+            yield None, ValueError(f"Invalid JSON line: {e}")
+
+
+def _iter_csv(lines):
+    for row in csv.DictReader(lines):
+        row = {field: value for field, value in row.items() if field and value not in (None, '')}
+        for field in ('manual_order', 'timestamp'):
+            if field in row:
+                try:
+                    row[field] = float(row[field])
+                except ValueError:
+                    pass
+        yield row.pop('entry_id', None), row
+
+
+# --- Import ---
+
+def validate_record(entry_id, record, default_timestamp):
+    """Clean one imported record; returns (entry_id or None, entry_data) or raises ValueError
+
+    Required text fields must be non-empty. A missing role becomes
+    "Not specified 未指定" and a missing or unreadable timestamp becomes
+    default_timestamp. Unknown fields are dropped.
+    """
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Record is not a JSON object")
+
+    entry_id = entry_id if entry_id is not None else record.get('entry_id') or record.get('firebase_id')
+    if entry_id is not None:
+        entry_id = str(entry_id)
+        if not _valid_document_id(entry_id):
+            raise ValueError(f"Invalid entry ID {entry_id!r}")
+
+    entry_data = {}
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        value = '' if value is None else str(value).strip()
+        if len(value) > MAX_TEXT_LENGTH:
+            raise ValueError(f"{field} is longer than {MAX_TEXT_LENGTH} characters")
+        if value:
+            entry_data[field] = value
+    missing = [field for field in REQUIRED_FIELDS if field not in entry_data]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    entry_data.setdefault('role_class', "Not specified 未指定")
+
+    manual_order = record.get('manual_order')
+    if manual_order is not None:
+        if isinstance(manual_order, bool) or not isinstance(manual_order, (int, float)) \
+                or not math.isfinite(manual_order):
+            raise ValueError(f"manual_order must be a number, not {manual_order!r}")
+        entry_data['manual_order'] = manual_order
+
+    entry_data['timestamp'] = _timestamp(record.get('timestamp'), default_timestamp)
+    return entry_id, entry_data
+
+
+def _timestamp(value, default):
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value > 0:
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return default
+
+
+def _valid_document_id(entry_id):
+    # Firestore document ID rules
+    return (0 < len(entry_id.encode('utf-8')) <= 1500 and '/' not in entry_id and entry_id not in ('.', '..')
+            and not (entry_id.startswith('__') and entry_id.endswith('__')))
+
+
+class ImportReport:
+    """What an import did: counts plus the first few problems"""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, record_number, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Record {record_number}: {message}")
+
+
+def import_records(records, write_batch, new_entry_id, batch_size=BATCH_LIMIT, on_progress=None):
+    """Validate (entry_id, record) pairs and write them with write_batch({entry_id: entry_data})
+
+    Records without an ID get new_entry_id(). Records without a timestamp get one
+    counting down from now, so they keep the file's order on the newest-first
+    wall. on_progress(report) is called after every batch. Returns an ImportReport;
+    if a batch fails, the error is raised after the batches before it were written.
+    """
+    report = ImportReport()
+    started = time.time()
+    batch = {}
+    for record_number, (entry_id, record) in enumerate(records, 1):
+        try:
+            entry_id, entry_data = validate_record(entry_id, record, started - record_number * 0.001)
+        except ValueError as e:
+            report.add_error(record_number, str(e))
+            continue
+        entry_id = entry_id or new_entry_id()
+        entry_data['entry_id'] = entry_id
+        batch[entry_id] = entry_data
+
+        if len(batch) >= batch_size:
+            write_batch(batch)
+            report.imported += len(batch)
+            batch = {}
+            if on_progress is not None:
+                on_progress(report)
+
+    if batch:
+        write_batch(batch)
+        report.imported += len(batch)
+    if on_progress is not None:
+        on_progress(report)
+    return report